@@ -1,13 +1,14 @@
 import argparse
 import getpass
-import json
 import os
 import sys
-import time
 
-from submit.base import Language, TextType
-from submit.submitter import Submitter
+from submit.base import Language, TextType, Verdict
+from submit.poller import Poller
+from submit.store import HistoryStore, ProblemStore, SessionStore
+from submit.submitter import DuplicateSubmissionError, Submitter
 from submit.submitters import NAMES
+from submit.util import format_rows
 
 
 def _problem(submitter, problem):
@@ -20,6 +21,163 @@ def _problem(submitter, problem):
     return None, problem
 
 
+def _time(value):
+    """A Unix time from "YYYY-MM-DD[ HH:MM]", or from "N" and a unit (s, m, h,
+    d or w) meaning that long ago."""
+    import datetime
+    import time
+
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+    try:
+        if value[-1:] in units:
+            return time.time() - float(value[:-1]) * units[value[-1]]
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid time: %r' % value) from None
+
+
+def _submit(submitter, ojn, prob, code, lang, force):
+    submission = None
+    try:
+        subid = submitter.submit(ojn, prob, code, lang, force)
+        print('Submission ID: %s' % subid)
+    except DuplicateSubmissionError as e:
+        subid = e.id
+        print('Submitted before, ID: %s (--force to submit again)' % subid)
+        if e.verdict is not None:
+            submission = submitter.history.get(ojn, subid)
+    if submission is None:
+        poller = Poller(
+            submitter, lambda p: print('Waiting... %d s' % round(p.elapsed))
+        )
+        pending = poller.add(ojn, subid)
+        poller.wait()
+        if pending.error is not None:
+            raise pending.error
+        submission = pending.submission
+    print('Verdict:', submission.verdict.name)
+    print('Score:  ', submission.score)
+    if submission.time is not None:
+        print('Time:   ', submission.time, 'ms')
+    if submission.memory is not None:
+        print('Memory: ', submission.memory, 'KB')
+    if submission.data is not None:
+        print('Additional data:')
+        print(submission.data)
+
+
+def _add_test_options(parser):
+    parser.add_argument(
+        '--time-limit',
+        help='CPU seconds per test, default 2',
+        type=float,
+        default=2.0,
+    )
+    parser.add_argument(
+        '--memory-limit', help='MB per test, default 256', type=int, default=256
+    )
+    parser.add_argument(
+        '-j', '--jobs', help='tests to run at once, default the CPU count', type=int
+    )
+    parser.add_argument(
+        '--pch',
+        help='precompile bits/stdc++.h, once, to compile faster after',
+        action='store_true',
+    )
+
+
+def _test(submitter, ojn, prob, code, lang, ns):
+    """Run the code on the problem's samples and print the results. Returns
+    whether all passed, or None if the problem has no samples."""
+    from submit.local import CompileCache, test
+
+    if submitter.store is None:
+        submitter.store = ProblemStore()
+    problem = submitter.get_problem(ojn, prob)
+    if problem is None or not problem.cases:
+        return None
+    cases = test(
+        code,
+        lang,
+        problem.cases,
+        ns.time_limit,
+        ns.memory_limit * 1024,
+        ns.jobs,
+        cache=CompileCache(pch=ns.pch),
+    )
+    table = [('#', 'Verdict', 'Time', 'Memory')]
+    for i, case in enumerate(cases, 1):
+        # no memory is measured for runs too short to see
+        memory = '%g KB' % case.memory if case.memory else ''
+        table.append((i, case.verdict.name, '%g ms' % case.time, memory))
+    print(format_rows(table))
+    for i, case in enumerate(cases, 1):
+        if case.verdict == Verdict.ACCEPTED:
+            continue
+        print()
+        print('Test #%d: %s' % (i, case.verdict.name))
+        if case.verdict == Verdict.COMPILATION_ERROR:
+            print(case.message)
+            break
+        for name in ('input', 'output', 'answer', 'message'):
+            text = getattr(case, name)
+            if text:
+                if len(text) > 1000:
+                    text = text[:1000] + '...'
+                print('%s:' % name.capitalize())
+                print(text.rstrip('\n'))
+    return all(case.verdict == Verdict.ACCEPTED for case in cases)
+
+
+def _watch(submitter, ojn, prob, lang, ns):
+    import threading
+    import time
+
+    from submit.watch import watch_file
+
+    stop = threading.Event()
+    submitter.get_oj(ojn)
+    # keep_warm shares the judge's session with the loop below
+    lock = submitter.lock(ojn)
+
+    def keep_warm():
+        # the judge closes idle connections after a while, so reopen them
+        while True:
+            try:
+                with lock:
+                    submitter.warm(ojn)
+            except Exception:
+                pass
+            if stop.wait(ns.keepalive):
+                break
+
+    threading.Thread(target=keep_warm, daemon=True).start()
+    try:
+        for code in watch_file(ns.file.name):
+            print()
+            print('[%s] Testing %s' % (time.strftime('%H:%M:%S'), ns.file.name))
+            try:
+                with lock:
+                    passed = _test(submitter, ojn, prob, code, lang, ns)
+            except Exception as e:
+                print('Testing failed: %s: %s' % (type(e).__name__, e))
+                passed = False
+            if passed is None:
+                print('No samples for this problem')
+            elif passed and ns.submit:
+                with lock:
+                    try:
+                        _submit(submitter, ojn, prob, code, lang, ns.force)
+                    except Exception as e:
+                        print('Submission failed: %s: %s' % (type(e).__name__, e))
+                    submitter.save()
+            print('Watching for changes, Ctrl-C to stop')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+
+
 def main(args=None):
     if args is None:
         args = sys.argv[1:]
@@ -30,6 +188,21 @@ def main(args=None):
         help='session file, defaults to "~/.submitter.sess"',
         default=os.path.join(os.path.expanduser('~'), '.submitter.sess'),
     )
+    common.add_argument(
+        '--verify-login',
+        help='always check with the OJ that the saved login is still valid',
+        action='store_true',
+    )
+    common.add_argument(
+        '--login-ttl',
+        help='seconds to trust a previous login check, default 1800',
+        type=float,
+    )
+    common.add_argument(
+        '--metrics',
+        metavar='FILE',
+        help='write HTTP and cache metrics here, as JSON for *.json, else Prometheus',
+    )
     ap = argparse.ArgumentParser(
         prog='submit', description='submit code to online judges', parents=[common]
     )
@@ -39,7 +212,7 @@ def main(args=None):
         return sp.add_parser(name, description=description, **kwargs, parents=[common])
 
     login = add_parser('login', description='login to an OJ')
-    login.add_argument('oj', help='OJ to login', choices=list(NAMES))
+    login.add_argument('oj', help='OJ to login', choices=NAMES)
     login.add_argument('-u', '--username', help='username on OJ')
     login.add_argument('-p', '--password', help='password on OJ')
     login.set_defaults(cmd='login')
@@ -58,6 +231,16 @@ def main(args=None):
         }.get,
         default='markdown',
     )
+    get.add_argument(
+        '--offline',
+        help='only use the local problem store, never the network',
+        action='store_true',
+    )
+    get.add_argument(
+        '--refresh',
+        help='fetch the problem again even if it is stored locally',
+        action='store_true',
+    )
     get.set_defaults(cmd='get')
 
     submit = add_parser('submit', description='submit your code')
@@ -77,14 +260,156 @@ def main(args=None):
         '--problem',
         help='problem ID (oj:pid) or URL, default searches code for URL',
     )
+    submit.add_argument(
+        '--force',
+        help='submit even if the same code was submitted to the problem before',
+        action='store_true',
+    )
+    submit.add_argument(
+        '--test-first',
+        help='run the samples locally first, and only submit if all pass',
+        action='store_true',
+    )
+    _add_test_options(submit)
     submit.set_defaults(cmd='submit')
 
+    test = add_parser('test', description='run your code on the samples locally')
+    test.add_argument(
+        'file', help='code file to read from', type=argparse.FileType('r')
+    )
+    test.add_argument(
+        '-l',
+        '--lang',
+        help='language of code (c++|python3), default c++',
+        choices=['c++', 'python3'],
+        type={'c++': Language.C__, 'python3': Language.PYTHON3}.get,
+        default='c++',
+    )
+    test.add_argument(
+        '-p',
+        '--problem',
+        help='problem ID (oj:pid) or URL, default searches code for URL',
+    )
+    _add_test_options(test)
+    test.set_defaults(cmd='test')
+
+    watch = add_parser(
+        'watch', description='test your code on the samples each time it is saved'
+    )
+    watch.add_argument('file', help='code file to watch', type=argparse.FileType('r'))
+    watch.add_argument(
+        '-l',
+        '--lang',
+        help='language of code (c++|python3), default c++',
+        choices=['c++', 'python3'],
+        type={'c++': Language.C__, 'python3': Language.PYTHON3}.get,
+        default='c++',
+    )
+    watch.add_argument(
+        '-p',
+        '--problem',
+        help='problem ID (oj:pid) or URL, default searches code for URL',
+    )
+    watch.add_argument(
+        '--submit', help='submit the code when all samples pass', action='store_true'
+    )
+    watch.add_argument(
+        '--force',
+        help='submit even if the same code was submitted to the problem before',
+        action='store_true',
+    )
+    watch.add_argument(
+        '--keepalive',
+        help='seconds between reopening connections to the OJ, default 60',
+        type=float,
+        default=60.0,
+    )
+    _add_test_options(watch)
+    watch.set_defaults(cmd='watch')
+
+    batch = add_parser('batch', description='submit many files concurrently')
+    batch.add_argument('files', help='code files to submit', nargs='*')
+    batch.add_argument(
+        '-m',
+        '--manifest',
+        help='file listing "file [problem]" lines, or a JSON {file: problem}',
+    )
+    batch.add_argument(
+        '-l',
+        '--lang',
+        help='language of all code (c++|python3), default guesses by extension',
+        choices=['c++', 'python3'],
+        type={'c++': Language.C__, 'python3': Language.PYTHON3}.get,
+    )
+    batch.add_argument(
+        '-j', '--jobs', help='submissions in flight, default 8', type=int, default=8
+    )
+    batch.add_argument(
+        '--limit',
+        help='submissions in flight per OJ, as N or OJ=N, default 4',
+        action='append',
+        default=[],
+    )
+    batch.add_argument(
+        '-t', '--timeout', help='seconds to wait for each verdict', type=float
+    )
+    batch.add_argument(
+        '--force',
+        help='submit code even if submitted before, instead of reusing the verdict',
+        action='store_true',
+    )
+    batch.set_defaults(cmd='batch')
+
+    history = add_parser('history', description='show past submissions')
+    history.add_argument(
+        '-o', '--oj', help='only submissions to this OJ', choices=NAMES
+    )
+    history.add_argument('-p', '--problem', help='only this problem (oj:pid or URL)')
+    history.add_argument(
+        '-v',
+        '--verdict',
+        help='only submissions with this verdict, may be repeated',
+        action='append',
+        type=str.upper,
+        choices=[v.name for v in Verdict],
+        metavar='VERDICT',
+    )
+    history.add_argument(
+        '--ac', help='only accepted submissions', action='store_const', const=True
+    )
+    history.add_argument(
+        '--failed',
+        help='only rejected submissions',
+        action='store_const',
+        const=False,
+        dest='ac',
+    )
+    history.add_argument(
+        '--since', help='only since this time (YYYY-MM-DD or e.g. 7d)', type=_time
+    )
+    history.add_argument(
+        '--until', help='only before this time (YYYY-MM-DD or e.g. 7d)', type=_time
+    )
+    history.add_argument(
+        '-n', '--limit', help='rows to show, default 20', type=int, default=20
+    )
+    history.add_argument(
+        '-g',
+        '--group-by',
+        help='show totals per judge, problem, verdict, lang or day instead',
+        choices=HistoryStore.GROUPS,
+    )
+    history.add_argument('--id', help='show this submission with its tests (needs -o)')
+    history.add_argument('--json', help='print JSON', action='store_true')
+    history.set_defaults(cmd='history')
+
     ns = ap.parse_args(args)
-    save = ns.save_file
-    submitter = Submitter()
-    if os.path.exists(save):
-        with open(save) as f:
-            submitter.load(json.load(f))
+    ret = None
+    submitter = Submitter(
+        ns.verify_login, ns.login_ttl, sessions=SessionStore(ns.save_file)
+    )
+    if ns.cmd in ('submit', 'batch', 'watch'):
+        submitter.history = HistoryStore()
     if ns.cmd == 'login':
         ojn = ns.oj
         username = ns.username
@@ -104,11 +429,14 @@ def main(args=None):
         ojn, prob = _problem(submitter, problem)
         if ojn is None:
             ap.error('problem not found: %r' % problem)
-        text = submitter.get_problem(ojn, prob)
+        submitter.store = ProblemStore()
+        text = submitter.get_problem(ojn, prob, ns.offline, ns.refresh)
+        if text is None and ns.offline:
+            ap.error('problem not stored locally: %r' % problem)
         if text is None:
-            ap.error('problem not found: %r' % (ojn, prob))
+            ap.error('problem not found: %r' % problem)
         print(text.get_as_type(format))
-    elif ns.cmd == 'submit':
+    elif ns.cmd in ('submit', 'test', 'watch'):
         file = ns.file
         lang = ns.lang
         problem = ns.problem
@@ -125,27 +453,215 @@ def main(args=None):
         if not isinstance(ojn, str):
             ojn = ojn.name
         print(ojn, prob, NAMES[ojn].get_problem_url(prob))
-        subid = submitter.submit(ojn, prob, code, lang)
-        print('Submission ID: %s' % subid)
-        cnt = 0
-        while True:
-            submission = submitter.get_submission(ojn, subid)
-            if submission is not None:
-                break
-            cnt += 1
-            print('Waiting...', cnt, 's')
-            time.sleep(1)
-        print('Verdict:', submission.verdict.name)
-        print('Score:  ', submission.score)
-        if submission.time is not None:
-            print('Time:   ', submission.time, 'ms')
-        if submission.memory is not None:
-            print('Memory: ', submission.memory, 'KB')
-        if submission.data is not None:
-            print('Additional data:')
-            print(submission.data)
-    with open(save, 'w') as f:
-        json.dump(submitter.dump(), f)
+        if ns.cmd == 'watch':
+            _watch(submitter, ojn, prob, lang, ns)
+        elif ns.cmd == 'test' or ns.test_first:
+            warm = None
+            if ns.cmd == 'submit':
+                import threading
+
+                def connect():
+                    # have connections ready for when the tests are done
+                    try:
+                        submitter.warm(ojn)
+                    except Exception:
+                        pass
+
+                warm = threading.Thread(target=connect)
+                warm.start()
+            passed = _test(submitter, ojn, prob, code, lang, ns)
+            if warm is not None:
+                warm.join()
+            if passed is None:
+                print('No samples for this problem')
+            if ns.cmd == 'test':
+                ret = int(passed is False)
+            elif passed is False:
+                print('Not submitting, the samples failed')
+                ret = 1
+        if ns.cmd == 'submit' and ret is None:
+            _submit(submitter, ojn, prob, code, lang, ns.force)
+    elif ns.cmd == 'batch':
+        import asyncio
+        import tempfile
+
+        from submit.aio import AsyncSubmitter
+        from submit.batch import (
+            BatchJob,
+            format_table,
+            guess_language,
+            read_manifest,
+            run_batch,
+        )
+        from submit.cache import BlobStore
+
+        items = [(file, None) for file in ns.files]
+        if ns.manifest is not None:
+            items += read_manifest(ns.manifest)
+        if not items:
+            ap.error('no files to submit')
+        default_limit = 4
+        limits = {}
+        for limit in ns.limit:
+            ojn, _, n = limit.rpartition('=')
+            if not n.isdigit() or (ojn and ojn not in NAMES):
+                ap.error('invalid limit: %r' % limit)
+            if ojn:
+                limits[ojn] = int(n)
+            else:
+                default_limit = int(n)
+        jobs = []
+        for file, problem in items:
+            job = BatchJob(file, lang=ns.lang or guess_language(file))
+            jobs.append(job)
+            try:
+                with open(file) as f:
+                    job.code = f.read()
+            except OSError as e:
+                job.error = str(e)
+                continue
+            if problem is None:
+                ojn, prob = submitter.search_problem(job.code) or (None, None)
+            else:
+                ojn, prob = _problem(submitter, problem)
+            if ojn is None:
+                job.error = 'problem not found'
+                continue
+            job.oj = ojn if isinstance(ojn, str) else ojn.name
+            job.problem = prob
+            limits.setdefault(job.oj, default_limit)
+        asub = AsyncSubmitter(submitter, max(ns.jobs, 1))
+        # keep the tests of finished submissions on disk while the rest run;
+        # the results refer to them until they have been reported
+        with tempfile.TemporaryDirectory() as blobs:
+            submitter.blobs = BlobStore(blobs)
+            try:
+                asyncio.run(
+                    run_batch(
+                        asub,
+                        [job for job in jobs if job.error is None],
+                        max(ns.jobs, 1),
+                        limits,
+                        ns.timeout,
+                        ns.force,
+                    )
+                )
+            finally:
+                asub.close()
+            print(format_table(jobs))
+            ret = int(not all(job.ok for job in jobs))
+            submitter.blobs = None
+    elif ns.cmd == 'history':
+        import json
+        import time
+
+        store = HistoryStore()
+        ojn, prob = ns.oj, None
+        if ns.problem is not None:
+            ojn, prob = _problem(submitter, ns.problem)
+            if ojn is None:
+                ap.error('problem not found: %r' % ns.problem)
+            if not isinstance(ojn, str):
+                ojn = ojn.name
+        filters = dict(
+            judge=ojn,
+            problem=prob,
+            verdicts=ns.verdict,
+            accepted=ns.ac,
+            since=ns.since,
+            until=ns.until,
+        )
+
+        def when(t):
+            return (
+                '' if t is None else time.strftime('%Y-%m-%d %H:%M', time.localtime(t))
+            )
+
+        def ms(t):
+            return '' if t is None else '%g ms' % round(t, 1)
+
+        def kb(m):
+            return '' if m is None else '%g KB' % m
+
+        if ns.id is not None:
+            if ojn is None:
+                ap.error('--id needs --oj')
+            sub = store.get(ojn, ns.id)
+            if sub is None:
+                ap.error('submission not found: %r' % ns.id)
+            sys.stdout.writelines(sub.iter_json())
+            print()
+        elif ns.group_by is not None:
+            rows = store.summary(ns.group_by, limit=ns.limit, **filters)
+            if ns.json:
+                print(json.dumps(rows, indent=2))
+            else:
+                table = [
+                    (
+                        'Group',
+                        'Subs',
+                        'AC',
+                        'AC %',
+                        'Max time',
+                        'Avg time',
+                        'Max memory',
+                        'Last',
+                    )
+                ]
+                for r in rows:
+                    table.append(
+                        (
+                            r['group'],
+                            r['count'],
+                            r['accepted'],
+                            '%d%%' % round(100 * r['accepted'] / r['count']),
+                            ms(r['max_time']),
+                            ms(r['avg_time']),
+                            kb(r['max_memory']),
+                            when(r['last']),
+                        )
+                    )
+                print(format_rows(table))
+        else:
+            rows = store.query(limit=ns.limit, **filters)
+            if ns.json:
+                print(json.dumps(rows, indent=2))
+            else:
+                table = [
+                    (
+                        'Sent',
+                        'OJ',
+                        'Problem',
+                        'ID',
+                        'Lang',
+                        'Verdict',
+                        'Score',
+                        'Time',
+                        'Memory',
+                    )
+                ]
+                for r in rows:
+                    table.append(
+                        (
+                            when(r['submitted']),
+                            r['judge'],
+                            r['problem'] or '',
+                            r['id'],
+                            r['lang'] or '',
+                            r['verdict'] or 'PENDING',
+                            '' if r['score'] is None else r['score'],
+                            ms(r['time']),
+                            kb(r['memory']),
+                        )
+                    )
+                print(format_rows(table))
+        store.close()
+    submitter.save()
+    if ns.metrics:
+        from .metrics import METRICS
+
+        METRICS.write(ns.metrics)
+    return ret
 
 
 if __name__ == '__main__':
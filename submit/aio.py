@@ -0,0 +1,127 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, Type, Union
+
+from .submitter import Submitter
+
+if TYPE_CHECKING:
+    from .base import Language, Problem, Submission, SubmitterBase
+
+__all__ = ['AsyncSubmitter']
+
+
+class AsyncSubmitter:
+    """Asyncio counterpart of `Submitter`.
+
+    Judge requests still go through the judges' own sessions, but they run on
+    a small shared pool of worker threads, and a thread is only held while a
+    request is in flight. Waiting for verdicts happens on the event loop, so
+    hundreds of pending submissions need no threads at all.
+
+    Each call runs on a session of the worker's own (see
+    `SubmitterBase.own_session`), so polls, submissions and statements of one
+    judge are all in flight together; only logging in and out take turns
+    (see `Submitter.lock`).
+    """
+
+    def __init__(
+        self,
+        submitter: Optional[Submitter] = None,
+        max_workers: int = 16,
+    ) -> None:
+        self.submitter = Submitter() if submitter is None else submitter
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='submit')
+
+    async def __aenter__(self) -> 'AsyncSubmitter':
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def dump(self) -> dict:
+        return self.submitter.dump()
+
+    def load(self, data: dict) -> None:
+        self.submitter.load(data)
+
+    async def run_in_executor(self, func, *args):
+        """Run `func(*args)` on the worker threads, e.g. a blocking read of the
+        history; no judge session or lock is involved."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args)
+        )
+
+    async def _run(self, oj, func, *args, exclusive=False):
+        # construct the judge on the loop thread; constructors do no I/O
+        self.submitter.get_oj(oj)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self._call, oj, func, args, exclusive),
+        )
+
+    def _call(self, oj, func, args, exclusive):
+        with self.submitter.get_oj(oj).own_session():
+            if not exclusive:
+                return func(oj, *args)
+            with self.submitter.lock(oj):
+                return func(oj, *args)
+
+    async def warm(
+        self, oj: Union[Type['SubmitterBase'], str], connections: int = 1
+    ) -> int:
+        return await self._run(oj, self.submitter.warm, connections)
+
+    async def login(
+        self, oj: Union[Type['SubmitterBase'], str], username: str, password: str
+    ) -> bool:
+        return await self._run(
+            oj, self.submitter.login, username, password, exclusive=True
+        )
+
+    async def logout(self, oj: Union[Type['SubmitterBase'], str]) -> bool:
+        return await self._run(oj, self.submitter.logout, exclusive=True)
+
+    async def get_problem(
+        self, oj: Union[Type['SubmitterBase'], str], problem: str
+    ) -> Optional['Problem']:
+        return await self._run(oj, self.submitter.get_problem, problem)
+
+    async def submit(
+        self,
+        oj: Union[Type['SubmitterBase'], str],
+        problem: str,
+        code: str,
+        lang: 'Language',
+        force: bool = False,
+    ) -> str:
+        return await self._run(oj, self.submitter.submit, problem, code, lang, force)
+
+    async def get_submission(
+        self, oj: Union[Type['SubmitterBase'], str], id: str
+    ) -> Optional['Submission']:
+        return await self._run(oj, self.submitter.get_submission, id)
+
+    async def wait_submission(
+        self,
+        oj: Union[Type['SubmitterBase'], str],
+        id: str,
+        timeout: Optional[float] = None,
+    ) -> Optional['Submission']:
+        judge = self.submitter.get_oj(oj)
+        start = time.monotonic()
+        attempt = 0
+        while True:
+            sub = await self.get_submission(oj, id)
+            if sub is not None:
+                return sub
+            if timeout is not None and time.monotonic() - start > timeout:
+                return
+            await asyncio.sleep(judge.poll_delay(id, attempt))
+            attempt += 1
@@ -1,14 +1,30 @@
+import contextlib
+import copy
 import html
+import json
+import math
+import random
 import re
+import threading
 import time
 from abc import ABC, abstractmethod
+from array import array
 from enum import IntEnum, auto
-from typing import Any, Dict, List, Optional, Tuple, overload
-
-import requests
-from bs4 import BeautifulSoup, NavigableString, Tag
-
-from .util import get_text
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+from .metrics import operation
+from .render import MATH_RE, html_to_markdown, markdown_to_html
+from .util import get_text, parse_html
 
 __all__ = [
     'Language',
@@ -16,7 +32,9 @@ __all__ = [
     'Verdict',
     'TextType',
     'Problem',
+    'Blob',
     'Case',
+    'CaseColumns',
     'Submission',
     'SubmitterBase',
 ]
@@ -53,7 +71,7 @@ class TextType(IntEnum):
 
 
 class Problem:
-    _MATH_RE = re.compile(r'(?P<s>\${1,3})(.*?)(?P=s)')
+    _MATH_RE = MATH_RE
     _VAR_RE = re.compile(r'<var>(.*?)</var>')
 
     def __init__(
@@ -73,75 +91,20 @@ class Problem:
             return self.text
         if self.texttype == TextType.TEXT:
             return str(html.escape(self.text)).replace('\n', '<br/>')
-        r = requests.post(
-            'https://api.github.com/markdown', json={'text': self.text}, timeout=10
-        )
-        return r.text
+        return markdown_to_html(self.text)
 
     def get_markdown(self):
         if self.texttype in [TextType.TEXT, TextType.MARKDOWN]:
             return self.text
         try:
-            math_re = self._MATH_RE
-            import markdownify
-
-            class Converter(markdownify.MarkdownConverter):
-                def convert_div(self, el, text, convert_as_inline):
-                    if convert_as_inline:
-                        return text
-                    clazz = el.attrs.get('class', [])
-                    if 'section-title' in clazz:
-                        return self.convert_h3(el, text, convert_as_inline)
-                    if 'title' in clazz:
-                        return self.convert_h2(el, text, convert_as_inline)
-                    if 'property-title' in clazz:
-                        return self.convert_b(el, text, convert_as_inline) + ' '
-                    return text + '\n'
-
-                def convert_code(self, el, text, convert_as_inline):
-                    if math_re.match(text):
-                        return text
-                    cur = el
-                    while cur:
-                        if cur.name.lower() == 'pre':
-                            return text
-                        cur = cur.parent
-                    return super().convert_code(el, text, convert_as_inline)
-
-            def traverse(node, _pre=False):
-                for c in node.children:
-                    if isinstance(c, Tag):
-                        if c.name.lower() == 'var':
-                            if _pre:
-                                c.insert_after(NavigableString('$%s$' % c.text))
-                            else:
-                                c.insert_after(
-                                    BeautifulSoup(
-                                        '<code>$%s$</code>' % c.text, 'html.parser'
-                                    ).select_one('code')
-                                )
-                            c.extract()
-                        elif c.name.lower() == 'pre':
-                            traverse(c, True)
-                        else:
-                            traverse(c, _pre)
-                    else:
-                        continue
-
-            conv = Converter(heading_style='atx')
-            s = BeautifulSoup(
-                '<div>%s</div>' % math_re.sub(r'<code>$\2$</code>', self.text),
-                'html.parser',
-            ).select_one('div')
-            traverse(s)
-            return conv.convert(str(s))
+            return html_to_markdown(self.text)
         except:
             return self.get_text()
 
     def get_text(self):
         if self.texttype in [TextType.TEXT, TextType.MARKDOWN]:
             return self.text
-        return get_text(BeautifulSoup(self.text, 'html.parser')).strip()
+        return get_text(parse_html(self.text)).strip()
 
     def get_as_type(self, texttype: TextType) -> str:
         return {
@@ -151,7 +114,56 @@ class Problem:
         }[texttype]()
 
 
+class Blob:
+    """A test case payload kept out of memory, in `store` under `key`; it is
+    read back with `store.read(key)` each time the case's attribute is used.
+    `store` is normally a `submit.cache.BlobStore`."""
+
+    __slots__ = ('store', 'key')
+
+    def __init__(self, store: Any, key: Any) -> None:
+        self.store = store
+        self.key = key
+
+    def load(self) -> Optional[str]:
+        return self.store.read(self.key)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.key)
+
+
+class _Payload:
+    # a Case attribute that may hold a Blob instead of the text itself
+
+    def __set_name__(self, owner, name):
+        self.attr = '_' + name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.attr)
+        return value.load() if isinstance(value, Blob) else value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.attr, value)
+
+
 class Case:
+    __slots__ = (
+        'time',
+        'memory',
+        '_input',
+        '_output',
+        '_answer',
+        'verdict',
+        '_message',
+    )
+    PAYLOADS = ('input', 'output', 'answer', 'message')
+    input = _Payload()
+    output = _Payload()
+    answer = _Payload()
+    message = _Payload()
+
     def __init__(
         self,
         time: float,
@@ -170,9 +182,17 @@ class Case:
         self.verdict = verdict
         self.message = message
 
+    def spill(self, store: Any, min_size: int = 256) -> None:
+        """Move the payloads of at least `min_size` characters to `store` (a
+        `submit.cache.BlobStore`), keeping only references in memory."""
+        for k in self.PAYLOADS:
+            value = getattr(self, '_' + k)
+            if isinstance(value, str) and len(value) >= min_size:
+                setattr(self, k, Blob(store, store.put(value)))
+
     def to_json(self):
         data = {'time': self.time, 'memory': self.memory}
-        for k in ['input', 'output', 'answer', 'message']:
+        for k in self.PAYLOADS:
             v = getattr(self, k)
             if v is not None:
                 data[k] = v
@@ -181,7 +201,110 @@ class Case:
         return data
 
 
+class CaseColumns(Sequence):
+    """The cases of a submission stored column by column, in arrays.
+
+    Indexing or iterating gives new `Case` objects, so changing those does
+    not change the columns. Payload columns that are all None are not kept.
+    """
+
+    # stands for a verdict of None in the `verdict` array
+    NO_VERDICT = -2
+
+    def __init__(self, cases: Sequence[Case] = ()) -> None:
+        self.time = self._column([case.time for case in cases])
+        self.memory = self._column([case.memory for case in cases])
+        self.verdict = array(
+            'h',
+            [
+                self.NO_VERDICT if case.verdict is None else case.verdict.value
+                for case in cases
+            ],
+        )
+        # raw values, so that Blobs are not read
+        self.payloads: Dict[str, List[Any]] = {}
+        for k in Case.PAYLOADS:
+            values = [getattr(case, '_' + k) for case in cases]
+            if any(v is not None for v in values):
+                self.payloads[k] = values
+
+    @staticmethod
+    def _column(values: List[float]) -> array:
+        # judges give whole milliseconds and kilobytes as ints; keep them so
+        return array('q' if all(type(v) is int for v in values) else 'd', values)
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    @overload
+    def __getitem__(self, i: int) -> Case:
+        ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[Case]:
+        ...
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        verdict = self.verdict[i]
+        case = Case(
+            self.time[i],
+            self.memory[i],
+            verdict=None if verdict == self.NO_VERDICT else Verdict(verdict),
+        )
+        for k, values in self.payloads.items():
+            setattr(case, '_' + k, values[i])
+        return case
+
+    def spill(self, store: Any, min_size: int = 256) -> None:
+        """`Case.spill` every case."""
+        for values in self.payloads.values():
+            for i, value in enumerate(values):
+                if isinstance(value, str) and len(value) >= min_size:
+                    values[i] = Blob(store, store.put(value))
+
+    def max_time(self) -> Optional[float]:
+        return max(self.time, default=None)
+
+    def max_memory(self) -> Optional[float]:
+        return max(self.memory, default=None)
+
+    def percentile(self, q: float, column: str = 'time') -> Optional[float]:
+        """The nearest-rank `q`th percentile (0 to 100) of `time` or `memory`."""
+        values = sorted(getattr(self, column))
+        if not values:
+            return None
+        rank = math.ceil(q / 100 * len(values))
+        return values[min(len(values) - 1, max(0, rank - 1))]
+
+    def _failing(self) -> Iterator[int]:
+        for i, v in enumerate(self.verdict):
+            if v & 255 and v not in (self.NO_VERDICT, Verdict.UNKNOWN):
+                yield i
+
+    def failing(self) -> List[int]:
+        """Indexes of the cases with a known verdict other than accepted."""
+        return list(self._failing())
+
+    def first_failing(self) -> Optional[int]:
+        """Index of the first failing case (see `failing`), or None."""
+        return next(self._failing(), None)
+
+
 class Submission:
+    __slots__ = (
+        'id',
+        'verdict',
+        'problem',
+        'score',
+        'code',
+        'time',
+        'memory',
+        'cases',
+        'data',
+    )
+
     def __init__(
         self,
         id: str,
@@ -191,7 +314,7 @@ class Submission:
         code: Optional[str] = None,
         time: Optional[float] = None,
         memory: Optional[float] = None,
-        cases: Optional[List[Case]] = None,
+        cases: Optional[Union[List[Case], CaseColumns]] = None,
         data: Optional[Any] = None,
     ) -> None:
         self.id = id
@@ -204,7 +327,46 @@ class Submission:
         self.cases = cases
         self.data = data
 
+    @property
+    def columns(self) -> CaseColumns:
+        """The cases as a `CaseColumns`, made anew unless `compact` was
+        called."""
+        if isinstance(self.cases, CaseColumns):
+            return self.cases
+        return CaseColumns(self.cases or [])
+
+    def compact(self) -> None:
+        """Keep the cases as a `CaseColumns` instead of `Case` objects."""
+        if self.cases is not None and not isinstance(self.cases, CaseColumns):
+            self.cases = CaseColumns(self.cases)
+
+    def spill(self, store: Any, min_size: int = 256) -> None:
+        """`Case.spill` every case."""
+        if isinstance(self.cases, CaseColumns):
+            self.cases.spill(store, min_size)
+            return
+        for case in self.cases or []:
+            case.spill(store, min_size)
+
     def to_json(self):
+        return dict(self._json(), cases=[x.to_json() for x in self.cases or []])
+
+    def iter_json(self) -> Iterator[str]:
+        """`json.dumps(self.to_json())` in pieces, one case at a time, so
+        that spilled payloads are never all in memory."""
+        yield '{'
+        for i, (k, v) in enumerate(self._json().items()):
+            yield ('%s: ' if i == 0 else ', %s: ') % json.dumps(k)
+            if k != 'cases':
+                yield json.dumps(v)
+                continue
+            yield '['
+            for j, case in enumerate(self.cases or []):
+                yield (', ' if j else '') + json.dumps(case.to_json())
+            yield ']'
+        yield '}'
+
+    def _json(self):
         return {
             'id': self.id,
             'verict': self.verdict.name,
@@ -213,21 +375,11 @@ class Submission:
             'score': self.score,
             'time': self.time,
             'memory': self.memory,
-            'cases': [x.to_json() for x in self.cases or []],
+            'cases': None,  # filled in by the callers
             'data': self.data,
         }
 
 
-class Wrapper(requests.Session):
-    def _get(self, *args, **kwargs):
-        print('GET', args, kwargs)
-        return super().get(*args, **kwargs)
-
-    def _post(self, *args, **kwargs):
-        print('POST', args, kwargs)
-        return super().post(*args, **kwargs)
-
-
 class SubmitterBase(ABC):
     HEADERS = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
@@ -236,16 +388,109 @@ class SubmitterBase(ABC):
     name: str  # this is defined in subclasses
     require_submit_login = True
     require_view_login = False
+    # a successful login check is trusted for this many seconds
+    login_ttl = 30 * 60
+    # where the judge's pages live; Submitter.warm connects to these
+    BASE_URLS: Tuple[str, ...] = ()
+    # responses ending up on one of these pages mean we are logged out; for
+    # judges that do not redirect there, see `_logged_out`
+    LOGIN_URLS: Tuple[str, ...] = ()
+    _login_time: Optional[float] = None
+    # seconds between verdict polls: the first delay, the delay while tests
+    # are running, and the cap on the backoff while waiting in the queue
+    POLL_DELAYS = (1.0, 1.0, 8.0)
+    POLL_BACKOFF = 1.5
+    # finds the CSRF token in the judge's pages; a token seen in any page is
+    # reused until the judge rejects it
+    CSRF_RE: Optional['re.Pattern'] = None
+    _csrf_token: Optional[str] = None
 
     def __init__(self) -> None:
-        self.session = Wrapper()
+        from .session import Wrapper
+
+        self._init_state()
+        self.session = Wrapper(self.name)
         self.session.headers.update(self.HEADERS)
+        self.session.hooks['response'].append(self._check_login_response)
+        self.session.hooks['response'].append(self._harvest_csrf)
+
+    def _init_state(self):
+        self._progress: Dict[str, float] = {}
+        # guards the cookies while worker sessions copy and merge them, and
+        # the progress of pending submissions
+        self._state_lock = threading.RLock()
+        self._csrf_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """The session requests go through: this thread's own session inside
+        `own_session`, and the judge's session otherwise."""
+        session = getattr(self._local, 'session', None)
+        return self._session if session is None else session
+
+    @session.setter
+    def session(self, value):
+        self._session = value
+
+    @contextlib.contextmanager
+    def own_session(self) -> Iterator[None]:
+        """Send this thread's requests on a session of its own in the block.
+
+        It uses the judge session's connection pools, headers and hooks, and
+        a copy of its cookies; the cookies this thread's requests changed are
+        merged back afterwards. Several threads can then use the judge at
+        once, for anything but logging in or out.
+        """
+        if getattr(self._local, 'session', None) is not None:
+            yield
+            return
+        main = self._session
+        session = getattr(self._local, 'own', None)
+        if session is None:
+            from .session import Wrapper
+
+            session = self._local.own = Wrapper(self.name)
+        for attr in ('auth', 'proxies', 'params', 'verify', 'cert', 'trust_env'):
+            setattr(session, attr, getattr(main, attr))
+        session.adapters = main.adapters
+        session.headers = main.headers.copy()
+        session.hooks = {k: list(v) for k, v in main.hooks.items()}
+        with self._state_lock:
+            session.cookies.clear()
+            session.cookies.update(main.cookies)
+        before = {(c.domain, c.path, c.name): c.value for c in session.cookies}
+        self._local.session = session
+        try:
+            yield
+        finally:
+            self._local.session = None
+            after = {(c.domain, c.path, c.name): c for c in session.cookies}
+            with self._state_lock:
+                for key, cookie in after.items():
+                    if before.get(key) != cookie.value:
+                        main.cookies.set_cookie(copy.copy(cookie))
+                for key in before.keys() - after.keys():
+                    try:
+                        main.cookies.clear(*key)
+                    except KeyError:
+                        pass
+
+    def _check_login_response(self, r, *args, **kwargs):
+        if self._logged_out(r):
+            self._login_time = None
+
+    def _logged_out(self, r) -> bool:
+        """Whether response `r` shows that we are no longer logged in. By
+        default, whether it ended up on one of `LOGIN_URLS`."""
+        return bool(self.LOGIN_URLS) and r.url.startswith(self.LOGIN_URLS)
 
     def __getstate__(self):
-        return self.session
+        return self._session
 
     def __setstate__(self, state):
         self.session = state
+        self._init_state()
 
     @classmethod
     @abstractmethod
@@ -274,6 +519,53 @@ class SubmitterBase(ABC):
     def logged_in(self) -> bool:
         ...
 
+    def _harvest_csrf(self, r, *args, **kwargs):
+        if self.CSRF_RE is None or 'html' not in r.headers.get('content-type', ''):
+            return
+        match = self.CSRF_RE.search(r.text)
+        if match:
+            self._csrf_token = match.group(1)
+
+    def _get(self, url: str, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def get_csrf(self, url: str, fresh: bool = False) -> str:
+        """Return the cached CSRF token, fetching `url` to find one if needed."""
+        with self._csrf_lock:
+            if fresh or self._csrf_token is None:
+                self._csrf_token = None
+                with operation('csrf'):
+                    self._get(url)
+                if self._csrf_token is None:
+                    raise ValueError('no CSRF token found in %s' % url)
+            return self._csrf_token
+
+    def _csrf_rejected(self, r) -> bool:
+        return r.status_code in (403, 419)
+
+    def with_csrf(self, url: str, send):
+        """Call `send(token)` with the cached CSRF token, and once more with a
+        fresh token from `url` if the judge rejects the response."""
+        r = send(self.get_csrf(url))
+        if self._csrf_rejected(r):
+            r = send(self.get_csrf(url, True))
+        return r
+
+    def check_login(self, verify: bool = False) -> bool:
+        if (
+            not verify
+            and self._login_time is not None
+            and 0 <= time.time() - self._login_time < self.login_ttl
+        ):
+            return True
+        with operation('login'):
+            ok = bool(self.logged_in)
+        self._login_time = time.time() if ok else None
+        return ok
+
+    def set_logged_in(self, logged_in: bool) -> None:
+        self._login_time = time.time() if logged_in else None
+
     @abstractmethod
     def get_problem(self, id: str) -> Optional[Problem]:
         ...
@@ -286,6 +578,30 @@ class SubmitterBase(ABC):
     def get_submission(self, id: str) -> Optional[Submission]:
         ...
 
+    def get_progress(self, id: str) -> Optional[float]:
+        """How far judging got when `get_submission(id)` last returned None.
+
+        0 while queued, the fraction of tests judged (or 1 if the judge does
+        not say) while running, and None if unknown.
+        """
+        return self._progress.get(id)
+
+    def _set_progress(self, id: str, progress: Optional[float]) -> None:
+        with self._state_lock:
+            if progress is None:
+                self._progress.pop(id, None)
+            else:
+                self._progress[id] = progress
+
+    def poll_delay(self, id: str, attempt: int) -> float:
+        first, judging, cap = self.POLL_DELAYS
+        if attempt <= 0:
+            return first
+        if self.get_progress(id):
+            return judging
+        delay = first * self.POLL_BACKOFF**attempt * random.uniform(0.8, 1.2)
+        return min(cap, delay)
+
     @overload
     def wait_submission(self, id: str, timeout: Optional[int] = ...) -> Submission:
         ...
@@ -296,17 +612,46 @@ class SubmitterBase(ABC):
 
     def wait_submission(self, id, timeout=-1) -> Submission:
         start = time.time()
+        attempt = 0
         while True:
-            sub = self.get_submission(id)
+            with operation('poll'):
+                sub = self.get_submission(id)
             if sub is not None:
                 return sub
-            time.sleep(1)
+            time.sleep(self.poll_delay(id, attempt))
+            attempt += 1
             if timeout > 0 and time.time() - start > timeout:
                 return
 
     def dump(self) -> Dict[str, Any]:
-        return {'cookies': dict(self.session.cookies)}
+        with self._state_lock:
+            cookies = list(self._session.cookies)
+        # keyed by domain, path and name, so that sessions saved by several
+        # processes can be merged cookie by cookie
+        return {
+            'jar': {
+                '%s %s %s' % (c.domain, c.path, c.name): {
+                    'name': c.name,
+                    'value': c.value,
+                    'domain': c.domain,
+                    'path': c.path,
+                    'expires': c.expires,
+                    'secure': c.secure,
+                }
+                for c in cookies
+            },
+            'login_time': self._login_time,
+            'csrf': self._csrf_token,
+        }
 
     def load(self, data: Dict[str, Any]) -> None:
-        self.session.cookies.clear()
-        self.session.cookies.update(data['cookies'])
+        jar = self.session.cookies
+        jar.clear()
+        if 'jar' in data:
+            for c in data['jar'].values():
+                jar.set(**c)
+            jar.clear_expired_cookies()
+        else:  # saved before cookies kept their domains
+            jar.update(data['cookies'])
+        self._login_time = data.get('login_time')
+        self._csrf_token = data.get('csrf')
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .aio import AsyncSubmitter
+from .base import Language, Submission
+from .submitter import DuplicateSubmissionError
+from .util import format_rows
+
+__all__ = ['BatchJob', 'read_manifest', 'guess_language', 'run_batch', 'format_table']
+
+EXTENSIONS = {'.py': Language.PYTHON3}
+
+
+class BatchJob:
+    def __init__(
+        self,
+        file: str,
+        oj: Optional[str] = None,
+        problem: Optional[str] = None,
+        code: Optional[str] = None,
+        lang: Optional[Language] = None,
+    ) -> None:
+        self.file = file
+        self.oj = oj
+        self.problem = problem
+        self.code = code
+        self.lang = lang
+        self.id: Optional[str] = None
+        self.submission: Optional[Submission] = None
+        self.error: Optional[str] = None
+        # whether `id` is an earlier submission of the same code
+        self.reused = False
+
+    @property
+    def ok(self) -> bool:
+        return (
+            self.error is None
+            and self.submission is not None
+            and not (self.submission.verdict.value & 255)
+        )
+
+
+def read_manifest(path: str) -> List[Tuple[str, Optional[str]]]:
+    """Read `(file, problem)` pairs from a manifest.
+
+    The manifest is either a JSON object mapping files to problems, or lines
+    of `file [problem]`. Relative files are relative to the manifest, and a
+    missing problem means it is searched for in the code.
+    """
+    base = os.path.dirname(path)
+    with open(path) as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        items = list(data.items())
+    else:
+        items = []
+        for line in text.splitlines():
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            file, _, problem = line.partition(' ')
+            items.append((file, problem.strip() or None))
+    return [(os.path.join(base, file), problem) for file, problem in items]
+
+
+def guess_language(file: str, default: Language = Language.C__) -> Language:
+    return EXTENSIONS.get(os.path.splitext(file)[1].lower(), default)
+
+
+async def _run_job(
+    asub: AsyncSubmitter,
+    job: BatchJob,
+    pool: asyncio.Semaphore,
+    limit: Optional[asyncio.Semaphore],
+    timeout: Optional[float],
+    force: bool,
+) -> None:
+    # wait for the judge's limit before taking one of the shared slots, so
+    # that jobs queued behind a busy judge do not hold up the others
+    if limit is not None:
+        await limit.acquire()
+    try:
+        async with pool:
+            try:
+                try:
+                    job.id = await asub.submit(
+                        job.oj, job.problem, job.code, job.lang, force
+                    )
+                except DuplicateSubmissionError as e:
+                    job.id = e.id
+                    job.reused = True
+                    if e.verdict is not None:
+                        job.submission = await asub.run_in_executor(
+                            asub.submitter.history.get, job.oj, e.id
+                        )
+                        if job.submission is not None:
+                            return
+                if job.id is None:
+                    job.error = 'submission failed'
+                    return
+                job.submission = await asub.wait_submission(job.oj, job.id, timeout)
+                if job.submission is None:
+                    job.error = 'timed out'
+                else:
+                    job.submission.compact()
+            except Exception as e:
+                job.error = '%s: %s' % (type(e).__name__, e)
+    finally:
+        if limit is not None:
+            limit.release()
+
+
+async def run_batch(
+    asub: AsyncSubmitter,
+    jobs: Iterable[BatchJob],
+    workers: int = 8,
+    limits: Optional[Dict[str, int]] = None,
+    timeout: Optional[float] = None,
+    force: bool = False,
+) -> List[BatchJob]:
+    """Submit and wait for `jobs` concurrently.
+
+    At most `workers` jobs are in flight, and at most `limits[oj]` of them on
+    each judge. Errors are recorded on the job instead of being raised. Code
+    submitted before is not submitted again unless `force`: the job gets the
+    earlier submission, and its verdict from the history if there is one.
+    """
+    jobs = list(jobs)
+    pool = asyncio.Semaphore(workers)
+    sems = {oj: asyncio.Semaphore(n) for oj, n in (limits or {}).items()}
+    await asyncio.gather(
+        *[_run_job(asub, job, pool, sems.get(job.oj), timeout, force) for job in jobs]
+    )
+    return jobs
+
+
+def format_table(jobs: Iterable[BatchJob]) -> str:
+    jobs = list(jobs)
+    rows = [('File', 'OJ', 'Problem', 'ID', 'Verdict', 'Score', 'Time', 'Memory')]
+    for job in jobs:
+        sub = job.submission
+        id = job.id or ''
+        if job.reused:
+            id += ' (reused)'
+        if sub is None:
+            rows.append(
+                (job.file, job.oj or '', job.problem or '', id, 'ERROR') + ('',) * 3
+            )
+            continue
+        rows.append(
+            (
+                job.file,
+                job.oj,
+                job.problem,
+                id,
+                sub.verdict.name,
+                str(sub.score),
+                '' if sub.time is None else '%s ms' % sub.time,
+                '' if sub.memory is None else '%s KB' % sub.memory,
+            )
+        )
+    errors = ['%s: %s' % (job.file, job.error) for job in jobs if job.error]
+    return '\n'.join([format_rows(rows)] + errors)
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+from .metrics import METRICS
+
+__all__ = ['get_cache_dir', 'DiskCache', 'BlobStore']
+
+
+def get_cache_dir() -> str:
+    path = os.environ.get('SUBMIT_CACHE_DIR')
+    if path:
+        return path
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache'
+    )
+    return os.path.join(base, 'submit')
+
+
+class DiskCache:
+    """JSON values on disk, served stale while a background thread refreshes.
+
+    Entries younger than `ttl` seconds are returned as is. Older entries are
+    still returned if younger than `stale`, and a refresh is started in the
+    background; anything older is fetched before returning.
+    """
+
+    _KEY_RE = re.compile(r'[^0-9A-Za-z_.-]')
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale: Optional[float] = None,
+        directory: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.stale = ttl * 7 if stale is None else stale
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(self._directory or get_cache_dir(), self.name)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, self._KEY_RE.sub('_', key) + '.json')
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(entry, dict) or 'time' not in entry:
+            return
+        return entry
+
+    def _count(self, event: str) -> None:
+        # call with self._lock held
+        setattr(self, event, getattr(self, event) + 1)
+        METRICS.count_cache(self.name, event)
+
+    def _write(self, key: str, value: Any) -> None:
+        tmp = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp('.tmp', dir=self.directory)
+            with open(fd, 'w') as f:
+                json.dump({'time': time.time(), 'value': value}, f)
+            os.replace(tmp, self._path(key))
+        except (OSError, TypeError, ValueError):
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+            with self._lock:
+                self._count('errors')
+
+    def _refresh(self, key: str, fetch: Callable[[], Any]) -> None:
+        try:
+            self.set(key, fetch())
+            with self._lock:
+                self._count('refreshes')
+        except Exception:
+            with self._lock:
+                self._count('errors')
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(
+        self,
+        key: str,
+        fetch: Callable[[], Any],
+        refresh: Optional[Callable[[], Any]] = None,
+    ) -> Any:
+        """The value of `key`, from `fetch()` if there is none fresh enough.
+        Background refreshes call `refresh` instead if given: they run in
+        another thread, so it should not share state with `fetch`."""
+        entry = self._read(key)
+        age = None if entry is None else time.time() - entry['time']
+        if age is None or age > self.stale:
+            with self._lock:
+                self._count('misses')
+            value = fetch()
+            self.set(key, value)
+            return value
+        with self._lock:
+            self._count('hits')
+            if age > self.ttl and key not in self._refreshing:
+                self._refreshing.add(key)
+                # a hung refresh must not keep the program from exiting
+                threading.Thread(
+                    target=self._refresh,
+                    args=(key, refresh or fetch),
+                    name='submit-cache',
+                    daemon=True,
+                ).start()
+        return entry['value']
+
+    def set(self, key: str, value: Any) -> None:
+        self._write(key, value)
+
+    def invalidate(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'refreshes': self.refreshes,
+            'errors': self.errors,
+        }
+
+
+class BlobStore:
+    """Texts on disk, compressed and named by the hash of their content, so
+    that a text stored twice (the same test input in many submissions, say)
+    takes the space of one. See `submit.base.Blob`."""
+
+    def __init__(self, directory: Optional[str] = None, level: int = 6) -> None:
+        self.directory = directory or os.path.join(get_cache_dir(), 'blobs')
+        self.level = level
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def put(self, text: str) -> str:
+        data = text.encode()
+        key = hashlib.sha256(data).hexdigest()
+        path = self._path(key)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp('.tmp', dir=os.path.dirname(path))
+            try:
+                with open(fd, 'wb') as f:
+                    f.write(zlib.compress(data, self.level))
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        return key
+
+    def read(self, key: str) -> str:
+        with open(self._path(key), 'rb') as f:
+            return zlib.decompress(f.read()).decode()
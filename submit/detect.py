@@ -0,0 +1,98 @@
+import re
+from typing import TYPE_CHECKING, List, Optional, Tuple, Type
+
+from .submitters import get_infos, scan_text
+
+if TYPE_CHECKING:
+    from .base import SubmitterBase
+
+__all__ = ['Candidate', 'COMMENT_RE', 'search_regions', 'detect_problems']
+
+# comments of C-like languages, and Python's comments and docstrings; string
+# literals are not skipped, so "https://..." counts from its "//"
+COMMENT_RE = re.compile(
+    r'//[^\n]*|/\*.*?(?:\*/|\Z)|#[^\n]*|""".*?(?:"""|\Z)|\'\'\'.*?(?:\'\'\'|\Z)',
+    re.S,
+)
+# how far around a pattern match a judge's `search_problem` gets to look
+WINDOW = 256
+
+
+class Candidate:
+    """A problem found in a text. `start` and `end` are where the judge's
+    pattern matched, or None for judges without patterns."""
+
+    def __init__(
+        self,
+        oj: Type['SubmitterBase'],
+        problem: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> None:
+        self.oj = oj
+        self.problem = problem
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return '%s(%r, %r, %r, %r)' % (
+            type(self).__name__,
+            self.oj.name,
+            self.problem,
+            self.start,
+            self.end,
+        )
+
+
+def search_regions(
+    text: str, comments: bool = False, limit: Optional[int] = None
+) -> List[Tuple[int, int]]:
+    """The `(start, end)` parts of `text` to look for problems in: only the
+    first and last `limit` characters, and only comments if `comments`."""
+    n = len(text)
+    if limit is None or 2 * limit >= n:
+        regions = [(0, n)]
+    else:
+        regions = [(0, limit), (n - limit, n)]
+    if comments:
+        regions = [
+            m.span()
+            for start, end in regions
+            for m in COMMENT_RE.finditer(text, start, end)
+        ]
+    return regions
+
+
+def detect_problems(
+    text: str, comments: bool = False, limit: Optional[int] = None
+) -> List[Candidate]:
+    """Find the problems of all judges mentioned in `text`, in one pass.
+
+    Candidates come in order of position, then those of judges without
+    patterns; each problem is only reported where it first appears.
+    """
+    regions = search_regions(text, comments, limit)
+    found = []
+    seen = set()
+
+    def add(cls, problem, start=None, end=None):
+        if problem and (cls.name, problem) not in seen:
+            seen.add((cls.name, problem))
+            found.append(Candidate(cls, problem, start, end))
+
+    prev = 0
+    for info, start, end in scan_text(text, regions):
+        # the rest of the line around the match, from the previous match on
+        lo = max(prev, text.rfind('\n', max(0, start - WINDOW), start) + 1)
+        hi = text.find('\n', end, end + WINDOW)
+        if hi < 0:
+            hi = min(len(text), end + WINDOW)
+        prev = end
+        cls = info.load()
+        add(cls, cls.search_problem(text[lo:hi]), start, end)
+    for info in get_infos():
+        if not info.patterns:
+            cls = info.load()
+            for start, end in regions:
+                add(cls, cls.search_problem(text[start:end]))
+    return found
@@ -0,0 +1,383 @@
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from .base import Case, Language, Verdict
+from .cache import get_cache_dir
+
+__all__ = [
+    'CompileError',
+    'CompileCache',
+    'compile_code',
+    'compare',
+    'run',
+    'test',
+]
+
+CXX = os.environ.get('CXX', 'g++')
+CXXFLAGS = ['-O2', '-std=gnu++17']
+# bytes of output kept, and allowed, per run
+OUTPUT_LIMIT = 64 << 20
+
+
+class CompileError(Exception):
+    pass
+
+
+class CompileCache:
+    """C++ binaries on disk, named by the hash of their source, the compiler
+    and its flags, so that code compiled before is not compiled again.
+
+    The least recently used binaries are removed once they take more than
+    `max_size` bytes. With `pch`, bits/stdc++.h is precompiled, once for each
+    compiler and flags (about 100 MB, not counted in `max_size`), for code
+    that includes it.
+    """
+
+    STDCXX_RE = re.compile(r'^\s*#\s*include\s*<bits/stdc\+\+\.h>', re.M)
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_size: int = 256 << 20,
+        pch: bool = False,
+        cxx: Optional[str] = None,
+        flags: Optional[Sequence[str]] = None,
+    ) -> None:
+        self.directory = directory or os.path.join(get_cache_dir(), 'compile')
+        self.max_size = max_size
+        self.pch = pch
+        self.cxx = cxx or CXX
+        self.flags = list(CXXFLAGS if flags is None else flags)
+        self._compiler = None
+        self._pch_failed = False
+        self.hits = 0
+        self.misses = 0
+
+    def _compiler_key(self) -> str:
+        # the compiler is known by where it is and its size and time, which
+        # change when it is upgraded; asking for its version would be slower
+        if self._compiler is None:
+            path = shutil.which(self.cxx) or self.cxx
+            try:
+                path = os.path.realpath(path)
+                st = os.stat(path)
+                ident = [path, st.st_size, st.st_mtime_ns]
+            except OSError:
+                ident = [path]
+            data = json.dumps([ident, self.flags]).encode()
+            self._compiler = hashlib.sha256(data).hexdigest()
+        return self._compiler
+
+    def key(self, code: str) -> str:
+        data = (self._compiler_key() + '\0' + code).encode()
+        return hashlib.sha256(data).hexdigest()
+
+    def get(self, code: str) -> Optional[str]:
+        """The path of the binary of `code`, if compiled before."""
+        path = os.path.join(self.directory, self.key(code))
+        try:
+            os.utime(path)
+        except OSError:
+            return
+        return path
+
+    def compile(self, code: str) -> str:
+        """The path of the binary of `code`, compiling it if needed. Raises
+        `CompileError` with the compiler's messages."""
+        path = self.get(code)
+        if path is not None:
+            self.hits += 1
+            return path
+        self.misses += 1
+        path = os.path.join(self.directory, self.key(code))
+        flags = self.flags
+        if self.pch and self.STDCXX_RE.search(code):
+            include = self._build_pch()
+            if include is not None:
+                flags = [*flags, '-I', include]
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.directory) as tmp:
+            source = os.path.join(tmp, 'main.cpp')
+            binary = os.path.join(tmp, 'main')
+            with open(source, 'w') as f:
+                f.write(code)
+            p = subprocess.run(
+                [self.cxx, *flags, '-o', binary, source],
+                capture_output=True,
+                text=True,
+            )
+            if p.returncode:
+                raise CompileError(p.stderr)
+            os.replace(binary, path)
+        self.prune(keep=path)
+        return path
+
+    def _build_pch(self) -> Optional[str]:
+        # a bits/stdc++.h that includes the real one, precompiled next to it;
+        # GCC uses the .gch if it was built with the same flags, and else
+        # reads the header, so a stale one does no harm
+        include = os.path.join(self.directory, 'pch', self._compiler_key()[:16])
+        if os.path.exists(os.path.join(include, 'bits', 'stdc++.h.gch')):
+            return include
+        if self._pch_failed:
+            return
+        os.makedirs(os.path.dirname(include), exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(include)) as tmp:
+            header = os.path.join(tmp, 'out', 'bits', 'stdc++.h')
+            os.makedirs(os.path.dirname(header))
+            with open(header, 'w') as f:
+                f.write('#include_next <bits/stdc++.h>\n')
+            p = subprocess.run(
+                [self.cxx, *self.flags, '-x', 'c++-header', header],
+                capture_output=True,
+            )
+            if p.returncode:
+                self._pch_failed = True
+                return
+            try:
+                os.rename(os.path.join(tmp, 'out'), include)
+            except OSError:  # built by someone else meanwhile
+                pass
+        return include
+
+    def prune(self, keep: Optional[str] = None) -> None:
+        """Remove the least recently used binaries, all but `keep`, until the
+        rest fit in `max_size`."""
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.is_file(follow_symlinks=False):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+                        total += st.st_size
+        except OSError:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+
+def compile_code(
+    code: str,
+    lang: Language,
+    directory: str,
+    cache: Optional[CompileCache] = None,
+) -> List[str]:
+    """Write `code` to `directory`, compile it, and return the command that
+    runs it. Raises `CompileError` with the compiler's messages.
+
+    C++ is compiled with `cache` if given, and then run from there.
+    """
+    if lang == Language.PYTHON3:
+        path = os.path.join(directory, 'main.py')
+        with open(path, 'w') as f:
+            f.write(code)
+        try:
+            compile(code, path, 'exec')
+        except SyntaxError as e:
+            raise CompileError(''.join(traceback.format_exception_only(type(e), e)))
+        return [sys.executable, path]
+    if cache is not None:
+        return [cache.compile(code)]
+    source = os.path.join(directory, 'main.cpp')
+    binary = os.path.join(directory, 'main')
+    with open(source, 'w') as f:
+        f.write(code)
+    p = subprocess.run(
+        [CXX, *CXXFLAGS, '-o', binary, source], capture_output=True, text=True
+    )
+    if p.returncode:
+        raise CompileError(p.stderr)
+    return [binary]
+
+
+def compare(output: str, answer: str, eps: float = 1e-6) -> Optional[str]:
+    """None if `output` matches `answer` token by token, else what differs.
+
+    Whitespace is ignored, and where the answer has a real number, any
+    number within `eps` of it (absolute or relative) is accepted.
+    """
+    got = output.split()
+    want = answer.split()
+    for i, (g, w) in enumerate(zip(got, want), 1):
+        if g == w or ('.' in w and _close(g, w, eps)):
+            continue
+        return 'token %d: expected %.40s, got %.40s' % (i, w, g)
+    if len(got) != len(want):
+        return 'expected %d tokens, got %d' % (len(want), len(got))
+
+
+def _close(got, want, eps):
+    try:
+        g, w = float(got), float(want)
+    except ValueError:
+        return False
+    return abs(g - w) <= eps * max(1.0, abs(w))
+
+
+def run(
+    argv: Sequence[str],
+    input: str = '',
+    time_limit: float = 2.0,
+    memory_limit: int = 256 * 1024,
+) -> Case:
+    """Run `argv` on `input` with a limit on CPU seconds and KB of memory.
+
+    The returned case has the CPU time in ms and peak memory in KB, and a
+    verdict only if the program did not exit normally.
+    """
+    with tempfile.TemporaryFile() as stdin, tempfile.TemporaryFile() as stdout:
+        with tempfile.TemporaryFile() as stderr:
+            stdin.write(input.encode())
+            stdin.seek(0)
+            status, cpu, memory, killed = _spawn(
+                argv, stdin, stdout, stderr, time_limit, memory_limit
+            )
+            stdout.seek(0)
+            output = stdout.read(OUTPUT_LIMIT).decode(errors='replace')
+            stderr.seek(0, os.SEEK_END)
+            stderr.seek(max(0, stderr.tell() - 2000))
+            error = stderr.read().decode(errors='replace')
+    case = Case(round(cpu * 1000), memory, input, output)
+    if killed or cpu > time_limit or status == -getattr(signal, 'SIGXCPU', 0):
+        case.verdict = Verdict.TIME_LIMIT_EXCEEDED
+    elif status == -getattr(signal, 'SIGXFSZ', 0):
+        case.verdict = Verdict.RUNTIME_ERROR
+        case.message = 'output limit exceeded'
+    elif memory > memory_limit or (
+        status and ('bad_alloc' in error or 'MemoryError' in error)
+    ):
+        case.verdict = Verdict.MEMORY_LIMIT_EXCEEDED
+    elif status:
+        case.verdict = Verdict.RUNTIME_ERROR
+        case.message = error or 'exit code %d' % status
+    return case
+
+
+def _spawn(argv, stdin, stdout, stderr, time_limit, memory_limit):
+    # returns the exit status (-signal if killed by one), CPU seconds, peak
+    # memory in KB and whether it ran out of wall time
+    wall = 2 * time_limit + 1
+    start = time.perf_counter()
+    if not hasattr(os, 'wait4'):
+        try:
+            p = subprocess.run(
+                argv, stdin=stdin, stdout=stdout, stderr=stderr, timeout=wall
+            )
+        except subprocess.TimeoutExpired:
+            return -signal.SIGTERM, time.perf_counter() - start, 0, True
+        return p.returncode, time.perf_counter() - start, 0, False
+    import resource
+
+    # limits are set by a shell that then runs the program: preexec_fn is
+    # not safe with several threads starting processes
+    script = 'ulimit -t %d; ulimit -f %d; ulimit -v %d 2>/dev/null; exec "$0" "$@"' % (
+        math.ceil(time_limit) + 1,
+        OUTPUT_LIMIT // 512,
+        memory_limit + 64 * 1024,  # address space, not memory
+    )
+    # a process's peak RSS starts at that of the process it was forked from,
+    # so it only tells about the program if above ours; otherwise use the
+    # program's own peak as sampled while it runs, 0 if it was too quick
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    program = b''.join(os.fsencode(arg) + b'\0' for arg in argv)
+    p = subprocess.Popen(
+        ['/bin/sh', '-c', script, *argv], stdin=stdin, stdout=stdout, stderr=stderr
+    )
+    killed = False
+    sampled = 0
+    while True:
+        pid, status, usage = os.wait4(p.pid, os.WNOHANG)
+        if pid:
+            break
+        sampled = max(sampled, _peak_rss(p.pid, program))
+        if not killed and time.perf_counter() - start > wall:
+            p.kill()
+            killed = True
+        time.sleep(0.002)
+    if os.WIFSIGNALED(status):
+        p.returncode = -os.WTERMSIG(status)
+    else:
+        p.returncode = os.WEXITSTATUS(status)
+    memory = usage.ru_maxrss
+    if sys.platform == 'darwin':  # bytes there
+        memory //= 1024
+        baseline //= 1024
+    if memory <= baseline:
+        memory = sampled
+    return p.returncode, usage.ru_utime + usage.ru_stime, memory, killed
+
+
+def _peak_rss(pid, program):
+    # only once the shell has run the program, before it is the shell or us
+    try:
+        with open('/proc/%d/cmdline' % pid, 'rb') as f:
+            if f.read() != program:
+                return 0
+        with open('/proc/%d/status' % pid) as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def test(
+    code: str,
+    lang: Language,
+    cases: Sequence[Tuple[str, str]],
+    time_limit: float = 2.0,
+    memory_limit: int = 256 * 1024,
+    jobs: Optional[int] = None,
+    eps: float = 1e-6,
+    cache: Optional[CompileCache] = None,
+) -> List[Case]:
+    """Compile `code` once and run it on the `(input, answer)` `cases` in
+    parallel, `jobs` at a time. Returns a judged `Case` for each, all with
+    COMPILATION_ERROR and the compiler's messages if it did not compile."""
+    with tempfile.TemporaryDirectory(prefix='submit-') as directory:
+        try:
+            argv = compile_code(code, lang, directory, cache)
+        except CompileError as e:
+            return [
+                Case(0, 0, input, None, answer, Verdict.COMPILATION_ERROR, str(e))
+                for input, answer in cases
+            ]
+
+        def check(sample):
+            input, answer = sample
+            case = run(argv, input, time_limit, memory_limit)
+            case.answer = answer
+            if case.verdict is None:
+                case.message = compare(case.output, answer, eps)
+                if case.message is None:
+                    case.verdict = Verdict.ACCEPTED
+                else:
+                    case.verdict = Verdict.WRONG_ANSWER
+            return case
+
+        with ThreadPoolExecutor(jobs or os.cpu_count() or 1) as pool:
+            return list(pool.map(check, cases))
@@ -0,0 +1,226 @@
+import contextlib
+import contextvars
+import json
+import math
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+__all__ = ['Histogram', 'Metrics', 'METRICS', 'operation', 'get_operation']
+
+_OPERATION = contextvars.ContextVar('operation', default='other')
+
+
+@contextlib.contextmanager
+def operation(name: str) -> Iterator[None]:
+    """Label the HTTP requests made inside the block with `name` (login,
+    csrf, submit, poll, problem, ...). The innermost label wins."""
+    token = _OPERATION.set(name)
+    try:
+        yield
+    finally:
+        _OPERATION.reset(token)
+
+
+def get_operation() -> str:
+    return _OPERATION.get()
+
+
+class Histogram:
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        total = 0
+        out = []
+        for le, n in zip(self.buckets + (math.inf,), self.counts):
+            total += n
+            out.append((le, total))
+        return out
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the `q` quantile by interpolating within its bucket."""
+        if not self.count:
+            return
+        rank = q * self.count
+        lower = 0.0
+        seen = 0
+        for le, n in zip(self.buckets, self.counts):
+            if n and seen + n >= rank:
+                return lower + (le - lower) * (rank - seen) / n
+            seen += n
+            lower = le
+        return self.buckets[-1]
+
+    def to_json(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': {
+                '+Inf' if le == math.inf else str(le): n for le, n in self.cumulative()
+            },
+        }
+
+
+class _Series:
+    def __init__(self) -> None:
+        self.status: Dict[str, int] = {}
+        self.sent = 0
+        self.received = 0
+        self.phases: Dict[str, Histogram] = {}
+
+
+class Metrics:
+    """HTTP request metrics per judge and operation, and the counters of
+    the disk caches (under `cache` in `to_json`).
+
+    Every request records its status and bytes sent and received, and the
+    seconds spent in each phase that could be measured: `connect` (DNS and
+    TCP) and `tls` when a new connection was opened, `ttfb` up to the
+    response headers, and `total` up to the end of the body.
+    """
+
+    PHASES = ('connect', 'tls', 'ttfb', 'total')
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._cache: Dict[Tuple[str, str], int] = {}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._cache.clear()
+
+    def count_cache(self, cache: str, event: str) -> None:
+        """Count a `submit.cache.DiskCache` event: hits, misses, refreshes
+        or errors."""
+        with self._lock:
+            self._cache[cache, event] = self._cache.get((cache, event), 0) + 1
+
+    def observe(
+        self,
+        judge: str,
+        operation: str,
+        status: str,
+        timings: Dict[str, float],
+        sent: int = 0,
+        received: int = 0,
+    ) -> None:
+        with self._lock:
+            series = self._series.get((judge, operation))
+            if series is None:
+                series = self._series[judge, operation] = _Series()
+            series.status[status] = series.status.get(status, 0) + 1
+            series.sent += sent
+            series.received += received
+            for phase, value in timings.items():
+                if phase not in series.phases:
+                    series.phases[phase] = Histogram()
+                series.phases[phase].observe(value)
+
+    def to_json(self):
+        out = {}
+        with self._lock:
+            for (judge, op), series in sorted(self._series.items()):
+                out.setdefault(judge, {})[op] = {
+                    'requests': dict(series.status),
+                    'sent_bytes': series.sent,
+                    'received_bytes': series.received,
+                    'seconds': {k: v.to_json() for k, v in series.phases.items()},
+                }
+            if self._cache:
+                out['cache'] = {}
+                for (cache, event), n in sorted(self._cache.items()):
+                    out['cache'].setdefault(cache, {})[event] = n
+        return out
+
+    def to_prometheus(self) -> str:
+        def labels(**kw):
+            return '{%s}' % ','.join(
+                '%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                for k, v in kw.items()
+            )
+
+        with self._lock:
+            items = sorted(self._series.items())
+            cache = sorted(self._cache.items())
+            lines = [
+                '# HELP submit_http_requests_total HTTP requests made to judges.',
+                '# TYPE submit_http_requests_total counter',
+            ]
+            for (judge, op), s in items:
+                for status, n in sorted(s.status.items()):
+                    lines.append(
+                        'submit_http_requests_total%s %d'
+                        % (labels(judge=judge, operation=op, status=status), n)
+                    )
+            for name, attr in [('sent', 'sent'), ('received', 'received')]:
+                lines.append(
+                    '# HELP submit_http_%s_bytes_total Bytes %s.' % (name, name)
+                )
+                lines.append('# TYPE submit_http_%s_bytes_total counter' % name)
+                for (judge, op), s in items:
+                    lines.append(
+                        'submit_http_%s_bytes_total%s %d'
+                        % (name, labels(judge=judge, operation=op), getattr(s, attr))
+                    )
+            lines.append(
+                '# HELP submit_http_request_seconds Time spent in each request phase.'
+            )
+            lines.append('# TYPE submit_http_request_seconds histogram')
+            for (judge, op), s in items:
+                for phase, h in sorted(s.phases.items()):
+                    kw = {'judge': judge, 'operation': op, 'phase': phase}
+                    for le, n in h.cumulative():
+                        le = '+Inf' if le == math.inf else repr(float(le))
+                        lines.append(
+                            'submit_http_request_seconds_bucket%s %d'
+                            % (labels(le=le, **kw), n)
+                        )
+                    lines.append(
+                        'submit_http_request_seconds_sum%s %r' % (labels(**kw), h.sum)
+                    )
+                    lines.append(
+                        'submit_http_request_seconds_count%s %d'
+                        % (labels(**kw), h.count)
+                    )
+            if cache:
+                lines.append(
+                    '# HELP submit_cache_events_total Disk cache hits, misses, '
+                    'refreshes and errors.'
+                )
+                lines.append('# TYPE submit_cache_events_total counter')
+            for (name, event), n in cache:
+                lines.append(
+                    'submit_cache_events_total%s %d'
+                    % (labels(cache=name, event=event), n)
+                )
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str) -> None:
+        """Write the metrics to `path`, as JSON if it ends with `.json` and
+        in the Prometheus text format otherwise."""
+        with open(path, 'w') as f:
+            if path.endswith('.json'):
+                json.dump(self.to_json(), f, indent=2)
+            else:
+                f.write(self.to_prometheus())
+
+
+METRICS = Metrics()
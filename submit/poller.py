@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from .submitter import Submitter
+
+if TYPE_CHECKING:
+    from .base import Submission, SubmitterBase
+
+__all__ = ['Pending', 'Poller']
+
+
+class Pending:
+    def __init__(
+        self,
+        oj: str,
+        id: str,
+        callback: Optional[Callable[['Pending'], Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.oj = oj
+        self.id = id
+        self.callback = callback
+        self.timeout = timeout
+        self.start = time.monotonic()
+        self.polls = 0
+        self.errors = 0
+        self.submission: Optional['Submission'] = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def __repr__(self):
+        return 'Pending(%r, %r, polls=%d)' % (self.oj, self.id, self.polls)
+
+
+class Poller:
+    """Waits for many submissions on any judges from a single loop.
+
+    Each submission is polled on its own schedule, taken from the judge's
+    `poll_delay`: quickly at first and while tests are running, backing off
+    with jitter while it waits in the queue. Finished submissions are passed
+    to their callback and yielded by iterating over the poller.
+    """
+
+    def __init__(
+        self,
+        submitter: Submitter,
+        on_pending: Optional[Callable[[Pending], Any]] = None,
+        max_errors: int = 3,
+    ) -> None:
+        self.submitter = submitter
+        self.on_pending = on_pending
+        self.max_errors = max_errors
+        self._queue: List[Tuple[float, int, Pending]] = []
+        self._seq = itertools.count()
+        self._done: List[Pending] = []
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def add(
+        self,
+        oj: Union[Type['SubmitterBase'], str],
+        id: str,
+        callback: Optional[Callable[[Pending], Any]] = None,
+        timeout: Optional[float] = None,
+        delay: float = 0,
+    ) -> Pending:
+        if not isinstance(oj, str):
+            oj = oj.name
+        pending = Pending(oj, id, callback, timeout)
+        self._push(pending, delay)
+        return pending
+
+    def _push(self, pending: Pending, delay: float) -> None:
+        heapq.heappush(
+            self._queue, (time.monotonic() + delay, next(self._seq), pending)
+        )
+
+    def _finish(self, pending: Pending) -> None:
+        if pending.callback is not None:
+            pending.callback(pending)
+        self._done.append(pending)
+
+    def _check(self, pending: Pending) -> None:
+        judge = self.submitter.get_oj(pending.oj)
+        pending.polls += 1
+        try:
+            pending.submission = self.submitter.get_submission(pending.oj, pending.id)
+        except Exception as e:
+            pending.errors += 1
+            if pending.errors >= self.max_errors:
+                pending.error = e
+                self._finish(pending)
+                return
+        else:
+            pending.errors = 0
+            if pending.submission is not None:
+                self._finish(pending)
+                return
+        if pending.timeout is not None and pending.elapsed > pending.timeout:
+            pending.error = TimeoutError('no verdict after %.1fs' % pending.elapsed)
+            self._finish(pending)
+            return
+        if self.on_pending is not None:
+            self.on_pending(pending)
+        self._push(pending, judge.poll_delay(pending.id, pending.polls - 1))
+
+    def poll(self, block: bool = True) -> List[Pending]:
+        """Check every submission that is due and return the finished ones.
+
+        With `block`, first sleep until the earliest one is due.
+        """
+        if block and self._queue:
+            wait = self._queue[0][0] - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        now = time.monotonic()
+        while self._queue and self._queue[0][0] <= now:
+            self._check(heapq.heappop(self._queue)[2])
+        done, self._done = self._done, []
+        return done
+
+    def __iter__(self) -> Iterator[Pending]:
+        while self._queue:
+            yield from self.poll()
+
+    def wait(self) -> List[Pending]:
+        return list(self)
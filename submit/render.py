@@ -0,0 +1,318 @@
+import functools
+import html
+import re
+from typing import List
+
+__all__ = ['markdown_to_html', 'html_to_markdown']
+
+MATH_RE = re.compile(r'(?P<s>\${1,3})(.*?)(?P=s)')
+
+_FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})\s*([^`\s]*)[^`]*$')
+_HEADING_RE = re.compile(r'^ {0,3}(#{1,6})(?:\s+(.*?))?(?:\s+#+)?\s*$')
+_HR_RE = re.compile(r'^ {0,3}([-*_])(?:\s*\1){2,}\s*$')
+_QUOTE_RE = re.compile(r'^ {0,3}> ?(.*)$')
+_ITEM_RE = re.compile(r'^ {0,3}(?:([-*+])|(\d{1,9})[.)])\s+(.*)$')
+_TABLE_SEP_RE = re.compile(r'^\s*\|?\s*:?-+:?\s*(?:\|\s*:?-+:?\s*)*\|?\s*$')
+
+_PROTECT_RE = re.compile(
+    r'(?P<code>(?P<ticks>`+)(?P<codetext>.+?)(?P=ticks))'
+    r'|(?P<math>\$\$.+?\$\$|\$[^$\n]+?\$)'
+    r'|(?P<escape>\\[\\`*_{}\[\]()#+\-.!$|<>])'
+    r'|(?P<tag></?[A-Za-z][^<>]*>|&(?:#?\w+);)',
+    re.S,
+)
+_IMAGE_RE = re.compile(r'!\[([^\]]*)\]\(\s*(\S+?)\s*\)')
+_LINK_RE = re.compile(r'\[([^\]]+)\]\(\s*(\S+?)\s*\)')
+_STRONG_RE = re.compile(r'\*\*(?=\S)(.+?)(?<=\S)\*\*|\b__(?=\S)(.+?)(?<=\S)__\b')
+_EM_RE = re.compile(r'\*(?=\S)(.+?)(?<=\S)\*|\b_(?=\S)(.+?)(?<=\S)_\b')
+_PLACEHOLDER_RE = re.compile('\x00(\\d+)\x00')
+# raw HTML is escaped except for these tags without attributes, as in the
+# sanitized output of the GitHub API this replaces
+_SAFE_TAG_RE = re.compile(
+    r'</?(?:b|br|code|del|em|i|kbd|s|strong|sub|sup|u)\s*/?>', re.I
+)
+_UNSAFE_URL_RE = re.compile(r'(?:javascript|vbscript|data):', re.I)
+
+
+def _inline(text: str) -> str:
+    saved: List[str] = []
+
+    def protect(match):
+        if match.group('code'):
+            value = '<code>%s</code>' % html.escape(match.group('codetext').strip())
+        elif match.group('math'):
+            value = html.escape(match.group('math'), False)
+        elif match.group('escape'):
+            value = html.escape(match.group('escape')[1], False)
+        elif match.group('tag')[0] == '&' or _SAFE_TAG_RE.fullmatch(match.group(0)):
+            value = match.group('tag')
+        else:
+            value = html.escape(match.group('tag'))
+        saved.append(value)
+        return '\x00%d\x00' % (len(saved) - 1)
+
+    def restore(text):
+        while '\x00' in text:
+            text = _PLACEHOLDER_RE.sub(lambda m: saved[int(m[1])], text)
+        return text
+
+    def attr(text):
+        # text is escaped already, but not for use inside quotes
+        return html.escape(html.unescape(restore(text)))
+
+    def url(text):
+        text = html.unescape(restore(text))
+        # browsers skip control characters and spaces inside the scheme
+        if _UNSAFE_URL_RE.match(re.sub(r'[\x00-\x20]', '', text)):
+            return None
+        return html.escape(text)
+
+    def image(match):
+        src = url(match[2])
+        if src is None:
+            return match[1]
+        return '<img src="%s" alt="%s" />' % (src, attr(match[1]))
+
+    def link(match):
+        href = url(match[2])
+        if href is None:
+            return match[1]
+        return '<a href="%s">%s</a>' % (href, match[1])
+
+    text = html.escape(_PROTECT_RE.sub(protect, text), False)
+    text = _IMAGE_RE.sub(image, text)
+    text = _LINK_RE.sub(link, text)
+    text = _STRONG_RE.sub(lambda m: '<strong>%s</strong>' % (m[1] or m[2]), text)
+    text = _EM_RE.sub(lambda m: '<em>%s</em>' % (m[1] or m[2]), text)
+    text = re.sub(r'(?: {2,}|\\)\n', '<br />\n', text)
+    return restore(text)
+
+
+def _cells(line: str) -> List[str]:
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [x.strip() for x in line.split('|')]
+
+
+def _starts_block(line: str) -> bool:
+    return bool(
+        _FENCE_RE.match(line)
+        or _HEADING_RE.match(line)
+        or _HR_RE.match(line)
+        or _QUOTE_RE.match(line)
+        or _ITEM_RE.match(line)
+        or line.lstrip().startswith('$$')
+    )
+
+
+def _blocks(lines: List[str]) -> List[str]:
+    out = []
+    i = 0
+    n = len(lines)
+    while i < n:
+        line = lines[i]
+        if not line.strip():
+            i += 1
+            continue
+        match = _FENCE_RE.match(line)
+        if match:
+            fence, lang = match.groups()
+            i += 1
+            code = []
+            while i < n and not lines[i].strip().startswith(fence):
+                code.append(lines[i])
+                i += 1
+            i += 1
+            attr = ' class="language-%s"' % html.escape(lang) if lang else ''
+            out.append(
+                '<pre><code%s>%s\n</code></pre>'
+                % (attr, html.escape('\n'.join(code), False))
+            )
+            continue
+        stripped = line.strip()
+        if stripped.startswith('$$'):
+            math = [line]
+            closed = len(stripped) >= 4 and stripped.endswith('$$')
+            while not closed and i + 1 < n:
+                i += 1
+                math.append(lines[i])
+                closed = lines[i].rstrip().endswith('$$')
+            i += 1
+            out.append('<p>%s</p>' % html.escape('\n'.join(math).strip(), False))
+            continue
+        match = _HEADING_RE.match(line)
+        if match:
+            level = len(match.group(1))
+            out.append('<h%d>%s</h%d>' % (level, _inline(match.group(2) or ''), level))
+            i += 1
+            continue
+        if _HR_RE.match(line):
+            out.append('<hr />')
+            i += 1
+            continue
+        if _QUOTE_RE.match(line):
+            quote = []
+            while i < n and _QUOTE_RE.match(lines[i]):
+                quote.append(_QUOTE_RE.match(lines[i]).group(1))
+                i += 1
+            out.append('<blockquote>\n%s\n</blockquote>' % '\n'.join(_blocks(quote)))
+            continue
+        match = _ITEM_RE.match(line)
+        if match:
+            ordered = match.group(2) is not None
+            items = []
+            while i < n:
+                match = _ITEM_RE.match(lines[i])
+                if match and (match.group(2) is not None) == ordered:
+                    items.append([match.group(3)])
+                elif lines[i].strip() and lines[i][:1] in ' \t':
+                    items[-1].append(lines[i].strip())
+                elif (
+                    not lines[i].strip() and i + 1 < n and _ITEM_RE.match(lines[i + 1])
+                ):
+                    pass
+                else:
+                    break
+                i += 1
+            tag = 'ol' if ordered else 'ul'
+            out.append(
+                '<%s>\n%s\n</%s>'
+                % (
+                    tag,
+                    '\n'.join('<li>%s</li>' % _inline('\n'.join(x)) for x in items),
+                    tag,
+                )
+            )
+            continue
+        if '|' in line and i + 1 < n and _TABLE_SEP_RE.match(lines[i + 1]):
+            head = _cells(line)
+            i += 2
+            rows = []
+            while i < n and '|' in lines[i] and lines[i].strip():
+                rows.append(_cells(lines[i]))
+                i += 1
+            out.append(
+                '<table>\n<thead>\n<tr>%s</tr>\n</thead>\n<tbody>\n%s\n</tbody>\n</table>'
+                % (
+                    ''.join('<th>%s</th>' % _inline(x) for x in head),
+                    '\n'.join(
+                        '<tr>%s</tr>' % ''.join('<td>%s</td>' % _inline(x) for x in r)
+                        for r in rows
+                    ),
+                )
+            )
+            continue
+        para = [line]
+        i += 1
+        while i < n and lines[i].strip() and not _starts_block(lines[i]):
+            para.append(lines[i])
+            i += 1
+        out.append('<p>%s</p>' % _inline('\n'.join(para).strip()))
+    return out
+
+
+@functools.lru_cache(maxsize=256)
+def markdown_to_html(text: str) -> str:
+    """Render the Markdown the judges use to HTML, without the network.
+
+    Covers headings, paragraphs, lists, block quotes, tables, code fences and
+    inline formatting. `$...$` and `$$...$$` math is left untouched for
+    MathJax/KaTeX, so `_` and `*` inside formulas are not read as emphasis.
+    """
+    return '\n'.join(_blocks(text.replace('\r\n', '\n').split('\n'))) + '\n'
+
+
+def _is_inline(args, kwargs) -> bool:
+    # markdownify passes convert_as_inline before 0.14 and parent_tags after
+    if 'parent_tags' in kwargs:
+        return '_inline' in kwargs['parent_tags']
+    arg = args[0] if args else kwargs.get('convert_as_inline', False)
+    return arg if isinstance(arg, bool) else '_inline' in arg
+
+
+@functools.lru_cache(maxsize=None)
+def _converter():
+    import markdownify
+
+    class Converter(markdownify.MarkdownConverter):
+        def convert_div(self, el, text, *args, **kwargs):
+            if _is_inline(args, kwargs):
+                return text
+            clazz = el.attrs.get('class', [])
+            if 'section-title' in clazz:
+                return self._heading(3, el, text, *args, **kwargs)
+            if 'title' in clazz:
+                return self._heading(2, el, text, *args, **kwargs)
+            if 'property-title' in clazz:
+                return self.convert_b(el, text, *args, **kwargs) + ' '
+            return text + '\n'
+
+        def _heading(self, n, el, text, *args, **kwargs):
+            # markdownify's heading converter is convert_hn before 0.14,
+            # _convert_hn until 1.1 and convert_hN since
+            for name in ('convert_hN', '_convert_hn', 'convert_hn'):
+                if hasattr(self, name):
+                    return getattr(self, name)(n, el, text, *args, **kwargs)
+            return getattr(self, 'convert_h%d' % n)(el, text, *args, **kwargs)
+
+        def convert_code(self, el, text, *args, **kwargs):
+            if MATH_RE.match(text):
+                return text
+            if el.find_parent('pre') is not None:
+                return text
+            return super().convert_code(el, text, *args, **kwargs)
+
+    return Converter(heading_style='atx')
+
+
+def _rewrite(soup, node, pre=False, code=False):
+    # one walk turns <var>x</var> and $x$ into <code>$x$</code> (or plain
+    # $x$ inside <pre>), building the new nodes in place
+    from bs4 import NavigableString, Tag
+
+    for c in list(node.children):
+        if isinstance(c, Tag):
+            name = c.name.lower()
+            if name == 'var':
+                math = '$%s$' % c.get_text()
+                if pre:
+                    c.replace_with(NavigableString(math))
+                else:
+                    new = soup.new_tag('code')
+                    new.string = math
+                    c.replace_with(new)
+            else:
+                _rewrite(soup, c, pre or name == 'pre', code or name == 'code')
+        elif type(c) is NavigableString and not (pre or code) and '$' in c:
+            parts = []
+            last = 0
+            for match in MATH_RE.finditer(c):
+                parts.append(NavigableString(c[last : match.start()]))
+                new = soup.new_tag('code')
+                new.string = '$%s$' % match.group(2)
+                parts.append(new)
+                last = match.end()
+            if not parts:
+                continue
+            parts.append(NavigableString(c[last:]))
+            c.replace_with(*[x for x in parts if x != ''])
+
+
+@functools.lru_cache(maxsize=256)
+def html_to_markdown(text: str) -> str:
+    """Convert a judge's HTML statement to Markdown, keeping math as `$x$`.
+
+    Needs markdownify; results are memoized per statement text.
+    """
+    from .util import parse_html
+
+    conv = _converter()
+    soup = parse_html('<div>%s</div>' % text)
+    div = soup.div
+    _rewrite(soup, div)
+    if hasattr(conv, 'convert_soup'):
+        return conv.convert_soup(div)
+    return conv.convert(str(div))
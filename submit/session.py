@@ -0,0 +1,292 @@
+import http.client
+import os
+import socket
+import threading
+import time
+import urllib.parse
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from .metrics import METRICS, get_operation
+
+__all__ = ['Wrapper', 'Adapter', 'RedirectAdapter', 'ResetRetry', 'Transport']
+
+# probe idle connections so that the judges' load balancers keep them open
+KEEPALIVE_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+]
+for _name, _value in [('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3)]:
+    if hasattr(socket, _name):
+        KEEPALIVE_OPTIONS.append((socket.IPPROTO_TCP, getattr(socket, _name), _value))
+
+_RESET_ERRORS = (
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+    http.client.RemoteDisconnected,
+)
+
+# phases of the connection opened by the current request, if any
+_connection = threading.local()
+
+
+class _TimedConnect:
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            _connection.connect = time.perf_counter() - start
+
+
+class _TimedHTTPConnection(_TimedConnect, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnect, HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+        _connection.tls = max(0.0, elapsed - getattr(_connection, 'connect', 0.0))
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class ResetRetry(Retry):
+    """Retries a request only when its connection was reset or dropped, as
+    happens to kept-alive connections the server already closed. Requests
+    that may have reached the judge are only retried if idempotent, so a
+    submission is never sent twice."""
+
+    @staticmethod
+    def _is_reset(error):
+        seen = set()
+        while error is not None and id(error) not in seen:
+            seen.add(id(error))
+            if isinstance(error, _RESET_ERRORS):
+                return True
+            error = next(
+                (x for x in error.args if isinstance(x, BaseException)),
+                error.__cause__ or error.__context__,
+            )
+        return False
+
+    def increment(self, method=None, url=None, response=None, error=None, **kwargs):
+        if error is None or not self._is_reset(error):
+            # anything else fails right away, as with requests' defaults
+            retry = Retry(0, read=False)
+            return retry.increment(method, url, response, error, **kwargs)
+        return super().increment(method, url, response, error, **kwargs)
+
+
+class Adapter(HTTPAdapter):
+    """HTTPAdapter that times each request and counts its bytes.
+
+    The response gets `timings` (seconds spent connecting, in the TLS
+    handshake, to the first byte and in total), `sent_bytes` and
+    `received_bytes`. Connection phases only appear for requests that had to
+    open a new connection, and `total` only when the body is not streamed.
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ['socket_options']
+
+    def __init__(self, socket_options=None, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs['socket_options'] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+    def _connect_url(self, url):
+        return url
+
+    def warm(self, url, connections=1, verify=True, proxies=None, cert=None):
+        """Open up to `connections` connections (with the TLS handshake) to
+        the host of `url`, and leave them idle in the pool. Returns how many
+        were opened. Pass the session's `verify`, `proxies` and `cert`, or
+        requests will look for the connections in another pool."""
+        request = requests.Request('GET', self._connect_url(url)).prepare()
+        if hasattr(self, 'get_connection_with_tls_context'):
+            pool = self.get_connection_with_tls_context(request, verify, proxies, cert)
+        else:
+            pool = self.get_connection(request.url, proxies)
+        conns = [pool._get_conn() for _ in range(connections)]
+        opened = 0
+        try:
+            for conn in conns:
+                if not conn.is_connected:
+                    conn.connect()
+                    opened += 1
+        finally:
+            for conn in conns:
+                pool._put_conn(conn)
+        return opened
+
+    def send(self, request, **kwargs):
+        vars(_connection).clear()
+        start = time.perf_counter()
+        r = super().send(request, **kwargs)
+        r.timings = dict(vars(_connection), ttfb=time.perf_counter() - start)
+        body = request.body or b''
+        r.sent_bytes = len(body.encode() if isinstance(body, str) else body) + sum(
+            len(k) + len(v) + 4 for k, v in request.headers.items()
+        )
+        r.received_bytes = 0
+        if not kwargs.get('stream'):
+            r.received_bytes = len(r.content)
+            r.timings['total'] = time.perf_counter() - start
+            tell = getattr(r.raw, 'tell', None)
+            if tell is not None:
+                r.received_bytes = tell() or r.received_bytes
+        return r
+
+
+class RedirectAdapter(Adapter):
+    """Sends every request to the server at `target` instead, with the judge's
+    host in the `Host` header. Responses, redirects and cookies still see the
+    URLs the judge asked for, so the judges need no changes."""
+
+    __attrs__ = Adapter.__attrs__ + ['target']
+
+    def __init__(self, target, **kwargs):
+        self.target = target.rstrip('/')
+        super().__init__(**kwargs)
+
+    def _connect_url(self, url):
+        parts = urllib.parse.urlsplit(url)
+        return self.target + urllib.parse.urlunsplit(
+            ('', '', parts.path or '/', parts.query, '')
+        )
+
+    def send(self, request, **kwargs):
+        url = request.url
+        request.url = self._connect_url(url)
+        request.headers['Host'] = urllib.parse.urlsplit(url).netloc
+        try:
+            r = super().send(request, **kwargs)
+        finally:
+            request.url = url
+            del request.headers['Host']
+        r.url = url
+        return r
+
+
+class Transport:
+    """Connection pools shared by the sessions of all judges in a `Submitter`.
+
+    Up to `pool_maxsize` connections per host are kept alive, or
+    `pool_sizes[host]` for the hosts listed there. Connections get TCP
+    keep-alive probes, and requests are retried `retries` times when their
+    connection is reset (see `ResetRetry`) and never otherwise.
+    """
+
+    def __init__(
+        self,
+        pool_maxsize: int = 16,
+        pool_sizes: Optional[Dict[str, int]] = None,
+        retries: int = 2,
+        keepalive: bool = True,
+    ) -> None:
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.keepalive = keepalive
+        self._target = os.environ.get('SUBMIT_REDIRECT')
+        self.default = self._adapter(pool_maxsize)
+        self.hosts = {
+            host: self._adapter(size) for host, size in (pool_sizes or {}).items()
+        }
+
+    def _adapter(self, maxsize):
+        kwargs = {
+            'pool_maxsize': maxsize,
+            'max_retries': ResetRetry(self.retries, redirect=False),
+            'socket_options': KEEPALIVE_OPTIONS if self.keepalive else None,
+        }
+        if self._target:
+            return RedirectAdapter(self._target, **kwargs)
+        return Adapter(**kwargs)
+
+    def mount(self, session: requests.Session) -> None:
+        """Make `session` use the shared pools."""
+        for scheme in ['http://', 'https://']:
+            session.mount(scheme, self.default)
+            for host, adapter in self.hosts.items():
+                session.mount('%s%s/' % (scheme, host), adapter)
+
+    def close(self) -> None:
+        self.default.close()
+        for adapter in self.hosts.values():
+            adapter.close()
+
+
+class Wrapper(requests.Session):
+    """Session that records every request in `metrics`, labelled with its
+    judge and the current `submit.metrics.operation`.
+
+    `revalidate` can be set to `(url, headers)` to add conditional headers
+    such as If-None-Match to the next request for a URL starting with `url`.
+    """
+
+    __attrs__ = requests.Session.__attrs__ + ['judge']
+    metrics = METRICS
+    revalidate: Optional[Tuple[str, Dict[str, str]]] = None
+
+    def __init__(self, judge='unknown'):
+        super().__init__()
+        self.judge = judge
+        self.mount('http://', Adapter())
+        self.mount('https://', Adapter())
+        self.hooks['response'].append(self._record)
+        target = os.environ.get('SUBMIT_REDIRECT')
+        if target:
+            self.redirect(target)
+
+    def redirect(self, target):
+        """Send all requests to a stand-in judge server at `target`."""
+        adapter = RedirectAdapter(target)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def _record(self, r, *args, **kwargs):
+        timings = getattr(r, 'timings', None)
+        if timings is not None:
+            self.metrics.observe(
+                self.judge,
+                get_operation(),
+                str(r.status_code),
+                timings,
+                r.sent_bytes,
+                r.received_bytes,
+            )
+
+    def send(self, request, **kwargs):
+        if self.revalidate is not None and request.url.startswith(self.revalidate[0]):
+            for name, value in self.revalidate[1].items():
+                request.headers.setdefault(name, value)
+            self.revalidate = None
+        try:
+            return super().send(request, **kwargs)
+        except requests.RequestException as e:
+            # redirects are sent from inside the first send; count once
+            if not getattr(e, '_recorded', False):
+                e._recorded = True
+                self.metrics.observe(self.judge, get_operation(), 'error', {})
+            raise
@@ -0,0 +1,553 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .base import (
+    LANGUAGES,
+    Blob,
+    Case,
+    Language,
+    Problem,
+    Submission,
+    TextType,
+    Verdict,
+)
+from .cache import get_cache_dir
+
+__all__ = ['ProblemStore', 'SessionStore', 'HistoryStore']
+
+
+def _number(value):
+    # REAL columns give back floats, even for what was stored as an int
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class ProblemStore:
+    """SQLite store of problem statements keyed by `(judge, problem id)`.
+
+    Entries younger than `ttl` seconds are used as is. Older ones are
+    revalidated with ETag/Last-Modified when the judge sent them, and
+    refetched otherwise.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 24 * 60 * 60):
+        if path is None:
+            path = os.path.join(get_cache_dir(), 'problems.sqlite')
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS problems ('
+                'judge TEXT NOT NULL, id TEXT NOT NULL, text TEXT NOT NULL, '
+                'texttype INTEGER NOT NULL, cases TEXT, url TEXT, etag TEXT, '
+                'last_modified TEXT, fetched REAL NOT NULL, '
+                'PRIMARY KEY (judge, id))'
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+    def get(self, judge: str, id: str) -> Optional[Tuple[Problem, Dict[str, Any]]]:
+        """Return the stored problem and its `url`, `etag`, `last_modified`
+        (the validators of the page it came from) and `age`."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT text, texttype, cases, url, etag, last_modified, fetched '
+                'FROM problems WHERE judge = ? AND id = ?',
+                (judge, id),
+            ).fetchone()
+        if row is None:
+            return
+        text, texttype, cases, url, etag, last_modified, fetched = row
+        if cases is not None:
+            cases = [tuple(x) for x in json.loads(cases)]
+        problem = Problem(id, text, TextType(texttype), cases)
+        return problem, {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'age': time.time() - fetched,
+        }
+
+    def put(
+        self,
+        judge: str,
+        id: str,
+        problem: Problem,
+        url: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        cases = None if problem.cases is None else json.dumps(problem.cases)
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO problems VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    judge,
+                    id,
+                    problem.text,
+                    int(problem.texttype),
+                    cases,
+                    url,
+                    etag,
+                    last_modified,
+                    time.time(),
+                ),
+            )
+
+    def touch(self, judge: str, id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                'UPDATE problems SET fetched = ? WHERE judge = ? AND id = ?',
+                (time.time(), judge, id),
+            )
+
+    def delete(self, judge: str, id: str) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                'DELETE FROM problems WHERE judge = ? AND id = ?', (judge, id)
+            )
+
+
+_MISSING = object()
+
+
+def _merge(base: Any, mine: Any, theirs: Any) -> Any:
+    # three-way merge: keep what this process changed since it loaded
+    # `base`, and take everything else from what is stored now
+    if mine == base:
+        return theirs
+    if base is _MISSING and isinstance(mine, dict) and isinstance(theirs, dict):
+        base = {}
+    if not all(isinstance(x, dict) for x in (base, mine, theirs)):
+        return mine
+    out = {}
+    for key in set(mine) | set(theirs) | set(base):
+        value = _merge(
+            base.get(key, _MISSING), mine.get(key, _MISSING), theirs.get(key, _MISSING)
+        )
+        if value is not _MISSING:
+            out[key] = value
+    return out
+
+
+class SessionStore:
+    """SQLite store of the judges' sessions (`SubmitterBase.dump()`), one row
+    per judge, so that each judge is read only when it is used.
+
+    Several processes can share one store: `put` merges the session with the
+    stored one, keeping the other processes' changes (new cookies, say) to
+    whatever this process did not change itself.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.submitter.sess')
+        self.path = path
+        self._lock = threading.Lock()
+        old = self._read_json(path)
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if old is not None:
+            # sessions used to be one JSON file; convert it in place
+            tmp = '%s.%d.tmp' % (path, os.getpid())
+            self._open(tmp)
+            for judge, data in old.get('ojs', {}).items():
+                self.put(judge, data)
+            self._db.close()
+            os.replace(tmp, path)
+        self._open(path)
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path, 'rb') as f:
+                if f.read(1) != b'{':
+                    return
+                f.seek(0)
+                return json.load(f)
+        except (OSError, ValueError):
+            return
+
+    def _open(self, path):
+        self._db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'judge TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)'
+        )
+
+    def close(self) -> None:
+        self._db.close()
+
+    def judges(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute('SELECT judge FROM sessions ORDER BY judge')
+            return [x for x, in rows]
+
+    def get(self, judge: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                'SELECT data FROM sessions WHERE judge = ?', (judge,)
+            ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(
+        self, judge: str, data: Dict[str, Any], base: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Store `data` as the session of `judge` and return what was stored.
+
+        With `base`, the session `data` started from, only the changes from
+        `base` to `data` are applied to the stored session; without it,
+        `data` replaces it.
+        """
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                if base is not None:
+                    row = self._db.execute(
+                        'SELECT data FROM sessions WHERE judge = ?', (judge,)
+                    ).fetchone()
+                    if row is not None:
+                        data = _merge(base, data, json.loads(row[0]))
+                self._db.execute(
+                    'INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)',
+                    (judge, json.dumps(data), time.time()),
+                )
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+        return data
+
+    def delete(self, judge: str) -> None:
+        with self._lock:
+            self._db.execute('DELETE FROM sessions WHERE judge = ?', (judge,))
+
+
+class HistoryStore:
+    """SQLite store of past submissions and their test cases.
+
+    `Submitter` adds a row when it submits code and fills in the verdict when
+    the judge has one. Rows are indexed by judge, problem, verdict and time,
+    so `query` and `summary` stay fast with hundreds of thousands of them.
+    """
+
+    # what `summary` can group by: the group's name and the GROUP BY terms,
+    # which the indexes below can serve in order
+    GROUPS = {
+        'judge': ('judge', 'judge'),
+        'problem': ("judge || ':' || coalesce(problem, '')", 'judge, problem'),
+        'verdict': ("coalesce(verdict, 'PENDING')", 'verdict'),
+        'lang': ("coalesce(lang, '')", 'lang'),
+        'day': ("date(submitted, 'unixepoch', 'localtime')", '1'),
+    }
+    # a submission with no verdict after this many seconds is taken to have
+    # been lost (its polling timed out or crashed), and `find` skips it
+    PENDING_TTL = 30 * 60
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        if path is None:
+            path = os.path.join(get_cache_dir(), 'history.sqlite')
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+        with self._db:
+            self._db.executescript(
+                'CREATE TABLE IF NOT EXISTS submissions ('
+                'judge TEXT NOT NULL, id TEXT NOT NULL, problem TEXT, lang TEXT, '
+                'code TEXT, verdict TEXT, ac INTEGER, score INTEGER, time REAL, '
+                'memory REAL, data TEXT, submitted REAL NOT NULL, judged REAL, '
+                'code_hash TEXT, PRIMARY KEY (judge, id));'
+                # these also cover the columns `summary` aggregates
+                'CREATE INDEX IF NOT EXISTS submissions_problem '
+                'ON submissions (judge, problem, submitted, ac, time, memory);'
+                'CREATE INDEX IF NOT EXISTS submissions_verdict '
+                'ON submissions (verdict, submitted, ac, time, memory);'
+                'CREATE INDEX IF NOT EXISTS submissions_submitted '
+                'ON submissions (submitted);'
+                'CREATE TABLE IF NOT EXISTS cases ('
+                'judge TEXT NOT NULL, id TEXT NOT NULL, n INTEGER NOT NULL, '
+                'time REAL, memory REAL, verdict TEXT, input TEXT, output TEXT, '
+                'answer TEXT, message TEXT, '
+                'PRIMARY KEY (judge, id, n)) WITHOUT ROWID;'
+            )
+            columns = [
+                row[1] for row in self._db.execute('PRAGMA table_info(submissions)')
+            ]
+            if 'code_hash' not in columns:  # made before there was one
+                self._db.execute('ALTER TABLE submissions ADD COLUMN code_hash TEXT')
+            self._db.execute(
+                'CREATE INDEX IF NOT EXISTS submissions_code '
+                'ON submissions (judge, problem, lang, code_hash, submitted)'
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+    @staticmethod
+    def code_hash(code: str) -> str:
+        """The hash of `code` ignoring line endings, trailing whitespace and
+        blank lines at either end, which do not make it a different program."""
+        lines = [line.rstrip() for line in code.strip().splitlines()]
+        return hashlib.sha256('\n'.join(lines).encode()).hexdigest()
+
+    @staticmethod
+    def _lang_name(lang):
+        if lang is None:
+            return
+        return next((k for k, v in LANGUAGES.items() if v == lang), lang.name)
+
+    def add(
+        self,
+        judge: str,
+        id: str,
+        problem: Optional[str] = None,
+        code: Optional[str] = None,
+        lang: Optional[Language] = None,
+    ) -> None:
+        """Record that submission `id` was just sent, before it has a verdict."""
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT OR IGNORE INTO submissions (judge, id, problem, lang, code, '
+                'code_hash, submitted) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    judge,
+                    id,
+                    problem,
+                    self._lang_name(lang),
+                    code,
+                    None if code is None else self.code_hash(code),
+                    time.time(),
+                ),
+            )
+
+    def find(
+        self, judge: str, problem: str, code: str, lang: Language
+    ) -> Optional[Dict[str, Any]]:
+        """The newest submission of the same `code` to the same problem, as
+        in `query`, or None. Ones judged UNKNOWN are not counted, nor ones
+        still without a verdict `PENDING_TTL` seconds after submitting."""
+        with self._lock:
+            cursor = self._db.execute(
+                'SELECT judge, id, problem, lang, verdict, ac, score, time, memory, '
+                'submitted, judged FROM submissions WHERE judge = ? AND problem = ? '
+                'AND lang = ? AND code_hash = ? '
+                "AND (verdict != 'UNKNOWN' OR verdict IS NULL AND submitted >= ?) "
+                'ORDER BY submitted DESC LIMIT 1',
+                (
+                    judge,
+                    problem,
+                    self._lang_name(lang),
+                    self.code_hash(code),
+                    time.time() - self.PENDING_TTL,
+                ),
+            )
+            names = [x[0] for x in cursor.description]
+            row = cursor.fetchone()
+        return None if row is None else dict(zip(names, row))
+
+    def put(self, judge: str, submission: Submission, id: Optional[str] = None) -> None:
+        """Record the verdict and test cases of a judged submission.
+
+        `id` is the ID the submission was polled with, if that is not
+        `submission.id` (USACO training gives the problem ID there).
+        """
+        sub = submission
+        if id is None:
+            id = sub.id
+        data = None if sub.data is None else json.dumps(sub.data, default=str)
+        cases = [
+            (
+                judge,
+                id,
+                n,
+                case.time,
+                case.memory,
+                None if case.verdict is None else case.verdict.name,
+                case.input,
+                case.output,
+                case.answer,
+                case.message,
+            )
+            for n, case in enumerate(sub.cases or [], 1)
+        ]
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                'INSERT INTO submissions (judge, id, problem, code, verdict, ac, '
+                'score, time, memory, data, submitted, judged) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (judge, id) DO UPDATE SET '
+                'problem = coalesce(excluded.problem, problem), '
+                'code = coalesce(excluded.code, code), verdict = excluded.verdict, '
+                'ac = excluded.ac, score = excluded.score, time = excluded.time, '
+                'memory = excluded.memory, data = excluded.data, '
+                'judged = excluded.judged',
+                (
+                    judge,
+                    id,
+                    sub.problem,
+                    sub.code,
+                    sub.verdict.name,
+                    int(not (sub.verdict.value & 255)),
+                    sub.score,
+                    sub.time,
+                    sub.memory,
+                    data,
+                    now,
+                    now,
+                ),
+            )
+            self._db.execute(
+                'DELETE FROM cases WHERE judge = ? AND id = ?', (judge, id)
+            )
+            self._db.executemany(
+                'INSERT INTO cases VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', cases
+            )
+
+    def get(self, judge: str, id: str) -> Optional[Submission]:
+        """The stored submission. The inputs, outputs, answers and messages
+        of its cases stay in the database until they are used."""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT problem, code, verdict, score, time, memory, data '
+                'FROM submissions WHERE judge = ? AND id = ?',
+                (judge, id),
+            ).fetchone()
+            if row is None:
+                return
+            cases = self._db.execute(
+                'SELECT n, time, memory, verdict, input IS NOT NULL, '
+                'output IS NOT NULL, answer IS NOT NULL, message IS NOT NULL '
+                'FROM cases WHERE judge = ? AND id = ? ORDER BY n',
+                (judge, id),
+            ).fetchall()
+        problem, code, verdict, score, tim, memory, data = row
+        return Submission(
+            id,
+            Verdict.UNKNOWN if verdict is None else Verdict[verdict],
+            problem,
+            score,
+            code,
+            _number(tim),
+            _number(memory),
+            [self._case(judge, id, *case) for case in cases],
+            None if data is None else json.loads(data),
+        )
+
+    def _case(self, judge, id, n, tim, memory, verdict, *present):
+        case = Case(
+            _number(tim),
+            _number(memory),
+            verdict=None if verdict is None else Verdict[verdict],
+        )
+        for k, there in zip(Case.PAYLOADS, present):
+            if there:
+                setattr(case, k, Blob(self, (judge, id, n, k)))
+        return case
+
+    def read(self, key: Tuple[str, str, int, str]) -> Optional[str]:
+        """A payload of a stored case, for `Blob`: `key` is the judge, the
+        submission ID, the case's number from 1 and one of `Case.PAYLOADS`."""
+        judge, id, n, column = key
+        if column not in Case.PAYLOADS:
+            raise ValueError('not a case payload: %r' % column)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT %s FROM cases WHERE judge = ? AND id = ? AND n = ?' % column,
+                (judge, id, n),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    @staticmethod
+    def _where(judge, problem, verdicts, accepted, since, until):
+        terms: List[str] = []
+        args: List[Any] = []
+        for column, op, value in [
+            ('judge', '=', judge),
+            ('problem', '=', problem),
+            ('ac', '=', None if accepted is None else int(accepted)),
+            ('submitted', '>=', since),
+            ('submitted', '<', until),
+        ]:
+            if value is not None:
+                terms.append('%s %s ?' % (column, op))
+                args.append(value)
+        if verdicts:
+            names = [v if isinstance(v, str) else v.name for v in verdicts]
+            terms.append('verdict IN (%s)' % ', '.join('?' * len(names)))
+            args += names
+        return ' WHERE ' + ' AND '.join(terms) if terms else '', args
+
+    def query(
+        self,
+        judge: Optional[str] = None,
+        problem: Optional[str] = None,
+        verdicts: Optional[Sequence[Union[str, Verdict]]] = None,
+        accepted: Optional[bool] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """The submissions matching all the filters given, newest first,
+        without their code and test cases. `since` and `until` are Unix
+        times; `verdicts` are `Verdict`s or their names."""
+        where, args = self._where(judge, problem, verdicts, accepted, since, until)
+        sql = (
+            'SELECT judge, id, problem, lang, verdict, ac, score, time, memory, '
+            'submitted, judged FROM submissions%s ORDER BY submitted DESC' % where
+        )
+        if limit is not None:
+            sql += ' LIMIT %d' % limit
+        with self._lock:
+            cursor = self._db.execute(sql, args)
+            names = [x[0] for x in cursor.description]
+            return [dict(zip(names, row)) for row in cursor]
+
+    def summary(
+        self,
+        by: str = 'problem',
+        judge: Optional[str] = None,
+        problem: Optional[str] = None,
+        verdicts: Optional[Sequence[Union[str, Verdict]]] = None,
+        accepted: Optional[bool] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Aggregates of the matching submissions for each value of `by`
+        (one of `GROUPS`): how many there were and were accepted, the
+        slowest and average time, the most memory, and the first and last
+        time one was sent. Most recently active groups come first."""
+        where, args = self._where(judge, problem, verdicts, accepted, since, until)
+        sql = (
+            'SELECT %s AS "group", count(*) AS count, '
+            'coalesce(sum(ac), 0) AS accepted, max(time) AS max_time, '
+            'avg(time) AS avg_time, max(memory) AS max_memory, '
+            'min(submitted) AS first, max(submitted) AS last '
+            'FROM submissions%s GROUP BY %s ORDER BY last DESC'
+        ) % (self.GROUPS[by][0], where, self.GROUPS[by][1])
+        if limit is not None:
+            sql += ' LIMIT %d' % limit
+        with self._lock:
+            cursor = self._db.execute(sql, args)
+            names = [x[0] for x in cursor.description]
+            return [dict(zip(names, row)) for row in cursor]
@@ -1,83 +1,323 @@
-from typing import TYPE_CHECKING, Dict, Optional, Tuple, Type, Union
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Type, Union
 
-from .submitters import NAMES, SUBMITTERS
+from .metrics import operation
+from .submitters import NAMES, infos_for_url
 
 if TYPE_CHECKING:
-    from .base import Language, Problem, Submission, SubmitterBase
+    from .base import Language, Problem, Submission, SubmitterBase, Verdict
+    from .cache import BlobStore
+    from .detect import Candidate
+    from .session import Transport
+    from .store import HistoryStore, ProblemStore, SessionStore
 
-__all__ = ['Submitter', 'NotLoggedInError']
+__all__ = ['Submitter', 'NotLoggedInError', 'DuplicateSubmissionError']
 
 
 class NotLoggedInError(Exception):
     pass
 
 
+class DuplicateSubmissionError(Exception):
+    """The same code was submitted to the same problem before, as `id`;
+    `verdict` is its verdict, or None if it was not judged yet."""
+
+    def __init__(
+        self, oj: str, problem: str, id: str, verdict: Optional['Verdict']
+    ) -> None:
+        super().__init__(
+            'already submitted as %s (%s)'
+            % (id, 'pending' if verdict is None else verdict.name)
+        )
+        self.oj = oj
+        self.problem = problem
+        self.id = id
+        self.verdict = verdict
+
+
+class _NotModified(Exception):
+    pass
+
+
 class Submitter:
-    def __init__(self):
+    def __init__(
+        self,
+        verify_login: bool = False,
+        login_ttl: Optional[float] = None,
+        store: Optional['ProblemStore'] = None,
+        transport: Optional['Transport'] = None,
+        sessions: Optional['SessionStore'] = None,
+        history: Optional['HistoryStore'] = None,
+        blobs: Optional['BlobStore'] = None,
+    ):
+        self.verify_login = verify_login
+        self.login_ttl = login_ttl
+        self.store = store
+        # connection pools shared by all judges, created on first use
+        self.transport = transport
         self._ojs: Dict[Type['SubmitterBase'], 'SubmitterBase'] = {}
+        self._saved: Dict[str, Any] = {}
+        # judges' sessions are read from here when first used, see `save`
+        self.sessions = sessions
+        self._base: Dict[str, Any] = {}
+        # submissions and their verdicts are recorded here
+        self.history = history
+        # large test case payloads of fetched submissions are moved here
+        self.blobs = blobs
+        self._locks: Dict[str, threading.RLock] = {}
+        self._locks_lock = threading.Lock()
 
     def dump(self) -> dict:
-        return {'ojs': {k.name: v.dump() for k, v in self._ojs.items()}}
+        ojs = dict(self._saved)
+        ojs.update({k.name: v.dump() for k, v in self._ojs.items()})
+        return {'ojs': ojs}
 
     def load(self, data: dict) -> None:
-        ojs = data['ojs']
-        for k, v in ojs.items():
-            cls = NAMES[k]
-            obj = self._ojs[cls] = cls()
-            obj.load(v)
+        # judges are only imported and constructed once they are used
+        self._ojs.clear()
+        self._saved = dict(data['ojs'])
+
+    def lock(self, oj: Union[Type['SubmitterBase'], str]) -> threading.RLock:
+        """The lock to hold while logging in to or out of the judge from
+        several threads. Other calls only need each thread to be inside the
+        judge's `SubmitterBase.own_session`."""
+        name = oj if isinstance(oj, str) else oj.name
+        with self._locks_lock:
+            if name not in self._locks:
+                self._locks[name] = threading.RLock()
+            return self._locks[name]
 
     def get_oj(self, oj: Union[Type['SubmitterBase'], str]) -> 'SubmitterBase':
         if isinstance(oj, str):
             oj = NAMES[oj]
         if oj in self._ojs:
             return self._ojs[oj]
-        return self._ojs.setdefault(oj, oj())
+        obj = self._ojs[oj] = oj()
+        if self.transport is None:
+            from .session import Transport
+
+            self.transport = Transport()
+        self.transport.mount(obj.session)
+        if self.login_ttl is not None:
+            obj.login_ttl = self.login_ttl
+        if oj.name in self._saved:
+            data = self._saved.pop(oj.name)
+        elif self.sessions is not None:
+            data = self.sessions.get(oj.name)
+        else:
+            data = None
+        if data is not None:
+            obj.load(data)
+        self._base[oj.name] = data or {}
+        return obj
+
+    def save(self) -> None:
+        """Write the sessions of the judges used so far to `sessions`.
+
+        Only what changed since a judge was loaded is written, on top of
+        whatever other processes have saved since; the judge then continues
+        from the merged session.
+        """
+        if self.sessions is None:
+            return
+        for cls, obj in self._ojs.items():
+            data = obj.dump()
+            if data != self._base.get(cls.name):
+                data = self.sessions.put(cls.name, data, self._base.get(cls.name, {}))
+                obj.load(data)
+                self._base[cls.name] = obj.dump()
+
+    def warm(self, oj: Union[Type['SubmitterBase'], str], connections: int = 1) -> int:
+        """Open connections to the judge, TLS handshake included, so that the
+        next requests can skip that. Idle connections are closed by the judges
+        after a while, so call this shortly before they are needed. Returns
+        the number of connections opened."""
+        from .session import Adapter
+
+        obj = self.get_oj(oj)
+        opened = 0
+        for url in obj.BASE_URLS:
+            adapter = obj.session.get_adapter(url)
+            if isinstance(adapter, Adapter):
+                settings = obj.session.merge_environment_settings(
+                    url, {}, None, None, None
+                )
+                opened += adapter.warm(
+                    url,
+                    connections,
+                    settings['verify'],
+                    settings['proxies'],
+                    settings['cert'],
+                )
+        return opened
 
+    @operation('login')
     def login(
         self, oj: Union[Type['SubmitterBase'], str], username: str, password: str
     ) -> bool:
         obj = self.get_oj(oj)
-        return obj.login(username, password)
+        success = obj.login(username, password)
+        obj.set_logged_in(bool(success))
+        return success
 
+    @operation('logout')
     def logout(self, oj: Union[Type['SubmitterBase'], str]) -> bool:
         obj = self.get_oj(oj)
+        obj.set_logged_in(False)
         return obj.logout()
 
+    @operation('problem')
     def get_problem(
-        self, oj: Union[Type['SubmitterBase'], str], problem: str
+        self,
+        oj: Union[Type['SubmitterBase'], str],
+        problem: str,
+        offline: bool = False,
+        refresh: bool = False,
     ) -> Optional['Problem']:
+        """Get a problem, from the problem store if there is one.
+
+        With `offline`, only the store is used; with `refresh`, the stored
+        copy is ignored and replaced.
+        """
         obj = self.get_oj(oj)
-        if obj.require_view_login and not obj.logged_in:
+        store = self.store
+        revalidate = None
+        if store is not None and not refresh:
+            entry = store.get(obj.name, problem)
+            if entry is not None:
+                cached, info = entry
+                if offline or info['age'] < store.ttl:
+                    return cached
+                revalidate = self._validators(info)
+        if offline:
+            return
+        if obj.require_view_login and not obj.check_login(self.verify_login):
             raise NotLoggedInError()
-        return obj.get_problem(problem)
+        if store is None:
+            return obj.get_problem(problem)
+        url = obj.get_problem_url(problem)
+        pages = []
 
-    def search_problem(self, code: str) -> Optional[Tuple[Type['SubmitterBase'], str]]:
-        for cls in SUBMITTERS:
-            problem = cls.search_problem(code)
-            if problem:
-                return cls, problem
+        def capture(r, *args, **kwargs):
+            # the stored copy is still current; stop before the judge parses
+            # the empty 304
+            if (
+                revalidate is not None
+                and r.status_code == 304
+                and r.url.startswith(revalidate[0])
+            ):
+                raise _NotModified()
+            if url and r.url.startswith(url) and not pages:
+                pages.append(r)
+
+        session = obj.session
+        session.hooks['response'].append(capture)
+        session.revalidate = revalidate
+        try:
+            ret = obj.get_problem(problem)
+        except _NotModified:
+            store.touch(obj.name, problem)
+            return cached
+        finally:
+            session.hooks['response'].remove(capture)
+            session.revalidate = None
+        if ret is not None:
+            page = pages[0] if pages else None
+            store.put(
+                obj.name,
+                problem,
+                ret,
+                page and page.url,
+                page and page.headers.get('ETag'),
+                page and page.headers.get('Last-Modified'),
+            )
+        return ret
+
+    @staticmethod
+    def _validators(info: dict) -> Optional[Tuple[str, Dict[str, str]]]:
+        # the URL of the stored page and the conditional headers to fetch it
+        # with, if it had validators
+        headers = {}
+        if info['etag']:
+            headers['If-None-Match'] = info['etag']
+        if info['last_modified']:
+            headers['If-Modified-Since'] = info['last_modified']
+        if not info['url'] or not headers:
+            return
+        return info['url'], headers
+
+    def search_problems(
+        self, code: str, comments: bool = False, limit: Optional[int] = None
+    ) -> List['Candidate']:
+        """All problems mentioned in `code`, see `submit.detect`."""
+        from .detect import detect_problems
+
+        return detect_problems(code, comments, limit)
+
+    def search_problem(
+        self, code: str, comments: bool = False, limit: Optional[int] = None
+    ) -> Optional[Tuple[Type['SubmitterBase'], str]]:
+        """The first problem mentioned in `code`. With `comments`, only
+        comments are searched; with `limit`, only the first and last `limit`
+        characters."""
+        for candidate in self.search_problems(code, comments, limit):
+            return candidate.oj, candidate.problem
 
     def parse_problem_url(
         self, url: str
     ) -> Optional[Tuple[Type['SubmitterBase'], str]]:
-        for cls in SUBMITTERS:
+        for info in infos_for_url(url):
+            cls = info.load()
             problem = cls.parse_problem_url(url)
             if problem:
                 return cls, problem
 
+    @operation('submit')
     def submit(
         self,
         oj: Union[Type['SubmitterBase'], str],
         problem: str,
         code: str,
         lang: 'Language',
+        force: bool = False,
     ) -> str:
+        """Submit `code` and return the submission ID. Unless `force`, raises
+        `DuplicateSubmissionError` instead if the history has the same code
+        submitted to the problem before."""
         obj = self.get_oj(oj)
-        if obj.require_submit_login and not obj.logged_in:
+        if self.history is not None and not force:
+            prev = self.history.find(obj.name, problem, code, lang)
+            if prev is not None:
+                from .base import Verdict
+
+                verdict = prev['verdict']
+                raise DuplicateSubmissionError(
+                    obj.name,
+                    problem,
+                    prev['id'],
+                    None if verdict is None else Verdict[verdict],
+                )
+        if obj.require_submit_login and not obj.check_login(self.verify_login):
             raise NotLoggedInError()
-        return obj.submit(problem, code, lang)
+        try:
+            id = obj.submit(problem, code, lang)
+        except Exception as e:
+            # the cached login state may be stale; only now ask the OJ
+            if obj.require_submit_login and not obj.check_login(True):
+                raise NotLoggedInError() from e
+            raise
+        if id is not None and self.history is not None:
+            self.history.add(obj.name, id, problem, code, lang)
+        return id
 
+    @operation('poll')
     def get_submission(
         self, oj: Union[Type['SubmitterBase'], str], id: str
     ) -> Optional['Submission']:
-        return self.get_oj(oj).get_submission(id)
+        obj = self.get_oj(oj)
+        sub = obj.get_submission(id)
+        if sub is not None and self.history is not None:
+            self.history.put(obj.name, sub, id)
+        if sub is not None and self.blobs is not None:
+            sub.spill(self.blobs)
+        return sub
@@ -1,22 +1,285 @@
 import importlib
+import re
+import urllib.parse
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
 
-from submit.base import SubmitterBase
-
-__all__ = ['SUBMITTERS', 'NAMES']
-
-_files = ['atcoder', 'codeforces', 'cses', 'luogu', 'usaco_contest', 'usaco', 'vjudge']
-SUBMITTERS = []
-NAMES = {}
-for _file in _files:
-    _module = importlib.import_module('.' + _file, 'submit.submitters')
-    for _name, _obj in vars(_module).items():
-        if (
-            _name[0].isupper()
-            and isinstance(_obj, type)
-            and SubmitterBase in _obj.mro()
-            and _obj is not SubmitterBase
-        ):
-            globals()[_name] = _obj
-            __all__.append(_name)
-            SUBMITTERS.append(_obj)
-            NAMES[_obj.name] = _obj
+if TYPE_CHECKING:
+    from submit.base import SubmitterBase
+
+__all__ = [
+    'SUBMITTERS',
+    'NAMES',
+    'ENTRY_POINT_GROUP',
+    'SubmitterInfo',
+    'register',
+    'get_info',
+    'get_infos',
+    'infos_for_url',
+    'infos_for_text',
+    'scan_text',
+]
+
+ENTRY_POINT_GROUP = 'submit.submitters'
+
+
+class SubmitterInfo:
+    """Lightweight description of a judge that does not import its module.
+
+    `hosts` are the URL host names the judge's problem URLs live on, and
+    `patterns` are regexes that must match a text before the judge's own
+    `search_problem` is worth calling. A submitter with no hosts (or no
+    patterns) is always consulted.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        module: str,
+        cls: str,
+        hosts: Sequence[str] = (),
+        patterns: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.module = module
+        self.cls = cls
+        self.hosts = tuple(hosts)
+        self.patterns = tuple(patterns)
+        self._re = None
+        self._loaded = None
+
+    @classmethod
+    def from_class(cls, obj: Type['SubmitterBase']) -> 'SubmitterInfo':
+        info = cls(obj.name, obj.__module__, obj.__name__)
+        info._loaded = obj
+        return info
+
+    def load(self) -> Type['SubmitterBase']:
+        if self._loaded is None:
+            module = importlib.import_module(self.module)
+            self._loaded = getattr(module, self.cls)
+        return self._loaded
+
+    def match_url(self, host: Optional[str]) -> bool:
+        return not self.hosts or host in self.hosts
+
+    def _pattern(self) -> 're.Pattern':
+        if self._re is None:
+            self._re = re.compile('|'.join('(?:%s)' % x for x in self.patterns))
+        return self._re
+
+    def match_text(self, text: str) -> bool:
+        return not self.patterns or self._pattern().search(text) is not None
+
+    def __repr__(self):
+        return '%s(%r, %r, %r)' % (
+            type(self).__name__,
+            self.name,
+            self.module,
+            self.cls,
+        )
+
+
+_INFOS: Dict[str, SubmitterInfo] = {}
+for _info in [
+    SubmitterInfo(
+        'atcoder',
+        'submit.submitters.atcoder',
+        'AtCoderSubmitter',
+        ['atcoder.jp'],
+        [r'atcoder\.jp/contests/'],
+    ),
+    SubmitterInfo(
+        'codeforces',
+        'submit.submitters.codeforces',
+        'CodeforcesSubmitter',
+        ['codeforces.com'],
+        [r'codeforces\.com/'],
+    ),
+    SubmitterInfo(
+        'cses',
+        'submit.submitters.cses',
+        'CSESSubmitter',
+        ['cses.fi'],
+        [r'cses\.fi/problemset/task/'],
+    ),
+    SubmitterInfo(
+        'luogu',
+        'submit.submitters.luogu',
+        'LuoguSubmitter',
+        ['www.luogu.com.cn'],
+        [r'luogu\.com\.cn/problem/'],
+    ),
+    SubmitterInfo(
+        'usaco_contest',
+        'submit.submitters.usaco_contest',
+        'USACOContestSubmitter',
+        ['www.usaco.org'],
+        [r'cpid='],
+    ),
+    SubmitterInfo(
+        'usaco',
+        'submit.submitters.usaco',
+        'USACOTrainingSubmitter',
+        ['train.usaco.org'],
+        [r'TASK: '],
+    ),
+    SubmitterInfo(
+        'vjudge',
+        'submit.submitters.vjudge',
+        'VJudgeSubmitter',
+        ['vjudge.net'],
+        [r'vjudge\.net/problem/'],
+    ),
+]:
+    _INFOS[_info.name] = _info
+del _info
+
+_entry_points = None
+# built from all registered judges on first use, see `_tables`
+_by_host: Optional[Dict[Optional[str], List[SubmitterInfo]]] = None
+_scanner: Optional[Tuple['re.Pattern', List[SubmitterInfo]]] = None
+
+
+def _get_entry_points():
+    global _entry_points
+    if _entry_points is None:
+        from importlib import metadata
+
+        try:
+            eps = metadata.entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:  # Python < 3.10
+            eps = metadata.entry_points().get(ENTRY_POINT_GROUP, [])
+        _entry_points = {ep.name: ep for ep in eps if ep.name not in _INFOS}
+    return _entry_points
+
+
+def register(obj) -> SubmitterInfo:
+    """Register a judge, given either a `SubmitterInfo` or a submitter class.
+
+    Third-party packages normally do not call this directly; they declare an
+    entry point in the `submit.submitters` group instead, pointing at a
+    `SubmitterInfo` (preferred, keeps startup lazy) or at the class itself.
+    """
+    global _by_host, _scanner
+    info = obj if isinstance(obj, SubmitterInfo) else SubmitterInfo.from_class(obj)
+    _INFOS[info.name] = info
+    _by_host = _scanner = None
+    if _entry_points is not None:
+        _entry_points.pop(info.name, None)
+    return info
+
+
+def _load_entry_point(name: str) -> None:
+    ep = _get_entry_points().pop(name)
+    info = register(ep.load())
+    if info.name != name:
+        raise ValueError('entry point %r registered submitter %r' % (name, info.name))
+
+
+def get_info(name: str) -> SubmitterInfo:
+    if name not in _INFOS and name in _get_entry_points():
+        _load_entry_point(name)
+    return _INFOS[name]
+
+
+def get_infos() -> List[SubmitterInfo]:
+    for name in list(_get_entry_points()):
+        _load_entry_point(name)
+    return list(_INFOS.values())
+
+
+def _tables():
+    global _by_host, _scanner
+    infos = get_infos()
+    if _by_host is None:
+        # host -> judges to ask, in registration order; None is any other host
+        _by_host = {None: [info for info in infos if not info.hosts]}
+        for host in {host for info in infos for host in info.hosts}:
+            _by_host[host] = [info for info in infos if info.match_url(host)]
+    if _scanner is None:
+        # named groups would make re try every judge at every position, so
+        # which judge matched is worked out afterwards
+        scanned = [info for info in infos if info.patterns]
+        _scanner = (
+            re.compile('|'.join(info._pattern().pattern for info in scanned) or '(?!)'),
+            scanned,
+        )
+    return _by_host, _scanner
+
+
+def infos_for_url(url: str) -> List[SubmitterInfo]:
+    try:
+        host = urllib.parse.urlsplit(url).hostname
+    except ValueError:
+        return []
+    if host is None:
+        return []
+    by_host = _tables()[0]
+    return list(by_host.get(host, by_host[None]))
+
+
+def scan_text(
+    text: str, regions: Optional[Iterable[Tuple[int, int]]] = None
+) -> Iterator[Tuple[SubmitterInfo, int, int]]:
+    """Find where any judge's `patterns` match `text`, in a single pass.
+
+    Yields `(info, start, end)` in order of position, only looking inside
+    the `(start, end)` `regions` if given. Judges without patterns are never
+    yielded.
+    """
+    pattern, infos = _tables()[1]
+    for start, end in [(0, len(text))] if regions is None else regions:
+        for match in pattern.finditer(text, start, end):
+            for info in infos:
+                if info._pattern().match(text, match.start(), end):
+                    yield info, match.start(), match.end()
+                    break
+
+
+def infos_for_text(text: str) -> List[SubmitterInfo]:
+    found = {info.name for info, _, _ in scan_text(text)}
+    return [info for info in get_infos() if not info.patterns or info.name in found]
+
+
+class _Names(Mapping):
+    """Maps judge names to submitter classes, importing each one on access."""
+
+    def __getitem__(self, name: str) -> Type['SubmitterBase']:
+        return get_info(name).load()
+
+    def __contains__(self, name) -> bool:
+        return name in _INFOS or name in _get_entry_points()
+
+    def __iter__(self) -> Iterator[str]:
+        yield from list(_INFOS)
+        yield from list(_get_entry_points())
+
+    def __len__(self) -> int:
+        return len(_INFOS) + len(_get_entry_points())
+
+    def __repr__(self):
+        return 'NAMES(%s)' % ', '.join(self)
+
+
+NAMES = _Names()
+__all__ += [info.cls for info in _INFOS.values()]
+
+
+def __getattr__(name):
+    if name == 'SUBMITTERS':
+        return [info.load() for info in get_infos()]
+    for info in _INFOS.values():
+        if info.cls == name:
+            return info.load()
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
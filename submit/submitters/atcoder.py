@@ -1,19 +1,30 @@
 import re
 
-from bs4 import BeautifulSoup, Tag
+from bs4 import Tag
 
 from ..base import Case, Language, Problem, Submission, SubmitterBase, TextType, Verdict
+from ..util import parse_html
 
 __all__ = ['AtCoderSubmitter']
 
 
 class AtCoderSubmitter(SubmitterBase):
     name = 'atcoder'
+    BASE_URLS = ('https://atcoder.jp',)
+    LOGIN_URLS = ('https://atcoder.jp/login',)
     LANG = {Language.C__: '4003', Language.PYTHON3: '4047'}
 
     RE = re.compile(
         'https:?//atcoder.jp/contests/([0-9a-zA-Z_]+)/tasks/([0-9a-zA-Z_]+)'
     )
+    CSRF_RE = re.compile(r'csrfToken = "([^"]*)"')
+    # the flash message shown for a stale token (pages are in English, see
+    # __init__)
+    CSRF_ERROR_RE = re.compile(
+        rb'alert-danger[^>]*>(?:(?!</div>).)*?(?:invalid request|csrf)', re.S | re.I
+    )
+    # e.g. "3/20" or "3/20 WA" while the tests are running
+    PROGRESS_RE = re.compile(r'(\d+)\s*/\s*(\d+)')
 
     def __init__(self):
         super().__init__()
@@ -45,23 +56,25 @@ class AtCoderSubmitter(SubmitterBase):
             return
         return '%s/%s' % match.groups()
 
-    def _csrf(self, url):
-        r = self.session.get(url).text
-        r = r[r.index('csrfToken = "') + 13 :]
-        r = r[: r.index('"')]
-        return r
+    def _csrf_rejected(self, r):
+        # a rejected form comes back with an "invalid request" flash message;
+        # other errors (e.g. a wrong password) have their own messages
+        return super()._csrf_rejected(r) or bool(self.CSRF_ERROR_RE.search(r.content))
 
     def login(self, username, password):
-        c = self._csrf('https://atcoder.jp/login')
-        r = self.session.post(
+        r = self.with_csrf(
             'https://atcoder.jp/login',
-            data={'username': username, 'password': password, 'csrf_token': c},
+            lambda c: self.session.post(
+                'https://atcoder.jp/login',
+                data={'username': username, 'password': password, 'csrf_token': c},
+            ),
         )
         return 'login' not in r.url
 
     def logout(self):
-        c = self._csrf('https://atcoder.jp/home')
+        c = self.get_csrf('https://atcoder.jp/home')
         self.session.post('https://atcoder.jp/logout', data={'csrf_token': c})
+        self._csrf_token = None
         return not self.logged_in
 
     @property
@@ -74,7 +87,7 @@ class AtCoderSubmitter(SubmitterBase):
         if u is None:
             return
         r = self.session.get(u)
-        s = BeautifulSoup(r.content, 'html.parser')
+        s = parse_html(r.content)
         ps = s.select('#task-statement .lang-en .part')
         t = ''
         ipt, opt = [], []
@@ -90,21 +103,21 @@ class AtCoderSubmitter(SubmitterBase):
         return Problem(id, t, TextType.HTML, list(zip(ipt, opt)) or None)
 
     def submit(self, id, code, lang):
-        _, contest, problem = id.split('/')
-        c = self._csrf(
+        contest, problem = id.split('/')
+        r = self.with_csrf(
             'https://atcoder.jp/contests/%s/submit?taskScreenName=%s'
-            % (contest, problem)
-        )
-        r = self.session.post(
-            'https://atcoder.jp/contests/%s/submit' % contest,
-            data={
-                'data.TaskScreenName': problem,
-                'data.LanguageId': self.LANG[lang],
-                'sourceCode': code,
-                'csrf_token': c,
-            },
+            % (contest, problem),
+            lambda c: self.session.post(
+                'https://atcoder.jp/contests/%s/submit' % contest,
+                data={
+                    'data.TaskScreenName': problem,
+                    'data.LanguageId': self.LANG[lang],
+                    'sourceCode': code,
+                    'csrf_token': c,
+                },
+            ),
         )
-        s = BeautifulSoup(r.content, 'html.parser')
+        s = parse_html(r.content)
         sid = s.select_one('.table-responsive td.submission-score').attrs.get('data-id')
         return '%s/%s' % (contest, sid)
 
@@ -128,13 +141,19 @@ class AtCoderSubmitter(SubmitterBase):
         r = self.session.get(
             'https://atcoder.jp/contests/%s/submissions/%s' % (contest, sid)
         )
-        s = BeautifulSoup(r.content, 'html.parser')
+        s = parse_html(r.content)
         sta = s.select_one('#judge-status span')
         if sta is None:
             raise ValueError(s.text)
         stat = sta.text
         if stat == 'WJ' or '/' in stat:
+            m = self.PROGRESS_RE.match(stat)
+            if m and int(m.group(2)):
+                self._set_progress(id, int(m.group(1)) / int(m.group(2)))
+            else:
+                self._set_progress(id, 0.0)
             return
+        self._set_progress(id, None)
         ve = self._parse_verd(stat)
         msg = sta.attrs.get('title')
         code = s.select_one('#submission-code')
@@ -1,15 +1,18 @@
 import re
+import time
 import warnings
-
-from bs4 import BeautifulSoup
+from http.cookiejar import http2time
 
 from ..base import Case, Language, Problem, Submission, SubmitterBase, TextType, Verdict
+from ..util import parse_html
 
 __all__ = ['CodeforcesSubmitter']
 
 
 class CodeforcesSubmitter(SubmitterBase):
     name = 'codeforces'
+    BASE_URLS = ('https://codeforces.com',)
+    LOGIN_URLS = ('https://codeforces.com/enter',)
     LANG = {Language.C__: '54', Language.PYTHON3: '70'}
 
     PSET_RE = re.compile(
@@ -19,33 +22,65 @@ class CodeforcesSubmitter(SubmitterBase):
         'https?://codeforces.com/problemsets/(acmsguru)/problem/99999/([0-9]+)'
     )
     COMP_RE = re.compile('https?://codeforces.com/contest/([0-9]+)/problem/([A-Z0-9]+)')
+    EXPIRES_RE = re.compile(r'RCPC=.*?expires=([^;"]+)')
+    CSRF_RE = re.compile(r"csrf='([^']*)'")
+
+    RCPC_TTL = 24 * 60 * 60  # used when the challenge page has no expiry
 
     def __init__(self):
         super().__init__()
-        r = self.session.get('https://codeforces.com')
+        self._rcpc_expires = None
+
+    def __getstate__(self):
+        return (super().__getstate__(), self._rcpc_expires)
+
+    def __setstate__(self, state):
+        ss, self._rcpc_expires = state
+        super().__setstate__(ss)
+
+    def _solve_rcpc(self, text):
+        try:
+            from Crypto.Cipher import AES
+        except ModuleNotFoundError as e:
+            raise ImportError('Please install PyCryptodome!') from e
+
+        def toNumbers(s):
+            b = []
+            for i in range(0, len(s), 2):
+                b.append(int(s[i : i + 2], 16))
+            return bytes(b)
+
+        a = text.index('a=toNumbers')
+        a = text[text.index('"', a) + 1 :]
+        a = toNumbers(a[: a.index('"')])
+        b = text.index('b=toNumbers')
+        b = text[text.index('"', b) + 1 :]
+        b = toNumbers(b[: b.index('"')])
+        c = text.index('c=toNumbers')
+        c = text[text.index('"', c) + 1 :]
+        c = toNumbers(c[: c.index('"')])
+        cr = AES.new(a, mode=AES.MODE_CBC, IV=b)
+        expires = None
+        match = self.EXPIRES_RE.search(text)
+        if match:
+            expires = http2time(match.group(1))
+        if expires is None:
+            expires = int(time.time()) + self.RCPC_TTL
+        self._rcpc_expires = expires
+        self.session.cookies.set('RCPC', cr.decrypt(c).hex())
+
+    def _request(self, method, url, **kwargs):
+        r = self.session.request(method, url, **kwargs)
         if 'Redirecting...' in r.text:
-            try:
-                from Crypto.Cipher import AES
-            except ModuleNotFoundError as e:
-                raise ImportError('Please install PyCryptodome!') from e
-
-            def toNumbers(s):
-                b = []
-                for i in range(0, len(s), 2):
-                    b.append(int(s[i : i + 2], 16))
-                return bytes(b)
-
-            a = r.text.index('a=toNumbers')
-            a = r.text[r.text.index('"', a) + 1 :]
-            a = toNumbers(a[: a.index('"')])
-            b = r.text.index('b=toNumbers')
-            b = r.text[r.text.index('"', b) + 1 :]
-            b = toNumbers(b[: b.index('"')])
-            c = r.text.index('c=toNumbers')
-            c = r.text[r.text.index('"', c) + 1 :]
-            c = toNumbers(c[: c.index('"')])
-            cr = AES.new(a, mode=AES.MODE_CBC, IV=b)
-            self.session.cookies.set('RCPC', cr.decrypt(c).hex())
+            self._solve_rcpc(r.text)
+            r = self.session.request(method, url, **kwargs)
+        return r
+
+    def _get(self, url, **kwargs):
+        return self._request('GET', url, **kwargs)
+
+    def _post(self, url, **kwargs):
+        return self._request('POST', url, **kwargs)
 
     @classmethod
     def parse_problem_url(cls, url):
@@ -81,25 +116,22 @@ class CodeforcesSubmitter(SubmitterBase):
             return
         return '%s_%s' % match.groups()
 
-    def _csrf(self, url):
-        text = self.session.get(url).text
-        i = text.index('csrf=') + 6
-        return text[i : text.index("'", i)]
-
     def login(self, username, password):
-        csrf = self._csrf('https://codeforces.com/enter')
-        r = self.session.post(
+        r = self.with_csrf(
             'https://codeforces.com/enter',
-            data={
-                'csrf_token': csrf,
-                'action': 'enter',
-                'ftaa': 'n/a',
-                'bfaa': 'n/a',
-                'handleOrEmail': username,
-                'password': password,
-                '_tta': '176',
-                'remember': 'on',
-            },
+            lambda csrf: self._post(
+                'https://codeforces.com/enter',
+                data={
+                    'csrf_token': csrf,
+                    'action': 'enter',
+                    'ftaa': 'n/a',
+                    'bfaa': 'n/a',
+                    'handleOrEmail': username,
+                    'password': password,
+                    '_tta': '176',
+                    'remember': 'on',
+                },
+            ),
         )
         return 'enter' not in r.url
 
@@ -110,11 +142,11 @@ class CodeforcesSubmitter(SubmitterBase):
             r'Looking forward to seeing you at Codeforces."\);'
         ),
     ):
-        r = self.session.get('https://codeforces.com')
+        r = self._get('https://codeforces.com')
         if '/logout' not in r.text:
             return False
         i = r.text.index('/logout')
-        r = self.session.get(
+        r = self._get(
             'https://codeforces.com'
             + r.text[r.text.rindex('"', 0, i) + 1 : i]
             + '/logout'
@@ -123,21 +155,17 @@ class CodeforcesSubmitter(SubmitterBase):
 
     @property
     def logged_in(self):
-        r = self.session.get('https://codeforces.com/profile')
+        r = self._get('https://codeforces.com/profile')
         return r.url.startswith('https://codeforces.com/profile/')
 
     def get_problem(self, id):
         u = self.get_problem_url(id)
         if u is None:
             return
-        prob = self.session.get(u)
+        prob = self._get(u)
         return Problem(
             id,
-            str(
-                BeautifulSoup(prob.content, 'html.parser').select_one(
-                    '.problem-statement'
-                )
-            ).strip(),
+            str(parse_html(prob.content).select_one('.problem-statement')).strip(),
             TextType.HTML,
         )
 
@@ -149,10 +177,8 @@ class CodeforcesSubmitter(SubmitterBase):
         else:
             url = 'https://codeforces.com/problemsets/%s/submit' % contest
             data = {'submittedProblemCode': problem}
-        csrf = self._csrf(url)
         data.update(
             {
-                'csrf_token': csrf,
                 'ftaa': 'n/a',
                 'bfaa': 'n/a',
                 'action': 'submitSolutionFormSubmitted',
@@ -161,7 +187,12 @@ class CodeforcesSubmitter(SubmitterBase):
                 'tabSize': '4',
             }
         )
-        r = self.session.post(url, params={'csrf_token': csrf}, data=data)
+        r = self.with_csrf(
+            url,
+            lambda csrf: self._post(
+                url, params={'csrf_token': csrf}, data=dict(data, csrf_token=csrf)
+            ),
+        )
         i = r.text.index('submission-id="') + 15
         return '%s_%s_%s' % (contest, problem, r.text[i : r.text.index('"', i)])
 
@@ -183,10 +214,12 @@ class CodeforcesSubmitter(SubmitterBase):
 
     def get_submission(self, id):
         contest, pp, sid = id.split('_')
-        csrf = self._csrf('https://codeforces.com')
-        r = self.session.post(
-            'https://codeforces.com/data/submitSource',
-            data={'submissionId': sid, 'csrf_token': csrf},
+        r = self.with_csrf(
+            'https://codeforces.com',
+            lambda csrf: self._post(
+                'https://codeforces.com/data/submitSource',
+                data={'submissionId': sid, 'csrf_token': csrf},
+            ),
         )
         try:
             data = r.json()
@@ -212,11 +245,11 @@ class CodeforcesSubmitter(SubmitterBase):
                 v = Verdict(data.get('verdict#%d' % (i + 1)))
             except:
                 v = None
-            time = int(data['timeConsumed#%d' % (i + 1)])
+            tim = int(data['timeConsumed#%d' % (i + 1)])
             mem = int(data['memoryConsumed#%d' % (i + 1)]) // 1024
             cases.append(
                 Case(
-                    time,
+                    tim,
                     mem,
                     data.get('input#%d' % (i + 1)),
                     data.get('output#%d' % (i + 1)),
@@ -225,7 +258,7 @@ class CodeforcesSubmitter(SubmitterBase):
                     data.get('checkerStdoutAndStderr#%d' % (i + 1)),
                 )
             )
-            mtim = max(mtim, time)
+            mtim = max(mtim, tim)
             mmem = max(mmem, mem)
         return Submission(
             id,
@@ -237,3 +270,15 @@ class CodeforcesSubmitter(SubmitterBase):
             mmem,
             cases,
         )
+
+    def dump(self):
+        return {'rcpc_expires': self._rcpc_expires, 'super': super().dump()}
+
+    def load(self, data):
+        if 'super' not in data:  # saved before the RCPC expiry was kept
+            data = {'rcpc_expires': None, 'super': data}
+        super().load(data['super'])
+        self._rcpc_expires = data['rcpc_expires']
+        if self._rcpc_expires is not None and self._rcpc_expires <= time.time():
+            self.session.cookies.pop('RCPC', None)
+            self._rcpc_expires = None
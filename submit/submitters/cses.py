@@ -1,14 +1,19 @@
 import re
 
-from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4 import NavigableString, Tag
 
 from ..base import Case, Language, Problem, Submission, SubmitterBase, TextType, Verdict
+from ..util import parse_html
 
 __all__ = ['CSESSubmitter']
 
 
 class CSESSubmitter(SubmitterBase):
     name = 'cses'
+    BASE_URLS = ('https://cses.fi',)
+    LOGIN_URLS = ('https://cses.fi/login',)
+    # CSES judges within a few seconds and rarely has a queue
+    POLL_DELAYS = (0.5, 0.5, 4.0)
     RE = re.compile('https?://cses.fi/problemset/task/([0-9]+)/?')
     PATH_RE = re.compile('/problemset/task/([0-9]+)/?')
     RES_RE = re.compile('https?://cses.fi/problemset/result/([0-9]+)/?')
@@ -39,9 +44,7 @@ class CSESSubmitter(SubmitterBase):
     def login(self, username, password):
         r = self.session.get('https://cses.fi/login')
         csrf = (
-            BeautifulSoup(r.content, 'html.parser')
-            .select_one('input[name="csrf_token"]')
-            .attrs['value']
+            parse_html(r.content).select_one('input[name="csrf_token"]').attrs['value']
         )
         login = self.session.post(
             'https://cses.fi/login',
@@ -56,14 +59,12 @@ class CSESSubmitter(SubmitterBase):
     def logged_in(self):
         r = self.session.get('https://cses.fi/')
         return not (
-            BeautifulSoup(r.content, 'html.parser')
-            .select_one('.controls a.account')
-            .attrs['href']
+            parse_html(r.content).select_one('.controls a.account').attrs['href']
         ).endswith('/login')
 
     def get_problem(self, id):
         r = self.session.get(self.get_problem_url(id))
-        soup = BeautifulSoup(r.content, 'html.parser')
+        soup = parse_html(r.content)
         content = soup.select_one('div.content')
         if not content:
             return
@@ -73,9 +74,7 @@ class CSESSubmitter(SubmitterBase):
         sel, opt = self.LANG[lang]
         r = self.session.get('https://cses.fi/problemset/submit/%s/' % id)
         csrf = (
-            BeautifulSoup(r.content, 'html.parser')
-            .select_one('input[name="csrf_token"]')
-            .attrs['value']
+            parse_html(r.content).select_one('input[name="csrf_token"]').attrs['value']
         )
         data = {
             'csrf_token': csrf,
@@ -98,9 +97,14 @@ class CSESSubmitter(SubmitterBase):
             'https://cses.fi/ajax/get_status.php', params={'entry': id}
         )
         if r.status_code >= 400 or r.text.startswith(('TESTING', 'PENDING')):
+            if r.text.startswith('TESTING'):
+                self._set_progress(id, 1.0)
+            elif r.text.startswith('PENDING'):
+                self._set_progress(id, 0.0)
             return
+        self._set_progress(id, None)
         r = self.session.get('https://cses.fi/problemset/result/%s/' % id)
-        soup = BeautifulSoup(r.content, 'html.parser')
+        soup = parse_html(r.content)
         vertext = soup.select_one('.inline-score.verdict').text
         verdict = self.VERD.get(vertext, Verdict.UNKNOWN)
         problem = self.PATH_RE.match(
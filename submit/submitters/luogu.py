@@ -9,6 +9,8 @@ __all__ = ['LuoguSubmitter']
 
 class LuoguSubmitter(SubmitterBase):
     name = 'luogu'
+    BASE_URLS = ('https://www.luogu.com.cn',)
+    LOGIN_URLS = ('https://www.luogu.com.cn/auth/login',)
     LANG = {Language.C__: 12, Language.PYTHON3: 25}
     VERDICTS = [
         None,  # Waiting
@@ -33,6 +35,7 @@ class LuoguSubmitter(SubmitterBase):
         r'https?://(?:www.)luogu.com.cn/problem/([A-Z0-9]+)\?contestId=([0-9]+)'
     )
     RE = re.compile('https?://(?:www.)luogu.com.cn/problem/([A-Z0-9]+)')
+    CSRF_RE = re.compile(r'csrf-token" content="([^"]*)"')
 
     @classmethod
     def parse_problem_url(cls, url):
@@ -62,20 +65,16 @@ class LuoguSubmitter(SubmitterBase):
             return
         return match.group(1)
 
-    def _csrf(self, r):
-        ci = r.text.index('csrf-token" content="') + 21
-        return r.text[ci : r.text.index('"', ci)]
-
     def login(self, username, password):
         self.session.cookies.set(
             'login_referer', 'https://www.luogu.com.cn/', domain='www.luogu.com.cn'
         )
-        c = self._csrf(
-            self.session.get(
-                'https://www.luogu.com.cn/auth/login',
-                headers={'referer': 'https://www.luogu.com.cn/'},
-            )
+        self._csrf_token = None
+        self.session.get(
+            'https://www.luogu.com.cn/auth/login',
+            headers={'referer': 'https://www.luogu.com.cn/'},
         )
+        c = self.get_csrf('https://www.luogu.com.cn/auth/login')
         cap = self.session.get(
             'https://www.luogu.com.cn/api/verify/captcha?_t=%f' % time.time(),
             headers={'referer': 'https://www.luogu.com.cn/auth/login'},
@@ -108,13 +107,12 @@ class LuoguSubmitter(SubmitterBase):
         self.session.post(
             'https://www.luogu.com.cn/api/auth/logout',
             headers={
-                'x-csrf-token': self._csrf(
-                    self.session.get('https://www.luogu.com.cn/')
-                ),
+                'x-csrf-token': self.get_csrf('https://www.luogu.com.cn/'),
                 'origin': 'https://www.luogu.com.cn',
                 'referer': 'https://www.luogu.com.cn/',
             },
         )
+        self._csrf_token = None
         return not self.logged_in
 
     @property
@@ -153,15 +151,17 @@ class LuoguSubmitter(SubmitterBase):
         )
 
     def submit(self, id, code, lang):
-        c = self._csrf(self.session.get(self.get_problem_url(id)))
-        r = self.session.post(
-            'https://www.luogu.com.cn/fe/api/problem/submit/' + id,
-            json={'code': code, 'enableO2': 0, 'lang': self.LANG[lang]},
-            headers={
-                'x-csrf-token': c,
-                'origin': 'https://www.luogu.com.cn',
-                'referer': self.get_problem_url(id),
-            },
+        r = self.with_csrf(
+            self.get_problem_url(id),
+            lambda c: self.session.post(
+                'https://www.luogu.com.cn/fe/api/problem/submit/' + id,
+                json={'code': code, 'enableO2': 0, 'lang': self.LANG[lang]},
+                headers={
+                    'x-csrf-token': c,
+                    'origin': 'https://www.luogu.com.cn',
+                    'referer': self.get_problem_url(id),
+                },
+            ),
         )
         return str(r.json()['rid'])
 
@@ -171,7 +171,9 @@ class LuoguSubmitter(SubmitterBase):
         )
         data = r.json()['currentData']['record']
         if self.VERDICTS[data['status'] or 0] is None:
+            self._set_progress(id, 1.0 if data['status'] == 1 else 0.0)
             return
+        self._set_progress(id, None)
         return Submission(
             id,
             self.VERDICTS[data['status']],
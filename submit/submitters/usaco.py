@@ -1,22 +1,30 @@
 import re
 import urllib.parse
 
-from bs4 import BeautifulSoup
-
 from ..base import Problem, Submission, SubmitterBase, TextType, Verdict
+from ..util import parse_html
 
 __all__ = ['USACOTrainingSubmitter']
 
 
 class USACOTrainingSubmitter(SubmitterBase):
     name = 'usaco'
+    BASE_URLS = ('https://train.usaco.org',)
 
     TASK_RE = re.compile(r'TASK: (\S+)')
+    # the login form, which any page shows once the session key is expired
+    LOGIN_FORM_RE = re.compile(rb'name="?PASSWORD\b', re.I)
 
     def __init__(self):
         super().__init__()
         self._a = None
 
+    def _logged_out(self, r):
+        # there is no login page to be sent to, the pages just show the form
+        return r.url.startswith(self.BASE_URLS) and bool(
+            self.LOGIN_FORM_RE.search(r.content)
+        )
+
     def __getstate__(self):
         return (super().__getstate__(), self._a)
 
@@ -83,7 +91,7 @@ class USACOTrainingSubmitter(SubmitterBase):
                 tuple(
                     map(
                         lambda x: x.text.strip(),
-                        BeautifulSoup(r.content, 'html.parser').select('pre')[-2:],
+                        parse_html(r.content).select('pre')[-2:],
                     )
                 )
             ],
@@ -99,11 +107,7 @@ class USACOTrainingSubmitter(SubmitterBase):
                 'S': (None, id),
             },
         )
-        return (
-            id
-            + '/'
-            + BeautifulSoup(r.content, 'html.parser').select_one('div>font>div').text
-        )
+        return id + '/' + parse_html(r.content).select_one('div>font>div').text
 
     def get_submission(self, id):
         pid, _, id = id.partition('/')
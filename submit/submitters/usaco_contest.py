@@ -1,15 +1,24 @@
+import re
 import urllib.parse
 
-from bs4 import BeautifulSoup
-
 from ..base import Case, Language, Problem, Submission, SubmitterBase, TextType, Verdict
+from ..util import parse_html
 
 __all__ = ['USACOTrainingSubmitter']
 
 
 class USACOContestSubmitter(SubmitterBase):
     name = 'usaco_contest'
+    BASE_URLS = ('http://www.usaco.org',)
     LANG = {Language.C__: '7', Language.PYTHON3: '4'}
+    CPID_RE = re.compile('cpid=([0-9]+)')
+
+    def _logged_out(self, r):
+        # logged in, every page greets the user
+        return (
+            r.url.startswith('http://www.usaco.org/index.php')
+            and b'Welcome, ' not in r.content
+        )
 
     @classmethod
     def parse_problem_url(cls, url):
@@ -29,14 +38,9 @@ class USACOContestSubmitter(SubmitterBase):
 
     @classmethod
     def search_problem(cls, text):
-        if 'cpid=' not in text:
-            return
-        i = text.index('cpid=') + 5
-        s = ''
-        while text[i].isdigit():
-            s += text[i]
-            i += 1
-        return s
+        match = cls.CPID_RE.search(text)
+        if match:
+            return match.group(1)
 
     def login(self, username, password):
         return (
@@ -61,7 +65,7 @@ class USACOContestSubmitter(SubmitterBase):
         if u is None:
             return
         r = self.session.get(u)
-        s = BeautifulSoup(r.text, 'html.parser')
+        s = parse_html(r.text)
         title = ' '.join(x.text for x in s.select('h2')).strip()
         desc = s.select_one('.problem-text')
         cases = []
@@ -79,7 +83,7 @@ class USACOContestSubmitter(SubmitterBase):
             },
         )
         r = self.session.get(self.get_problem_url(id))
-        s = BeautifulSoup(r.content, 'html.parser').select_one('#last-status')
+        s = parse_html(r.content).select_one('#last-status')
         if s is None:
             return
         return '%s_%s' % (id, s.attrs.get('data-sid'))
@@ -115,7 +119,7 @@ class USACOContestSubmitter(SubmitterBase):
             return Submission(id, Verdict.WRONG_ANSWER, pid, 0, data=r['output'])
         if not r['sr'].startswith('Submitted;'):
             raise ValueError(r)
-        s = BeautifulSoup(r['jd'], 'html.parser')
+        s = parse_html(r['jd'])
         cases = []
         ok = 0
         tim = mem = 0.0
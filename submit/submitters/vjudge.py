@@ -3,15 +3,19 @@ import json
 import re
 import urllib.parse
 
-from bs4 import BeautifulSoup
-
 from ..base import Language, Problem, Submission, SubmitterBase, TextType, Verdict
+from ..cache import DiskCache
+from ..util import parse_html
 
 __all__ = ['VJudgeSubmitter']
 
 
 class VJudgeSubmitter(SubmitterBase):
     name = 'vjudge'
+    BASE_URLS = ('https://vjudge.net',)
+    # submissions are relayed to the remote judge first, so verdicts take
+    # longer and the remote queue can be long
+    POLL_DELAYS = (3.0, 2.0, 15.0)
 
     RE = re.compile('https?://vjudge.net/problem/(.+)')
     PREC = {
@@ -33,14 +37,66 @@ class VJudgeSubmitter(SubmitterBase):
         'CE': Verdict.COMPILATION_ERROR,
     }
 
-    def __init__(self):
-        super().__init__()
-        self._oj = self.session.get('https://vjudge.net/util/cfg').json()['remoteOJs']
+    CACHE = DiskCache('vjudge', 24 * 60 * 60)
+    # what the JSON endpoints answer instead when we are not logged in
+    LOGGED_OUT_RE = re.compile(rb'"error"\s*:\s*"[^"]*log\s*in', re.I)
+
+    def _logged_out(self, r):
+        return r.headers.get('Content-Type', '').startswith(
+            'application/json'
+        ) and bool(self.LOGGED_OUT_RE.search(r.content))
+
+    @property
+    def _oj(self):
+        return self.CACHE.get(
+            'remoteOJs', self._fetch_oj, self._in_background(self._fetch_oj)
+        )
+
+    def _in_background(self, fetch):
+        # cache refreshes run in another thread, which must not use our
+        # session while we do
+        headers = dict(self.session.headers)
+
+        def refresh():
+            from ..session import Wrapper
+
+            with Wrapper(self.name) as session:
+                session.headers.update(headers)
+                return fetch(session)
+
+        return refresh
+
+    def _fetch_oj(self, session=None):
+        session = session or self.session
+        return session.get('https://vjudge.net/util/cfg').json()['remoteOJs']
+
+    def _fetch_languages(self, typ, id, session=None):
+        # in the background, also get the judges without our session
+        oj = self._oj if session is None else self._fetch_oj(session)
+        session = session or self.session
+        if typ in oj and oj[typ].get('languages'):
+            return oj[typ]['languages']
+        return json.loads(
+            parse_html(session.get(self.get_problem_url(id)).content)
+            .select_one('textarea[name="dataJson"]')
+            .text
+        )['languages']
+
+    def _languages(self, typ, id, fresh=False):
+        key = 'languages-' + typ
 
-    def __setstate__(self, state):
-        if not hasattr(self, '_oj'):
-            self.__init__()
-        super().__setstate__(state)
+        def fetch(session=None):
+            return self._fetch_languages(typ, id, session)
+
+        if fresh:
+            lang = fetch()
+            self.CACHE.set(key, lang)
+            return lang
+        return self.CACHE.get(key, fetch, self._in_background(fetch))
+
+    @classmethod
+    def cache_stats(cls):
+        return cls.CACHE.stats()
 
     @classmethod
     def parse_problem_url(cls, url):
@@ -76,11 +132,11 @@ class VJudgeSubmitter(SubmitterBase):
 
     def get_problem(self, id):
         r = self.session.get(self.get_problem_url(id))
-        s = BeautifulSoup(r.content, 'html.parser')
+        s = parse_html(r.content)
         dr = self.session.get(
             'https://vjudge.net' + s.select_one('#frame-description').attrs.get('src')
         )
-        ds = BeautifulSoup(dr.content, 'html.parser')
+        ds = parse_html(dr.content)
         dj = json.loads(ds.select_one('textarea.data-json-container').text)
         text = ''
         for s in dj['sections']:
@@ -97,25 +153,10 @@ class VJudgeSubmitter(SubmitterBase):
     def submit(self, id, code, lang):
         typ, _, pid = id.partition('-')
         prec = self.PREC[lang]
-        lang = (
-            self._oj[typ].get('languages')
-            or json.loads(
-                BeautifulSoup(
-                    self.session.get(self.get_problem_url(id)).content, 'html.parser'
-                )
-                .select_one('textarea[name="dataJson"]')
-                .text
-            )['languages']
-        )
-        found = False
-        for p in prec:
-            for lid, v in lang.items():
-                if p.lower() in v.lower():
-                    found = True
-                    break
-            if found:
-                break
-        if not found:
+        lid = self._find_language(self._languages(typ, id), prec)
+        if lid is None:  # the cached table may be outdated
+            lid = self._find_language(self._languages(typ, id, True), prec)
+        if lid is None:
             raise NotImplementedError('Origin OJ not supported: %s' % typ)
         data = self.session.post(
             'https://vjudge.net/problem/submit',
@@ -131,10 +172,20 @@ class VJudgeSubmitter(SubmitterBase):
         ).json()
         return str(data['runId'])
 
+    @staticmethod
+    def _find_language(lang, prec):
+        for p in prec:
+            for lid, v in lang.items():
+                if p.lower() in v.lower():
+                    return lid
+
     def get_submission(self, id):
         r = self.session.post('https://vjudge.net/solution/data/%s' % id).json()
         if r['statusType'] == 2:
+            judging = 'judging' in (r.get('status') or '').lower()
+            self._set_progress(id, 1.0 if judging else 0.0)
             return
+        self._set_progress(id, None)
         v = (
             Verdict.ACCEPTED
             if r.get('statusType') == 0
@@ -1,10 +1,20 @@
+import importlib.util
 import io
 import os
-from typing import Optional
+from typing import Optional, Sequence
 
-from bs4 import Tag
+__all__ = [
+    'get_captcha',
+    'get_text',
+    'PARSERS',
+    'get_parser',
+    'parse_html',
+    'format_rows',
+]
 
-__all__ = ['get_captcha', 'get_text']
+# BeautifulSoup tree builders, fastest first
+PARSERS = ['lxml', 'html.parser']
+_parser = None
 
 
 def get_captcha(image: bytes) -> Optional[str]:
@@ -77,6 +87,8 @@ def get_captcha(image: bytes) -> Optional[str]:
 
 def get_text(tag, blocks=['p', 'div', 'table', 'h1', 'h2', 'h3', 'li', 'pre']):
     # https://stackoverflow.com/a/66835172
+    from bs4 import Tag
+
     def _gen(tag, ns=False):
         for c in tag.children:
             if isinstance(c, str):
@@ -89,3 +101,35 @@ def get_text(tag, blocks=['p', 'div', 'table', 'h1', 'h2', 'h3', 'li', 'pre']):
                     yield '\n'
 
     return ''.join(_gen(tag))
+
+
+def get_parser() -> str:
+    """Name of the BeautifulSoup parser to use for judge pages.
+
+    This is `$SUBMIT_HTML_PARSER` if set, otherwise lxml when it is installed
+    and the built-in html.parser if not.
+    """
+    global _parser
+    if _parser is None:
+        _parser = os.environ.get('SUBMIT_HTML_PARSER') or next(
+            x
+            for x in PARSERS
+            if x == 'html.parser' or importlib.util.find_spec(x) is not None
+        )
+    return _parser
+
+
+def parse_html(markup, parser: Optional[str] = None):
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(markup, parser or get_parser())
+
+
+def format_rows(rows: Sequence[Sequence]) -> str:
+    """Lay `rows` out in aligned columns, with a rule under the first row."""
+    widths = [max(len(str(r[i])) for r in rows) for i in range(len(rows[0]))]
+    lines = [
+        '  '.join(str(c).ljust(w) for c, w in zip(r, widths)).rstrip() for r in rows
+    ]
+    lines.insert(1, '  '.join('-' * w for w in widths))
+    return '\n'.join(lines)
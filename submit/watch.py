@@ -0,0 +1,47 @@
+import os
+import time
+from typing import Iterator, Optional, Tuple
+
+__all__ = ['watch_file']
+
+
+def _stat(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def watch_file(
+    path: str, interval: float = 0.1, debounce: float = 0.2
+) -> Iterator[str]:
+    """Yield the text of `path` now, and again each time it is saved with
+    different text, once it has not changed for `debounce` seconds.
+
+    The file is polled every `interval` seconds, which is cheap for one
+    file and sees saves by any editor, including by renaming over it.
+    """
+    last = None
+    text = None
+    while True:
+        state = _stat(path)
+        if state is not None and state != last:
+            # editors may write in several steps, or replace the file
+            while True:
+                time.sleep(debounce)
+                now = _stat(path)
+                if now == state:
+                    break
+                state = now
+            if state is not None:
+                last = state
+                try:
+                    with open(path) as f:
+                        new = f.read()
+                except (OSError, ValueError):
+                    new = None
+                if new is not None and new != text:
+                    text = new
+                    yield text
+        time.sleep(interval)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""Threaded vs asyncio submission benchmark against the stand-in judges.
+
+Pushes the same submissions through two front ends and waits for every
+verdict:
+
+- threaded: a thread per submission in flight, each calling `Submitter`
+  and sleeping between polls, the way a script without asyncio would;
+- async: `AsyncSubmitter`, where waiting happens on the event loop and a
+  few worker threads only carry the requests themselves.
+
+Reports wall time, submissions/sec, p50/p95 time-to-verdict and the peak
+number of threads for each.
+
+usage: python tools/bench_async.py [-n N] [-c CONCURRENCY] [-p POOL]
+                                   [--judges J,J,...] [--server URL]
+                                   [server options]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from judge_server import add_arguments, make_server  # noqa: E402
+from load_test import CODE, PROBLEMS, percentile  # noqa: E402
+
+
+class ThreadPeak:
+    """Samples the number of live threads until stopped."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        # the sampler itself does not count
+        self.peak -= 1
+
+
+def login(submitter, judges):
+    for oj in judges:
+        if not submitter.login(oj, 'bench', 'bench'):
+            # e.g. Luogu wants a captcha; carry on as with a saved session
+            submitter.get_oj(oj).set_logged_in(True)
+
+
+def run_threaded(ns, judges):
+    from submit.base import Language
+    from submit.submitter import Submitter
+
+    submitter = Submitter()
+    login(submitter, judges)
+
+    def one(i):
+        oj = judges[i % len(judges)]
+        judge = submitter.get_oj(oj)
+        start = time.perf_counter()
+        try:
+            with judge.own_session():
+                id = submitter.submit(oj, PROBLEMS[oj], CODE, Language.C__)
+            attempt = 0
+            while True:
+                with judge.own_session():
+                    sub = submitter.get_submission(oj, id)
+                if sub is not None:
+                    return time.perf_counter() - start
+                if time.perf_counter() - start > ns.timeout:
+                    return
+                time.sleep(judge.poll_delay(id, attempt))
+                attempt += 1
+        except Exception:
+            return
+
+    with ThreadPeak() as threads:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(ns.concurrency) as pool:
+            results = list(pool.map(one, range(ns.number)))
+        elapsed = time.perf_counter() - start
+    return results, elapsed, threads.peak
+
+
+def run_async(ns, judges):
+    from submit.aio import AsyncSubmitter
+    from submit.base import Language
+
+    async def drive():
+        async with AsyncSubmitter(max_workers=ns.pool) as asub:
+            login(asub.submitter, judges)
+            sem = asyncio.Semaphore(ns.concurrency)
+
+            async def one(i):
+                oj = judges[i % len(judges)]
+                async with sem:
+                    start = time.perf_counter()
+                    try:
+                        id = await asub.submit(oj, PROBLEMS[oj], CODE, Language.C__)
+                        sub = await asub.wait_submission(oj, id, ns.timeout)
+                    except Exception:
+                        return
+                    if sub is not None:
+                        return time.perf_counter() - start
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*(one(i) for i in range(ns.number)))
+            return results, time.perf_counter() - start
+
+    with ThreadPeak() as threads:
+        results, elapsed = asyncio.run(drive())
+    return results, elapsed, threads.peak
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description='threaded vs asyncio submitting')
+    ap.add_argument('-n', '--number', type=int, default=200, help='submissions')
+    ap.add_argument(
+        '-c', '--concurrency', type=int, default=100, help='submissions in flight'
+    )
+    ap.add_argument(
+        '-p',
+        '--pool',
+        type=int,
+        default=16,
+        help='worker threads of the async front end, default 16',
+    )
+    ap.add_argument(
+        '--judges',
+        default=','.join(PROBLEMS),
+        help='comma-separated judges to spread the load over, default all',
+    )
+    ap.add_argument('-t', '--timeout', type=float, default=60, help='verdict timeout')
+    ap.add_argument('--server', help='use a running judge_server.py at this URL')
+    add_arguments(ap)
+    ns = ap.parse_args(args)
+    judges = ns.judges.split(',')
+    for oj in judges:
+        if oj not in PROBLEMS:
+            ap.error('unknown judge: %s' % oj)
+
+    server = None
+    if ns.server is None:
+        server = make_server(ns)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['SUBMIT_REDIRECT'] = ns.server or server.url
+    print(
+        '%d submissions, %d in flight, over %s'
+        % (ns.number, ns.concurrency, ', '.join(judges))
+    )
+    print(
+        '%-9s %8s %8s %8s %8s %8s %8s'
+        % ('mode', 'errors', 'wall', 'subs/s', 'p50', 'p95', 'threads')
+    )
+    failed = False
+    for mode, run in [('threaded', run_threaded), ('async', run_async)]:
+        with tempfile.TemporaryDirectory() as cache:
+            # keep the stand-in's language tables out of the real cache
+            os.environ['SUBMIT_CACHE_DIR'] = cache
+            # some judges still print while parsing
+            with contextlib.redirect_stdout(io.StringIO()):
+                results, elapsed, threads = run(ns, judges)
+        ok = [r for r in results if r is not None]
+        failed = failed or len(ok) < len(results)
+        print(
+            '%-9s %8d %8.2f %8.2f %8.3f %8.3f %8d'
+            % (
+                mode,
+                len(results) - len(ok),
+                elapsed,
+                len(ok) / elapsed,
+                percentile(ok, 50),
+                percentile(ok, 95),
+                threads,
+            )
+        )
+    print('(wall, p50, p95 in seconds; threads: peak threads alive, server included)')
+    if server is not None:
+        server.shutdown()
+    return int(failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,392 @@
+#!/usr/bin/env python
+"""Offline benchmarks of the judges' page parsing.
+
+Each benchmark runs one judge method (a statement, a running or finished
+submission, a submission with hundreds of tests) against recorded pages served
+by a replaying transport adapter, so nothing touches the network. Reports
+ops/sec and peak memory, and can save or compare against a baseline.
+
+usage: python tools/bench_judges.py [-k PATTERN] [--corpus DIR] [--dump DIR]
+                                    [--save FILE] [--compare FILE]
+
+Without --corpus, synthetic pages shaped like the real ones are used; --dump
+writes them out so they can be replaced by real recordings of the same name.
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+from requests.adapters import BaseAdapter  # noqa: E402
+
+from submit.submitters import NAMES  # noqa: E402
+
+LARGE = 250
+
+
+def _atcoder_submission(n, status='AC'):
+    rows = ''.join(
+        '<tr><td>case_%03d.txt</td><td><span class="label">AC</span></td>'
+        '<td>%d ms</td><td>%d KB</td></tr>' % (i, i % 50, 3000 + i)
+        for i in range(n)
+    )
+    return (
+        '<html><body><div id="main-container"><div class="col-sm-12">'
+        '<div class="panel"><table class="table">'
+        '<tr><th>Submission Time</th><td>2022-06-26 12:00:00</td></tr>'
+        '<tr><th>Task</th><td><a href="/contests/abc255/tasks/abc255_a">'
+        'A - You should output ARC, though this is ABC.</a></td></tr>'
+        '<tr><th>User</th><td>user</td></tr>'
+        '<tr><th>Language</th><td>C++ (GCC 9.2.1)</td></tr>'
+        '<tr><th>Score</th><td>100</td></tr>'
+        '<tr><th>Code Size</th><td>1234 Byte</td></tr>'
+        '<tr><th>Status</th><td id="judge-status">'
+        '<span class="label" title="Accepted">%s</span></td></tr>'
+        '<tr><th>Exec Time</th><td>49 ms</td></tr>'
+        '<tr><th>Memory</th><td>3712 KB</td></tr>'
+        '</table></div>'
+        '<div class="panel"><table class="table">'
+        '<tr><th>Case Name</th><th>Status</th><th>Exec Time</th><th>Memory</th></tr>'
+        '%s</table></div>'
+        '<pre id="submission-code">int main() { return 0; }</pre>'
+        '</div></div></body></html>' % (status, rows)
+    )
+
+
+def _atcoder_problem():
+    part = (
+        '<div class="part"><section><h3>%s</h3><p>Given <var>N</var> integers '
+        '<var>A_1, \\ldots, A_N</var>, print <var>\\sum A_i</var>.</p>'
+        '<pre>%s</pre></section></div>'
+    )
+    parts = part % ('Problem Statement', '') + ''.join(
+        part % ('Sample %s %d' % (kind, i), '3\n1 2 3\n')
+        for i in range(1, 4)
+        for kind in ['Input', 'Output']
+    )
+    return (
+        '<html><body><div id="task-statement"><span class="lang">'
+        '<span class="lang-en">%s</span></span></div></body></html>' % parts
+    )
+
+
+def _codeforces_submission(n):
+    data = {
+        'waiting': 'false',
+        'source': 'int main() { return 0; }',
+        'testCount': str(n),
+        'verdict': '<span class="verdict-accepted">Accepted</span>',
+    }
+    for i in range(1, n + 1):
+        data['verdict#%d' % i] = 'OK'
+        data['timeConsumed#%d' % i] = str(i % 100)
+        data['memoryConsumed#%d' % i] = str(1024 * (100 + i))
+        data['input#%d' % i] = ' '.join(map(str, range(i, i + 200)))
+        data['output#%d' % i] = str(i * 3)
+        data['answer#%d' % i] = str(i * 3)
+        data['checkerStdoutAndStderr#%d' % i] = 'ok 1 number(s): "%d"' % (i * 3)
+    return json.dumps(data)
+
+
+def _codeforces_problem():
+    section = (
+        '<div class="section-title">%s</div><p>Given $$$n$$$ integers '
+        '$$$a_1, a_2, \\ldots, a_n$$$, find the answer.</p>'
+    )
+    return (
+        '<html><body><div class="problem-statement"><div class="header">'
+        '<div class="title">A. Example</div></div>%s'
+        '<div class="sample-tests"><pre>3\n1 2 3</pre><pre>6</pre></div>'
+        '</div></body></html>' % ''.join(section % t for t in ['Input', 'Output'] * 5)
+    )
+
+
+def _cses_result(n):
+    tests = ''.join(
+        '<h4 id="test%d">Test %d</h4><table><tbody><tr><th>input</th><td><samp>'
+        '%s</samp></td></tr></tbody></table><table><tbody><tr><th>correct output'
+        '</th><td><samp>%d</samp></td></tr></tbody></table><table><tbody><tr><th>'
+        'user output</th><td><samp>%d</samp></td></tr></tbody></table>'
+        % (i, i, ' '.join(map(str, range(50))), i, i)
+        for i in range(1, n + 1)
+    )
+    rows = ''.join(
+        '<tr><td>#%d</td><td>ACCEPTED</td><td>0.%02d s</td>'
+        '<td><a href="#test%d">details</a></td></tr>' % (i, i % 100, i)
+        for i in range(1, n + 1)
+    )
+    return (
+        '<html><body><div class="content">'
+        '<table class="summary-table"><tr><td>task</td><td>'
+        '<a href="/problemset/task/1068/">Weird Algorithm</a></td></tr></table>'
+        '<span class="inline-score verdict">ACCEPTED</span>'
+        '<pre class="prettyprint">int main() { return 0; }</pre>'
+        '<table class="closeable"><tr><th>test</th><th>verdict</th><th>time</th>'
+        '<th></th></tr>%s</table>'
+        '<div class="closeable"><h3 class="caption">Test details</h3><div>%s</div>'
+        '</div></div></body></html>' % (rows, tests)
+    )
+
+
+def _luogu_record(n):
+    cases = {
+        str(i): {'time': i, 'memory': 1000 + i, 'status': 12, 'description': ''}
+        for i in range(n)
+    }
+    return json.dumps(
+        {
+            'currentData': {
+                'record': {
+                    'status': 12,
+                    'problem': {'pid': 'P1001'},
+                    'score': 100,
+                    'sourceCode': 'int main() { return 0; }',
+                    'time': n,
+                    'memory': 1000 + n,
+                    'detail': {
+                        'judgeResult': {'subtasks': [{'testCases': cases}]},
+                        'compileResult': {'message': ''},
+                    },
+                }
+            }
+        }
+    )
+
+
+def _usaco_status(n):
+    cases = ''.join(
+        '<a title="Correct answer"><div class="info"><span>%.1fmb</span>'
+        '<span>%dms</span></div></a>' % (2 + i / 10, 10 + i)
+        for i in range(n)
+    )
+    return json.dumps(
+        {'cd': '-1', 'sr': 'Submitted; Results below show ...', 'jd': cases}
+    )
+
+
+def _vjudge_solution():
+    return json.dumps(
+        {
+            'statusType': 0,
+            'status': 'Accepted',
+            'oj': 'CodeForces',
+            'probNum': '1A',
+            'code': 'int main() { return 0; }',
+            'runtime': 15,
+            'memory': 0,
+        }
+    )
+
+
+HTML = 'text/html; charset=utf-8'
+JSON = 'application/json'
+
+
+def fixtures():
+    """Return `{name: (content type, body)}` for every recorded page."""
+    return {
+        'atcoder-problem.html': (HTML, _atcoder_problem()),
+        'atcoder-submission.html': (HTML, _atcoder_submission(20)),
+        'atcoder-submission-running.html': (HTML, _atcoder_submission(0, '3/20')),
+        'atcoder-submission-large.html': (HTML, _atcoder_submission(LARGE)),
+        'codeforces-problem.html': (HTML, _codeforces_problem()),
+        'codeforces-submission.json': (JSON, _codeforces_submission(20)),
+        'codeforces-submission-large.json': (JSON, _codeforces_submission(LARGE)),
+        'cses-status.txt': ('text/plain', 'READY'),
+        'cses-result.html': (HTML, _cses_result(20)),
+        'cses-result-large.html': (HTML, _cses_result(LARGE)),
+        'luogu-record.json': (JSON, _luogu_record(20)),
+        'luogu-record-large.json': (JSON, _luogu_record(LARGE)),
+        'usaco_contest-status.json': (JSON, _usaco_status(20)),
+        'vjudge-solution.json': (JSON, _vjudge_solution()),
+    }
+
+
+class ReplayAdapter(BaseAdapter):
+    """Answers every request with one recorded page per URL prefix."""
+
+    def __init__(self, pages):
+        super().__init__()
+        self.pages = pages
+
+    def send(self, request, **kwargs):
+        for prefix, (ctype, body) in self.pages.items():
+            if request.url.startswith(prefix):
+                break
+        else:
+            raise requests.ConnectionError('no recording for %s' % request.url)
+        r = requests.Response()
+        r.status_code = 200
+        r.headers['Content-Type'] = ctype
+        r._content = body.encode() if isinstance(body, str) else body
+        r.encoding = 'utf-8'
+        r.url = request.url
+        r.request = request
+        return r
+
+    def close(self):
+        pass
+
+
+def _judge(name, pages):
+    obj = NAMES[name]()
+    adapter = ReplayAdapter(pages)
+    obj.session.mount('https://', adapter)
+    obj.session.mount('http://', adapter)
+    obj._csrf_token = 'csrf'
+    return obj
+
+
+def benchmarks(pages):
+    """Yield `(name, setup)`; `setup()` returns the callable to time."""
+
+    def case(judge, method, arg, urls):
+        def setup():
+            obj = _judge(judge, {u: pages[f] for u, f in urls.items()})
+            return lambda: getattr(obj, method)(arg)
+
+        return setup
+
+    for suffix in ['', '-running', '-large']:
+        yield 'atcoder.get_submission' + suffix, case(
+            'atcoder',
+            'get_submission',
+            'abc255/1',
+            {'https://atcoder.jp/': 'atcoder-submission%s.html' % suffix},
+        )
+    yield 'atcoder.get_problem', case(
+        'atcoder',
+        'get_problem',
+        'abc255/abc255_a',
+        {'https://atcoder.jp/': 'atcoder-problem.html'},
+    )
+    for suffix in ['', '-large']:
+        yield 'codeforces.get_submission' + suffix, case(
+            'codeforces',
+            'get_submission',
+            '1_A_1',
+            {'https://codeforces.com/': 'codeforces-submission%s.json' % suffix},
+        )
+        yield 'cses.get_submission' + suffix, case(
+            'cses',
+            'get_submission',
+            '1',
+            {
+                'https://cses.fi/ajax/': 'cses-status.txt',
+                'https://cses.fi/': 'cses-result%s.html' % suffix,
+            },
+        )
+        yield 'luogu.get_submission' + suffix, case(
+            'luogu',
+            'get_submission',
+            '1',
+            {'https://www.luogu.com.cn/': 'luogu-record%s.json' % suffix},
+        )
+    yield 'codeforces.get_problem', case(
+        'codeforces',
+        'get_problem',
+        '1_A',
+        {'https://codeforces.com/': 'codeforces-problem.html'},
+    )
+    yield 'usaco_contest.get_submission', case(
+        'usaco_contest',
+        'get_submission',
+        '1_1',
+        {'http://www.usaco.org/': 'usaco_contest-status.json'},
+    )
+    yield 'vjudge.get_submission', case(
+        'vjudge',
+        'get_submission',
+        '1',
+        {'https://vjudge.net/': 'vjudge-solution.json'},
+    )
+
+
+def measure(func, min_time):
+    func()  # warm up caches and lazy imports
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    n = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        n += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return n / elapsed, peak
+
+
+def load_corpus(path):
+    pages = fixtures()
+    for name in pages:
+        fn = os.path.join(path, name)
+        if os.path.exists(fn):
+            with open(fn, 'rb') as f:
+                pages[name] = (pages[name][0], f.read())
+    return pages
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description='offline judge parser benchmarks')
+    ap.add_argument('-k', help='only run benchmarks matching this glob')
+    ap.add_argument('--corpus', help='directory of recorded pages to use')
+    ap.add_argument('--dump', help='write the synthetic pages here and exit')
+    ap.add_argument('--time', type=float, default=1.0, help='seconds per benchmark')
+    ap.add_argument('--save', help='save results as a baseline JSON file')
+    ap.add_argument('--compare', help='compare against a baseline JSON file')
+    ap.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.2,
+        help='slowdown vs. baseline that counts as a regression, default 0.2',
+    )
+    ns = ap.parse_args(args)
+    if ns.dump:
+        os.makedirs(ns.dump, exist_ok=True)
+        for name, (_, body) in fixtures().items():
+            with open(os.path.join(ns.dump, name), 'w') as f:
+                f.write(body)
+        return
+    pages = load_corpus(ns.corpus) if ns.corpus else fixtures()
+    baseline = {}
+    if ns.compare:
+        with open(ns.compare) as f:
+            baseline = json.load(f)
+    results = {}
+    regressed = False
+    print('%-36s %12s %12s %10s' % ('benchmark', 'ops/sec', 'peak KiB', 'vs base'))
+    for name, setup in benchmarks(pages):
+        if ns.k and not fnmatch.fnmatch(name, ns.k):
+            continue
+        func = setup()
+        # some judges still print debugging output while parsing
+        with contextlib.redirect_stdout(io.StringIO()):
+            ops, peak = measure(func, ns.time)
+        results[name] = {'ops': ops, 'peak': peak}
+        change = ''
+        if name in baseline:
+            ratio = ops / baseline[name]['ops']
+            change = '%+.0f%%' % ((ratio - 1) * 100)
+            if ratio < 1 - ns.tolerance:
+                change += ' !'
+                regressed = True
+        print('%-36s %12.1f %12.1f %10s' % (name, ops, peak / 1024, change))
+    if ns.save:
+        with open(ns.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    return int(regressed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
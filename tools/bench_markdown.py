@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""Compare Problem.get_html for Markdown statements: local vs. GitHub API.
+
+usage: python tools/bench_markdown.py [CORPUS_DIR] [-n N] [--github]
+
+CORPUS_DIR holds recorded statements as *.md files; without it, the
+statements in SAMPLES are used. The GitHub API path is only timed with
+--github, since it needs the network.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from submit.render import markdown_to_html  # noqa: E402
+
+# Luogu-style statements covering what the renderer handles
+SAMPLES = [
+    """# P1001 A+B Problem
+
+## Description
+
+Given two integers $a$ and $b$, print $a+b$.
+
+## Input format
+
+One line with **two** integers $a, b$ ($|a|, |b| \\le 10^9$).
+
+## Output format
+
+One integer, the sum.
+
+## Sample
+
+```
+1 2
+```
+
+```
+3
+```
+
+## Hint
+
+- `long long` is not needed, but *check* the bounds.
+- See [the FAQ](https://www.luogu.com.cn/discuss/1) for I/O.
+""",
+    """## Description
+
+There are $n$ cities and $m$ roads. The $i$-th road joins $u_i$ and $v_i$
+and has length $w_i$. Find the shortest path from $1$ to every city.
+
+$$
+d_v = \\min_{(u, v) \\in E} (d_u + w_{u,v})
+$$
+
+| Test | $n \\le$ | $m \\le$ | Special |
+| --- | --- | --- | --- |
+| 1-3 | $100$ | $10^3$ | None |
+| 4-7 | $10^5$ | $2 \\times 10^5$ | $w_i = 1$ |
+| 8-10 | $10^5$ | $2 \\times 10^5$ | None |
+
+> The input is large; use fast I/O.
+
+1. Read the graph.
+2. Run Dijkstra's algorithm with a heap.
+3. Print $d_1, d_2, \\dots, d_n$, using `-1` for unreachable cities.
+""",
+    """## Statement
+
+A string $s$ of length $|s| \\le 2 \\times 10^5$ is *beautiful* if every
+prefix has at least as many `(` as `)`. Count the beautiful
+subsequences of $s$ modulo $998\\,244\\,353$.<br>
+Here is a picture: ![tree](https://cdn.luogu.com.cn/upload/pic/1.png)
+
+---
+
+Subtask 1 (**20** points): $|s| \\le 20$.<br>
+Subtask 2 (**80** points): no further constraints.
+""",
+]
+
+
+def github(text):
+    import requests
+
+    return requests.post(
+        'https://api.github.com/markdown', json={'text': text}, timeout=10
+    ).text
+
+
+def bench(func, texts, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / (n * len(texts))
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description='benchmark Markdown rendering')
+    ap.add_argument('corpus', nargs='?', help='directory of recorded *.md statements')
+    ap.add_argument('-n', type=int, default=20, help='rounds, default 20')
+    ap.add_argument('--github', action='store_true', help='also time the API')
+    ns = ap.parse_args(args)
+    texts = []
+    if ns.corpus is None:
+        texts = SAMPLES
+    else:
+        pattern = os.path.join(ns.corpus, '**', '*.md')
+        for fn in sorted(glob.glob(pattern, recursive=True)):
+            with open(fn, encoding='utf-8') as f:
+                texts.append(f.read())
+        if not texts:
+            ap.error('no *.md files in %s' % ns.corpus)
+    print('%d statements' % len(texts))
+    cold = bench(markdown_to_html.__wrapped__, texts, ns.n)
+    print('local, uncached: %10.1f us/statement' % (cold * 1e6))
+    markdown_to_html.cache_clear()
+    bench(markdown_to_html, texts, 1)
+    hot = bench(markdown_to_html, texts, ns.n)
+    print('local, cached:   %10.1f us/statement' % (hot * 1e6))
+    if ns.github:
+        print('GitHub API:      %10.1f us/statement' % (bench(github, texts, 1) * 1e6))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""Time parse_html per judge for every installed BeautifulSoup parser.
+
+usage: python tools/bench_parse.py [CORPUS_DIR] [-n N]
+       python tools/bench_parse.py --check
+
+CORPUS_DIR has one directory of recorded *.html pages per judge, e.g.
+CORPUS_DIR/atcoder/submission.html. Without it, the HTML pages bundled with
+bench_judges.py are timed.
+
+--check runs the judges' own parsing (the benchmarks of bench_judges.py)
+with every parser instead. On its pages all parsers have to give the same
+problems and submissions. On copies with the end tags HTML lets pages leave
+out (</p>, </li>, </td>, ...) removed, the default parser has to give the
+same results again; other parsers are only reported.
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib.util
+import io
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import submit.util  # noqa: E402
+from submit.util import PARSERS, parse_html  # noqa: E402
+
+OPTIONAL_END_RE = re.compile(r'</(?:p|li|dt|dd|tr|td|th|option)>')
+
+
+def result(value):
+    if hasattr(value, 'to_json'):
+        return value.to_json()
+    if hasattr(value, 'get_text'):
+        # the statement HTML itself is serialized differently per parser
+        return value.id, ''.join(value.get_text().split()), value.cases
+    return value
+
+
+def run(setup, parser):
+    submit.util._parser = parser
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return result(setup()())
+    except Exception as e:
+        return repr(e)
+    finally:
+        submit.util._parser = None
+
+
+def check(parsers):
+    """Print a row per benchmark; return whether the default parser failed."""
+    from bench_judges import benchmarks, fixtures
+
+    pages = fixtures()
+    unclosed = {
+        k: (t, OPTIONAL_END_RE.sub('', v) if t.startswith('text/html') else v)
+        for k, (t, v) in pages.items()
+    }
+    default = parsers.index(submit.util.get_parser())
+    print('%-56s' % 'benchmark' + ''.join('%14s' % x for x in parsers))
+    failed = False
+    expected = {}
+    for name, setup in benchmarks(pages):
+        results = [run(setup, x) for x in parsers]
+        # on well-formed pages every parser has to agree
+        expected[name] = results[0]
+        row = ['ok' if x == results[0] else 'DIFFERS' for x in results]
+        failed = failed or 'DIFFERS' in row
+        print('%-56s' % name + ''.join('%14s' % x for x in row))
+    for name, setup in benchmarks(unclosed):
+        row = ['ok' if run(setup, x) == expected[name] else 'DIFFERS' for x in parsers]
+        # only the parser the judges would use has to cope
+        failed = failed or row[default] != 'ok'
+        print(
+            '%-56s' % (name + ', no optional end tags')
+            + ''.join('%14s' % x for x in row)
+        )
+    print('(%s is the one the judges use)' % parsers[default])
+    return failed
+
+
+def corpus(path):
+    """Return `{judge: [page, ...]}` for the recorded pages under `path`."""
+    pages = {}
+    for judge in sorted(os.listdir(path)):
+        for fn in sorted(glob.glob(os.path.join(path, judge, '*.html'))):
+            with open(fn, 'rb') as f:
+                pages.setdefault(judge, []).append(f.read())
+    return pages
+
+
+def bundled():
+    """Return `{judge: [page, ...]}` for the HTML pages of bench_judges.py."""
+    from bench_judges import fixtures
+
+    pages = {}
+    for name, (ctype, body) in sorted(fixtures().items()):
+        if ctype.startswith('text/html'):
+            pages.setdefault(name.split('-', 1)[0], []).append(body)
+    return pages
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description='benchmark HTML parser backends')
+    ap.add_argument(
+        'corpus',
+        nargs='?',
+        help='directory of <judge>/*.html pages, default the bundled pages',
+    )
+    ap.add_argument('-n', type=int, default=10, help='rounds, default 10')
+    ap.add_argument(
+        '--check', action='store_true', help='check the parsers agree instead'
+    )
+    ns = ap.parse_args(args)
+    parsers = [
+        x
+        for x in PARSERS
+        if x == 'html.parser' or importlib.util.find_spec(x) is not None
+    ]
+    if ns.check:
+        return int(check(parsers))
+    judges = bundled() if ns.corpus is None else corpus(ns.corpus)
+    print('%-16s' % 'judge' + ''.join('%14s' % x for x in parsers))
+    for judge, pages in judges.items():
+        row = '%-16s' % judge
+        for parser in parsers:
+            start = time.perf_counter()
+            for _ in range(ns.n):
+                for page in pages:
+                    parse_html(page, parser)
+            ms = (time.perf_counter() - start) / (ns.n * len(pages)) * 1000
+            row += '%11.2f ms' % ms
+        print(row)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
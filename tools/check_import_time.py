@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""Fail if importing the CLI gets slow or pulls in judge/HTTP modules.
+
+Runs ``python -X importtime -c 'import submit.__main__'`` in a fresh
+interpreter and checks the cumulative import time of the ``submit`` package
+against a budget.
+
+usage: python tools/check_import_time.py [budget_ms] [-m MODULE]...
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+FORBIDDEN = [
+    'requests',
+    'bs4',
+    'markdownify',
+    'Crypto',
+    'submit.session',
+    'submit.submitters.atcoder',
+    'submit.submitters.codeforces',
+    'submit.submitters.cses',
+    'submit.submitters.luogu',
+    'submit.submitters.usaco_contest',
+    'submit.submitters.usaco',
+    'submit.submitters.vjudge',
+]
+
+
+def measure(module):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    p = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        cwd=root,
+        capture_output=True,
+        text=True,
+    )
+    if p.returncode:
+        raise SystemExit(p.stderr)
+    times = {}
+    for line in p.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:') :].split('|')
+        try:
+            times[name.strip()] = int(cumulative)
+        except ValueError:  # header line
+            continue
+    return times
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description='check cold-start import time')
+    ap.add_argument('budget', nargs='?', type=float, default=60, help='budget in ms')
+    ap.add_argument('-m', '--module', action='append', help='module to import')
+    ns = ap.parse_args(args)
+    failed = False
+    for module in ns.module or ['submit.__main__']:
+        times = measure(module)
+        bad = [x for x in FORBIDDEN if x in times]
+        if bad:
+            print('%s imports %s' % (module, ', '.join(bad)))
+            failed = True
+        total = max(v for k, v in times.items() if k.split('.')[0] == 'submit')
+        print('%s: %.1f ms (budget %.1f ms)' % (module, total / 1000, ns.budget))
+        if total / 1000 > ns.budget:
+            failed = True
+    return int(failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""Check statement rendering on a few known inputs.
+
+Converts a Codeforces-style HTML statement to Markdown with the installed
+markdownify, and renders Markdown that must come out sanitized. Prints
+every mismatch and exits with 1 if there was one.
+
+usage: python tools/check_render.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from submit.render import html_to_markdown, markdown_to_html  # noqa: E402
+
+CODEFORCES = (
+    '<div class="problem-statement"><div class="header">'
+    '<div class="title">A. Watermelon</div>'
+    '<div class="time-limit"><div class="property-title">time limit per test'
+    '</div>1 second</div></div>'
+    '<div><p>Split $$$w$$$ kilos into two even parts.</p></div>'
+    '<div class="input-specification"><div class="section-title">Input</div>'
+    '<p>One integer <var>w</var> ($$$1 \\le w \\le 100$$$).</p></div>'
+    '<div class="sample-tests"><div class="section-title">Examples</div>'
+    '<div class="input"><pre>8\n</pre></div></div></div>'
+)
+
+# (input, substrings the output must contain, substrings it must not)
+HTML_CASES = [
+    (
+        CODEFORCES,
+        ['## A. Watermelon', '### Input', '### Examples', '$w$', '**time limit'],
+        ['<div'],
+    ),
+]
+MARKDOWN_CASES = [
+    ('# T\n\n$a_1 * b_2$ and *em*', ['<h1>T</h1>', '$a_1 * b_2$', '<em>em</em>'], []),
+    ('x<sup>2</sup> <script>alert(1)</script>', ['<sup>2</sup>'], ['<script']),
+    ('[x](javascript:alert"1)', [], ['<a', 'javascript']),
+    ('[x](http://a"onclick="b)', ['href="http://a&quot;onclick'], ['"onclick']),
+    ('![a" onerror="x](p.png)', ['alt="a&quot; onerror'], ['" onerror']),
+]
+
+
+def check(func, cases):
+    failed = False
+    for text, want, avoid in cases:
+        out = func(text)
+        bad = ['missing %r' % x for x in want if x not in out]
+        bad += ['unexpected %r' % x for x in avoid if x in out]
+        if bad:
+            print('%s(%r):\n  %s\n%s' % (func.__name__, text, '\n  '.join(bad), out))
+            failed = True
+    return failed
+
+
+def main():
+    failed = check(html_to_markdown, HTML_CASES)
+    failed = check(markdown_to_html, MARKDOWN_CASES) or failed
+    print('FAILED' if failed else 'ok')
+    return int(failed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
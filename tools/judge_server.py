@@ -0,0 +1,776 @@
+#!/usr/bin/env python
+"""A local stand-in for the judges, for end-to-end load testing.
+
+Serves the login, CSRF, submit and status endpoints the submitters use for
+Codeforces, AtCoder, CSES, Luogu, VJudge and both USACO sites, dispatching on
+the `Host` header. Submissions wait in a simulated queue and are judged after
+delays drawn from configurable distributions.
+
+usage: python tools/judge_server.py [--port PORT] [--queue DIST] [--judge DIST]
+                                    [--workers N] [--accept P] [--tests N]
+
+Point the submitters at it with `SUBMIT_REDIRECT=http://127.0.0.1:PORT` (or
+`session.redirect(url)`); see `tools/load_test.py` for a load driver.
+A DIST is `SECONDS`, `const:S`, `uniform:A,B`, `exp:MEAN` or `normal:MU,SIGMA`.
+"""
+
+import argparse
+import email.parser
+import email.policy
+import heapq
+import html
+import json
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.parse
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CSRF = secrets.token_hex(16)
+
+
+def parse_dist(spec):
+    """Return a function drawing non-negative delays from `spec`."""
+    kind, _, args = spec.partition(':')
+    if not args:
+        kind, args = 'const', kind
+    try:
+        a = [float(x) for x in args.split(',')]
+        func = {
+            'const': lambda: a[0],
+            'uniform': lambda: random.uniform(a[0], a[1]),
+            'exp': lambda: random.expovariate(1 / a[0]) if a[0] else 0.0,
+            'normal': lambda: random.gauss(a[0], a[1]),
+        }[kind]
+        func()
+    except (KeyError, IndexError, ValueError):
+        raise argparse.ArgumentTypeError('bad distribution: %r' % spec)
+    return lambda: max(0.0, func())
+
+
+class Sub:
+    def __init__(self, id, problem, start, end, tests, fail):
+        self.id = id
+        self.problem = problem
+        self.start = start
+        self.end = end
+        self.tests = tests
+        self.fail = fail  # 1-based failing test, or None if accepted
+        self.times = [random.randint(1, 200) for _ in range(tests)]
+        self.memory = [random.randint(1000, 60000) for _ in range(tests)]
+
+    @property
+    def ok(self):
+        return self.fail is None
+
+    @property
+    def run(self):
+        """Number of tests that were run."""
+        return self.tests if self.ok else self.fail
+
+    def state(self):
+        now = time.time()
+        if now < self.start:
+            return 'queued', 0.0
+        if now < self.end:
+            return 'running', (now - self.start) / (self.end - self.start)
+        return 'done', 1.0
+
+
+class Request:
+    def __init__(self, method, url, headers, body):
+        self.method = method
+        parts = urllib.parse.urlsplit(url)
+        self.path = parts.path
+        self.query = dict(urllib.parse.parse_qsl(parts.query))
+        self.headers = headers
+        cookie = SimpleCookie(headers.get('Cookie', ''))
+        self.cookies = {k: v.value for k, v in cookie.items()}
+        ctype = headers.get('Content-Type', '')
+        self.form = {}
+        self.json = None
+        if ctype.startswith('application/x-www-form-urlencoded'):
+            self.form = dict(urllib.parse.parse_qsl(body.decode()))
+        elif ctype.startswith('multipart/form-data'):
+            msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                b'Content-Type: ' + ctype.encode() + b'\r\n\r\n' + body
+            )
+            for part in msg.iter_parts():
+                name = part.get_param('name', header='content-disposition')
+                self.form[name] = part.get_payload(decode=True).decode('utf-8')
+        elif ctype.startswith('application/json') and body:
+            self.json = json.loads(body)
+
+    @property
+    def client(self):
+        return self.cookies.get('session', '')
+
+
+def page(body, status=200):
+    return status, 'text/html; charset=utf-8', '<html><body>%s</body></html>' % body
+
+
+def text(body, status=200):
+    return status, 'text/plain; charset=utf-8', body
+
+
+def jsonify(obj, status=200):
+    return status, 'application/json', json.dumps(obj)
+
+
+def redirect(location):
+    return 302, 'text/html', '', {'Location': location}
+
+
+def login(response):
+    status, ctype, body, *headers = response
+    headers = dict(headers[0] if headers else {})
+    headers['Set-Cookie'] = 'session=%s; Path=/' % secrets.token_hex(8)
+    return status, ctype, body, headers
+
+
+ROUTES = []
+
+
+def route(host, method, pattern):
+    def decorator(func):
+        ROUTES.append((host, method, re.compile(pattern), func))
+        return func
+
+    return decorator
+
+
+# Codeforces
+
+CF_PAGE = '<script>var csrf=\'%s\';</script>%%s' % CSRF
+
+
+@route('codeforces.com', 'GET', r'/(enter|profile/load)?')
+@route('codeforces.com', 'GET', r'/problemsets?/\w+/submit|/contest/\w+/submit')
+def cf_page(server, req, *_):
+    return page(CF_PAGE % '<a href="/12345/logout">Logout</a>')
+
+
+@route('codeforces.com', 'POST', r'/enter')
+def cf_login(server, req):
+    return login(redirect('/profile/load'))
+
+
+@route('codeforces.com', 'GET', r'/profile')
+def cf_profile(server, req):
+    return redirect('/profile/load')
+
+
+@route('codeforces.com', 'GET', r'/12345/logout')
+def cf_logout(server, req):
+    return page(
+        'Codeforces.showMessage("Goodbye, load. '
+        'Looking forward to seeing you at Codeforces.");'
+    )
+
+
+@route(
+    'codeforces.com', 'GET', r'/(?:contest|problemset/problem)/(\w+)/(?:problem/)?(\w+)'
+)
+def cf_problem(server, req, contest, problem):
+    return page(
+        '<div class="problem-statement"><div class="header"><div class="title">'
+        '%s. Stand-in</div></div><p>Print $$$a+b$$$.</p></div>' % problem
+    )
+
+
+@route('codeforces.com', 'POST', r'/problemsets?/(\w+)/submit|/contest/(\w+)/submit')
+def cf_submit(server, req, *contest):
+    problem = req.form.get('submittedProblemCode') or req.form.get(
+        'submittedProblemIndex'
+    )
+    sub = server.submit('codeforces', problem, req.client)
+    return page(
+        CF_PAGE % '<tr data-submission-id="%d" submission-id="%d">' % (sub.id, sub.id)
+    )
+
+
+@route('codeforces.com', 'POST', r'/data/submitSource')
+def cf_status(server, req):
+    sub = server.get(req.form['submissionId'])
+    if sub is None:
+        return text('', 404)
+    if sub.state()[0] != 'done':
+        return jsonify({'waiting': 'true'})
+    if sub.ok:
+        verdict = '<span class="verdict-accepted">Accepted</span>'
+    else:
+        verdict = '<span class="verdict-rejected">Wrong answer on test %d</span>' % (
+            sub.fail
+        )
+    data = {
+        'waiting': 'false',
+        'source': 'int main() {}',
+        'testCount': str(sub.run),
+        'verdict': verdict,
+    }
+    for i in range(1, sub.run + 1):
+        data['verdict#%d' % i] = 'WRONG_ANSWER' if i == sub.fail else 'OK'
+        data['timeConsumed#%d' % i] = str(sub.times[i - 1])
+        data['memoryConsumed#%d' % i] = str(sub.memory[i - 1] * 1024)
+        data['input#%d' % i] = '1 2'
+        data['output#%d' % i] = '3'
+        data['answer#%d' % i] = '3'
+        data['checkerStdoutAndStderr#%d' % i] = 'ok'
+    return jsonify(data)
+
+
+# AtCoder
+
+AC_PAGE = '<script>var csrfToken = "%s";</script>%%s' % CSRF
+
+
+@route('atcoder.jp', 'GET', r'/(login|home|settings)')
+@route('atcoder.jp', 'GET', r'/contests/\w+/submit')
+def ac_page(server, req, *_):
+    return page(AC_PAGE % '')
+
+
+AC_CSRF_ERROR = '<div class="alert alert-danger">Invalid request.</div>'
+AC_LOGIN_ERROR = (
+    '<div class="alert alert-danger">Username or Password is incorrect.</div>'
+)
+
+
+@route('atcoder.jp', 'POST', r'/login')
+def ac_login(server, req):
+    # both failures show the login form again with a flash message
+    if req.form.get('csrf_token') != CSRF:
+        return page(AC_PAGE % AC_CSRF_ERROR)
+    if req.form.get('password') == 'wrong':
+        return page(AC_PAGE % AC_LOGIN_ERROR)
+    return login(redirect('/home'))
+
+
+@route('atcoder.jp', 'POST', r'/logout')
+def ac_logout(server, req):
+    return redirect('/home')
+
+
+@route('atcoder.jp', 'GET', r'/contests/(\w+)/tasks/(\w+)')
+def ac_problem(server, req, contest, problem):
+    return page(
+        '<div id="task-statement"><span class="lang"><span class="lang-en">'
+        '<div class="part"><section><h3>Problem Statement</h3><p>Print '
+        '<var>A+B</var>.</p></section></div>'
+        '<div class="part"><section><h3>Sample Input 1</h3><pre>1 2\n</pre>'
+        '</section></div><div class="part"><section><h3>Sample Output 1</h3>'
+        '<pre>3\n</pre></section></div></span></span></div>'
+    )
+
+
+@route('atcoder.jp', 'POST', r'/contests/(\w+)/submit')
+def ac_submit(server, req, contest):
+    sub = server.submit('atcoder', req.form.get('data.TaskScreenName'), req.client)
+    return redirect('/contests/%s/submissions/me?latest=%d' % (contest, sub.id))
+
+
+@route('atcoder.jp', 'GET', r'/contests/(\w+)/submissions/me')
+def ac_mine(server, req, contest):
+    return page(
+        AC_PAGE % '<div class="table-responsive"><table><tr>'
+        '<td class="submission-score" data-id="%s">0</td></tr></table></div>'
+        % req.query.get('latest', '')
+    )
+
+
+@route('atcoder.jp', 'GET', r'/contests/(\w+)/submissions/(\d+)')
+def ac_status(server, req, contest, id):
+    sub = server.get(id)
+    if sub is None:
+        return page('', 404)
+    state, progress = sub.state()
+    if state == 'queued':
+        status = 'WJ'
+    elif state == 'running':
+        status = '%d/%d' % (int(progress * sub.tests), sub.tests)
+    else:
+        status = 'AC' if sub.ok else 'WA'
+    cases = ''
+    if state == 'done':
+        cases = ''.join(
+            '<tr><td>%02d.txt</td><td><span>%s</span></td><td>%d ms</td>'
+            '<td>%d KB</td></tr>'
+            % (i, 'WA' if i == sub.fail else 'AC', sub.times[i - 1], sub.memory[i - 1])
+            for i in range(1, sub.tests + 1)
+        )
+    return page(
+        '<div><table><tr><th>Submission Time</th><td>now</td></tr>'
+        '<tr><th>Task</th><td><a href="/contests/%s/tasks/%s">Task</a></td></tr>'
+        '<tr><th>User</th><td>load</td></tr><tr><th>Language</th><td>C++</td></tr>'
+        '<tr><th>Score</th><td>%d</td></tr><tr><th>Code Size</th><td>1 Byte</td></tr>'
+        '<tr><th>Status</th><td id="judge-status"><span title="%s">%s</span></td></tr>'
+        '<tr><th>Exec Time</th><td>%d ms</td></tr><tr><th>Memory</th><td>%d KB</td>'
+        '</tr></table></div><div><table><tr><th>Case Name</th><th>Status</th>'
+        '<th>Exec Time</th><th>Memory</th></tr>%s</table></div>'
+        '<pre id="submission-code">int main() {}</pre>'
+        % (
+            contest,
+            sub.problem,
+            100 if sub.ok else 0,
+            status,
+            status,
+            max(sub.times),
+            max(sub.memory),
+            cases,
+        )
+    )
+
+
+# CSES
+
+CSES_FORM = '<form><input name="csrf_token" value="%s"></form>' % CSRF
+
+
+@route('cses.fi', 'GET', r'/login|/problemset/submit/\d+/')
+def cses_form(server, req):
+    return page(CSES_FORM)
+
+
+@route('cses.fi', 'POST', r'/login')
+def cses_login(server, req):
+    return login(redirect('/'))
+
+
+@route('cses.fi', 'GET', r'/')
+def cses_home(server, req):
+    return page(
+        '<div class="controls"><a class="account" href="/user/1">load</a></div>'
+    )
+
+
+@route('cses.fi', 'GET', r'/logout')
+def cses_logout(server, req):
+    return redirect('/login')
+
+
+@route('cses.fi', 'GET', r'/problemset/task/(\d+)/?')
+def cses_problem(server, req, id):
+    return page('<div class="content"><p>Print a+b.</p></div>')
+
+
+@route('cses.fi', 'POST', r'/course/send.php')
+def cses_submit(server, req):
+    sub = server.submit('cses', req.form.get('task'), req.client)
+    return redirect('/problemset/result/%d/' % sub.id)
+
+
+@route('cses.fi', 'GET', r'/ajax/get_status.php')
+def cses_status(server, req):
+    sub = server.get(req.query.get('entry'))
+    if sub is None:
+        return text('', 404)
+    return text(
+        {'queued': 'PENDING', 'running': 'TESTING'}.get(sub.state()[0], 'READY')
+    )
+
+
+@route('cses.fi', 'GET', r'/problemset/result/(\d+)/')
+def cses_result(server, req, id):
+    sub = server.get(id)
+    if sub is None:
+        return page('', 404)
+    verdict = 'ACCEPTED' if sub.ok else 'WRONG ANSWER'
+    rows = ''.join(
+        '<tr><td>#%d</td><td>%s</td><td>%.2f s</td><td><a href="#test%d">view</a>'
+        '</td></tr>'
+        % (
+            i,
+            'WRONG ANSWER' if i == sub.fail else 'ACCEPTED',
+            sub.times[i - 1] / 1000,
+            i,
+        )
+        for i in range(1, sub.tests + 1)
+    )
+    tests = ''.join(
+        '<h4 id="test%d">Test %d</h4><table><tbody><tr><th>input</th><td><samp>1 2'
+        '</samp></td></tr></tbody></table>' % (i, i)
+        for i in range(1, sub.tests + 1)
+    )
+    return page(
+        '<table class="summary-table"><tr><td><a href="/problemset/task/%s/">Task'
+        '</a></td></tr></table><span class="inline-score verdict">%s</span>'
+        '<pre class="prettyprint">int main() {}</pre><table class="closeable"><tr>'
+        '<th>test</th></tr>%s</table><div class="closeable"><h3 class="caption">'
+        'Test details</h3><div>%s</div></div>' % (sub.problem, verdict, rows, tests)
+    )
+
+
+# Luogu
+
+LUOGU_PAGE = '<meta name="csrf-token" content="%s">' % CSRF
+
+
+@route('www.luogu.com.cn', 'GET', r'/auth/login|/')
+def luogu_page(server, req):
+    return page(LUOGU_PAGE)
+
+
+@route('www.luogu.com.cn', 'GET', r'/user/setting')
+def luogu_setting(server, req):
+    return jsonify({'currentTemplate': 'UserSetting'})
+
+
+@route('www.luogu.com.cn', 'POST', r'/api/auth/logout')
+def luogu_logout(server, req):
+    return jsonify({})
+
+
+@route('www.luogu.com.cn', 'GET', r'/problem/(\w+)')
+def luogu_problem(server, req, pid):
+    if not req.query.get('_contentOnly'):
+        return page(LUOGU_PAGE)
+    return jsonify(
+        {
+            'currentData': {
+                'problem': {'description': 'Print $a+b$.', 'samples': [['1 2', '3']]}
+            }
+        }
+    )
+
+
+@route('www.luogu.com.cn', 'POST', r'/fe/api/problem/submit/(\w+)')
+def luogu_submit(server, req, pid):
+    if req.headers.get('x-csrf-token') != CSRF:
+        return jsonify({'errorMessage': 'csrf'}, 403)
+    return jsonify({'rid': server.submit('luogu', pid, req.client).id})
+
+
+@route('www.luogu.com.cn', 'GET', r'/record/(\d+)')
+def luogu_status(server, req, id):
+    sub = server.get(id)
+    if sub is None:
+        return jsonify({}, 404)
+    state = sub.state()[0]
+    status = {'queued': 0, 'running': 1}.get(state, 12 if sub.ok else 6)
+    cases = {}
+    if state == 'done':
+        cases = {
+            str(i): {
+                'time': sub.times[i],
+                'memory': sub.memory[i],
+                'status': 6 if i + 1 == sub.fail else 12,
+            }
+            for i in range(sub.tests)
+        }
+    return jsonify(
+        {
+            'currentData': {
+                'record': {
+                    'status': status,
+                    'problem': {'pid': sub.problem},
+                    'score': 100 if sub.ok else 0,
+                    'sourceCode': 'int main() {}',
+                    'time': sum(sub.times),
+                    'memory': max(sub.memory),
+                    'detail': {
+                        'judgeResult': {'subtasks': [{'testCases': cases}]},
+                        'compileResult': {'message': ''},
+                    },
+                }
+            }
+        }
+    )
+
+
+# VJudge
+
+
+@route('vjudge.net', 'POST', r'/user/login')
+def vjudge_login(server, req):
+    return login(text('success'))
+
+
+@route('vjudge.net', 'POST', r'/user/logout')
+def vjudge_logout(server, req):
+    return text('')
+
+
+@route('vjudge.net', 'POST', r'/user/checkLogInStatus')
+def vjudge_check(server, req):
+    return jsonify(True)
+
+
+@route('vjudge.net', 'GET', r'/util/cfg')
+def vjudge_cfg(server, req):
+    languages = {'54': 'GNU G++17 7.3.0', '31': 'Python 3.8'}
+    return jsonify(
+        {
+            'remoteOJs': {
+                oj: {'languages': languages}
+                for oj in ['CodeForces', 'AtCoder', 'HDU', 'POJ']
+            }
+        }
+    )
+
+
+@route('vjudge.net', 'POST', r'/problem/submit')
+def vjudge_submit(server, req):
+    problem = '%s-%s' % (req.form.get('oj'), req.form.get('probNum'))
+    return jsonify({'runId': server.submit('vjudge', problem, req.client).id})
+
+
+@route('vjudge.net', 'POST', r'/solution/data/(\d+)')
+def vjudge_status(server, req, id):
+    sub = server.get(id)
+    if sub is None:
+        return jsonify({}, 404)
+    state = sub.state()[0]
+    oj, _, num = sub.problem.partition('-')
+    data = {'oj': oj, 'probNum': num, 'code': 'int main() {}'}
+    if state != 'done':
+        data.update(statusType=2, status='Pending' if state == 'queued' else 'Judging')
+    elif sub.ok:
+        data.update(statusType=0, status='Accepted', runtime=max(sub.times))
+        data['memory'] = max(sub.memory)
+    else:
+        data.update(statusType=1, status='Wrong answer', statusCanonical='WA')
+    return jsonify(data)
+
+
+# USACO contests
+
+
+@route('www.usaco.org', 'POST', r'/current/tpcm/login-session.php')
+def usaco_login(server, req):
+    return login(jsonify({'code': 1}))
+
+
+@route('www.usaco.org', 'GET', r'/current/tpcm/logout.php')
+def usaco_logout(server, req):
+    return redirect('/index.php')
+
+
+@route('www.usaco.org', 'GET', r'/index.php')
+def usaco_index(server, req):
+    if req.query.get('page') != 'viewproblem2':
+        return page('Welcome, load')
+    last = server.last.get(('usaco_contest', req.client))
+    return page(
+        'Welcome, load<h2>Stand-in</h2><div class="problem-text">Print a+b.</div>'
+        '<pre class="in">1 2</pre><pre class="out">3</pre>%s'
+        % ('' if last is None else '<div id="last-status" data-sid="%d"></div>' % last)
+    )
+
+
+@route('www.usaco.org', 'POST', r'/current/tpcm/submit-solution.php')
+def usaco_submit(server, req):
+    server.submit('usaco_contest', req.form.get('cpid'), req.client)
+    return jsonify({'code': 1})
+
+
+@route('www.usaco.org', 'POST', r'/current/tpcm/status-update.php')
+def usaco_status(server, req):
+    sub = server.get(req.form.get('sid'))
+    if sub is None:
+        return jsonify({}, 404)
+    if sub.state()[0] != 'done':
+        return jsonify({'cd': '-9', 'sr': 'Waiting for judge', 'output': ''})
+    jd = ''.join(
+        (
+            '<a title="Wrong answer"></a>'
+            if i + 1 == sub.fail
+            else '<a title="Correct answer"><div class="info"><span>%.1fmb</span>'
+            '<span>%dms</span></div></a>' % (sub.memory[i] / 1024, sub.times[i])
+        )
+        for i in range(sub.tests)
+    )
+    return jsonify({'cd': '-1', 'sr': 'Submitted; Results below', 'jd': jd})
+
+
+# USACO training
+
+
+@route('train.usaco.org', 'POST', r'/')
+def train_login(server, req):
+    return login(page('<a href="/usacogate?a=%s">Continue</a>' % CSRF))
+
+
+@route('train.usaco.org', 'GET', r'/')
+def train_home(server, req):
+    return page('Refresh this page')
+
+
+@route('train.usaco.org', 'POST', r'/usacologout')
+def train_logout(server, req):
+    return page('')
+
+
+@route('train.usaco.org', 'POST', r'/upload3')
+def train_submit(server, req):
+    # this judge answers the upload itself once the tests are done
+    sub = server.submit('usaco', req.form.get('S'), req.client)
+    time.sleep(max(0.0, sub.end - time.time()))
+    result = 'Compile: OK\n\n' + ''.join(
+        'Test %d: %s [%.3f secs, %d KB]\n'
+        % (
+            i,
+            'BADCHECK' if i == sub.fail else 'TEST OK',
+            sub.times[i - 1] / 1000,
+            sub.memory[i - 1],
+        )
+        for i in range(1, sub.run + 1)
+    )
+    if sub.ok:
+        result += '\nAll tests OK.\n'
+    else:
+        result += '> Run %d: wrong answer\nFull Test Data\n' % sub.fail
+    return page('<div><font><div>%s</div></font></div>' % html.escape(result))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def handle_one(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        req = Request(self.command, self.path, self.headers, self.rfile.read(length))
+        host = (self.headers.get('Host') or '').partition(':')[0]
+        for rhost, method, pattern, func in ROUTES:
+            if rhost != host or method != self.command:
+                continue
+            match = pattern.fullmatch(req.path)
+            if match:
+                return func(self.server, req, *match.groups())
+        return text('no stand-in for %s %s%s' % (self.command, host, req.path), 404)
+
+    def respond(self):
+        try:
+            status, ctype, body, *headers = self.handle_one()
+        except Exception as e:
+            status, ctype, body, headers = 500, 'text/plain', repr(e), ()
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers[0] if headers else {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = respond
+
+
+class JudgeServer(ThreadingHTTPServer):
+    """Stand-in judge server; submissions wait `queue()` seconds (and for one
+    of `workers` judges, if limited), then take `judge()` seconds to judge."""
+
+    daemon_threads = True
+    # benchmarks open a hundred connections to one judge at once
+    request_queue_size = 256
+
+    def __init__(
+        self,
+        address=('127.0.0.1', 0),
+        queue=lambda: 0.5,
+        judge=lambda: 1.0,
+        workers=0,
+        accept=0.9,
+        tests=10,
+        verbose=False,
+    ):
+        super().__init__(address, Handler)
+        self.queue = queue
+        self.judge = judge
+        self.workers = workers
+        self.accept = accept
+        self.tests = tests
+        self.verbose = verbose
+        self.subs = {}
+        self.last = {}
+        self._free = []  # heap of times the busy judging workers become free
+        self._next = 1000
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server_address[:2]
+
+    def submit(self, judge, problem, client):
+        fail = None if random.random() < self.accept else random.randint(1, self.tests)
+        with self._lock:
+            start = time.time() + self.queue()
+            if self.workers:
+                if len(self._free) >= self.workers:
+                    start = max(start, heapq.heappop(self._free))
+            end = start + self.judge()
+            if self.workers:
+                heapq.heappush(self._free, end)
+            id = self._next
+            self._next += 1
+            sub = self.subs[id] = Sub(id, problem, start, end, self.tests, fail)
+            self.last[judge, client] = id
+        return sub
+
+    def get(self, id):
+        try:
+            return self.subs.get(int(id))
+        except (TypeError, ValueError):
+            return
+
+
+def add_arguments(ap):
+    ap.add_argument(
+        '--queue',
+        type=parse_dist,
+        default='exp:0.5',
+        help='seconds a submission waits in the queue, default exp:0.5',
+    )
+    ap.add_argument(
+        '--judge',
+        type=parse_dist,
+        default='uniform:0.5,2',
+        help='seconds a submission takes to judge, default uniform:0.5,2',
+    )
+    ap.add_argument(
+        '--workers', type=int, default=0, help='judging capacity, default unlimited'
+    )
+    ap.add_argument(
+        '--accept', type=float, default=0.9, help='share of accepted submissions'
+    )
+    ap.add_argument('--tests', type=int, default=10, help='tests per submission')
+    ap.add_argument('--seed', type=int, help='random seed')
+
+
+def make_server(ns, address=('127.0.0.1', 0)):
+    if ns.seed is not None:
+        random.seed(ns.seed)
+    return JudgeServer(
+        address,
+        ns.queue,
+        ns.judge,
+        ns.workers,
+        ns.accept,
+        ns.tests,
+        getattr(ns, 'verbose', False),
+    )
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description='stand-in judge server')
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('-p', '--port', type=int, default=8000)
+    ap.add_argument('-v', '--verbose', action='store_true', help='log requests')
+    add_arguments(ap)
+    ns = ap.parse_args(args)
+    server = make_server(ns, (ns.host, ns.port))
+    print('serving on %s; export SUBMIT_REDIRECT=%s' % (server.url, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
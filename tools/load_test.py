@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""Load driver for the whole submit pipeline against the stand-in judges.
+
+Starts `tools/judge_server.py` in-process (or uses `--server URL`), points
+every judge's session at it, logs in, then pushes submissions through
+`AsyncSubmitter` and waits for each verdict the way the CLI does. Reports
+submissions/sec and p50/p95/p99 time-to-verdict per judge.
+
+usage: python tools/load_test.py [-n N] [-c CONCURRENCY] [--judges J,J,...]
+                                 [--server URL] [server options]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from judge_server import add_arguments, make_server  # noqa: E402
+
+PROBLEMS = {
+    'atcoder': 'abc255/abc255_a',
+    'codeforces': '1_A',
+    'cses': '1068',
+    'luogu': 'P1001',
+    'vjudge': 'CodeForces-1A',
+    'usaco_contest': '1000',
+    'usaco': 'ride',
+}
+CODE = 'int main() { int a, b; std::cin >> a >> b; std::cout << a + b; }\n'
+
+
+def percentile(values, p):
+    if not values:
+        return math.nan
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+async def drive(ns, judges):
+    from submit.aio import AsyncSubmitter
+    from submit.base import Language
+
+    results = []
+    async with AsyncSubmitter(max_workers=ns.concurrency + len(judges)) as asub:
+        for oj in judges:
+            if not await asub.login(oj, 'load', 'test'):
+                # e.g. Luogu wants a captcha; carry on as with a saved session
+                asub.submitter.get_oj(oj).set_logged_in(True)
+        sem = asyncio.Semaphore(ns.concurrency)
+
+        async def one(i):
+            oj = judges[i % len(judges)]
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    id = await asub.submit(oj, PROBLEMS[oj], CODE, Language.C__)
+                    sent = time.perf_counter()
+                    sub = await asub.wait_submission(oj, id, ns.timeout)
+                except Exception as e:
+                    results.append((oj, None, None, '%s: %s' % (type(e).__name__, e)))
+                    return
+                verdict = 'TIMEOUT' if sub is None else sub.verdict.name
+                results.append((oj, sent - start, time.perf_counter() - start, verdict))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(ns.number)))
+        return results, time.perf_counter() - start
+
+
+def report(results, elapsed, judges):
+    print(
+        '%-14s %6s %6s %8s %8s %8s %8s %8s'
+        % ('judge', 'subs', 'errors', 'subs/s', 'submit', 'p50', 'p95', 'p99')
+    )
+    for oj in judges + [None]:
+        rows = [r for r in results if oj is None or r[0] == oj]
+        ok = [r for r in rows if r[2] is not None]
+        sent = [r[1] for r in ok]
+        ttv = [r[2] for r in ok]
+        print(
+            '%-14s %6d %6d %8.2f %8.3f %8.3f %8.3f %8.3f'
+            % (
+                oj or 'all',
+                len(rows),
+                len(rows) - len(ok),
+                len(ok) / elapsed,
+                percentile(sent, 50),
+                percentile(ttv, 50),
+                percentile(ttv, 95),
+                percentile(ttv, 99),
+            )
+        )
+    print('(submit: p50 seconds to get an ID; p50/p95/p99: seconds to verdict)')
+    errors = sorted({r[3] for r in results if r[2] is None})
+    for e in errors[:10]:
+        print('error:', e)
+    verdicts = {}
+    for r in results:
+        if r[2] is not None:
+            verdicts[r[3]] = verdicts.get(r[3], 0) + 1
+    print('verdicts:', ', '.join('%s %d' % x for x in sorted(verdicts.items())))
+
+
+def main(args=None):
+    ap = argparse.ArgumentParser(description='load test against stand-in judges')
+    ap.add_argument('-n', '--number', type=int, default=200, help='submissions')
+    ap.add_argument(
+        '-c', '--concurrency', type=int, default=32, help='submissions in flight'
+    )
+    ap.add_argument(
+        '--judges',
+        default=','.join(PROBLEMS),
+        help='comma-separated judges to spread the load over, default all',
+    )
+    ap.add_argument('-t', '--timeout', type=float, default=60, help='verdict timeout')
+    ap.add_argument('--server', help='use a running judge_server.py at this URL')
+    ap.add_argument(
+        '--metrics', help='write HTTP metrics here (JSON if *.json, else Prometheus)'
+    )
+    add_arguments(ap)
+    ns = ap.parse_args(args)
+    judges = ns.judges.split(',')
+    for oj in judges:
+        if oj not in PROBLEMS:
+            ap.error('unknown judge: %s' % oj)
+
+    server = None
+    if ns.server is None:
+        server = make_server(ns)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ['SUBMIT_REDIRECT'] = ns.server or server.url
+    with tempfile.TemporaryDirectory() as cache:
+        # keep the stand-in's language tables out of the real cache
+        os.environ['SUBMIT_CACHE_DIR'] = cache
+        # some judges still print while parsing
+        with contextlib.redirect_stdout(io.StringIO()):
+            results, elapsed = asyncio.run(drive(ns, judges))
+    if server is not None:
+        server.shutdown()
+    print('%d submissions in %.2f s' % (len(results), elapsed))
+    report(results, elapsed, judges)
+    if ns.metrics:
+        from submit.metrics import METRICS
+
+        METRICS.write(ns.metrics)
+    return int(any(r[2] is None for r in results))
+
+
+if __name__ == '__main__':
+    sys.exit(main())